@@ -1,16 +1,21 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import create_structured_chat_agent, AgentExecutor
 from langchain.tools import StructuredTool
-from langchain.schema import HumanMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-import pandas as pd
 from datetime import datetime
 import os
-from typing import Dict, List, Optional
+import queue
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from tools.rag_tool import RAGTool
+from ingestion_jobs import IngestionJobQueue
+from chat_stream import AgentStreamHandler
+from intent_router import IntentRouter, EmbeddingIntentClassifier
+from llm_usage import LLMUsageHandler, UsageStats
+from conversation_memory import ConversationMemory
+from chat_store import ChatStore
 from tools.vacation_tool import VacationTool
 from tools.ticket_tool import TicketTool
-import json
 from pydantic import BaseModel, Field
 from tools.support_ticket_tool import SupportTicketTool
 from dotenv import load_dotenv
@@ -34,10 +39,49 @@ class HRAgent:
             openai_api_key=self.openai_api_key
         )
         
+        # Uploaded documents are ingested in the background
+        self.ingestion_jobs = IngestionJobQueue(
+            self.rag_tool.ingest_document,
+            self.rag_tool.rag_system.base_path / config.INGESTION_JOBS_CONFIG["file_name"],
+            workers=config.INGESTION_JOBS_CONFIG["workers"],
+            max_finished_jobs=config.INGESTION_JOBS_CONFIG["max_finished_jobs"]
+        )
+        # Bulk ingestion of directories and zip archives, one source at a time
+        self.bulk_jobs = IngestionJobQueue(
+            self._run_bulk_job,
+            self.rag_tool.rag_system.base_path / config.INGESTION_JOBS_CONFIG["bulk_file_name"],
+            workers=1,
+            max_finished_jobs=config.INGESTION_JOBS_CONFIG["max_finished_jobs"],
+            result_field='report'
+        )
+
         self.vacation_tool = VacationTool(vacations_file)
         self.ticket_tool = TicketTool(tickets_file)
         self.support_ticket_tool = SupportTicketTool(tickets_file)
 
+        # Structured requests (balance, my requests) are answered without the agent
+        self.intent_router: Optional[IntentRouter] = None
+        router_config = config.INTENT_ROUTER_CONFIG
+        if router_config["enabled"]:
+            classifier = None
+            if router_config["embedding_classifier"]:
+                classifier = EmbeddingIntentClassifier(self.rag_tool.rag_system._embed_question)
+            self.intent_router = IntentRouter(
+                self.vacation_tool,
+                self.ticket_tool,
+                min_confidence=router_config["min_confidence"],
+                max_words=router_config["max_words"],
+                classifier=classifier,
+                classifier_threshold=router_config["classifier_threshold"]
+            )
+
+        # Policy questions: agent, direct (one RAG call) or context (agent answers from excerpts)
+        self.policy_mode = config.POLICY_ANSWER_CONFIG["mode"]
+        if self.policy_mode not in ("agent", "direct", "context"):
+            print(f"Unknown policy answer mode '{self.policy_mode}', using 'agent'")
+            self.policy_mode = "agent"
+        self.policy_stats = UsageStats()
+
         # Initialize Gemini LLM
         self.llm = ChatGoogleGenerativeAI(
             model="gemini-2.0-flash-exp",
@@ -45,13 +89,41 @@ class HRAgent:
             google_api_key=self.google_api_key
         )
 
+        # Chat history, appended one exchange at a time
+        self.chat_store = ChatStore(os.path.join('data', config.CHAT_STORE_CONFIG["file_name"]))
+        if config.CHAT_STORE_CONFIG["migrate_json"]:
+            self.chat_store.migrate_json('data')
+
+        # Recent messages plus a rolling summary instead of the whole history
+        memory_config = config.CONVERSATION_MEMORY_CONFIG
+        self.memory = ConversationMemory(
+            self.llm,
+            self.chat_store,
+            window_messages=memory_config["window_messages"],
+            summary_batch=memory_config["summary_batch"],
+            max_prompt_tokens=memory_config["max_prompt_tokens"],
+            max_summary_tokens=memory_config["max_summary_tokens"]
+        )
+
         # Define tools with improved descriptions
-        self.tools = [
-            StructuredTool.from_function(
+        if self.policy_mode == "context":
+            # The tool only retrieves; the agent's final answer is the single generation call
+            policy_tool = StructuredTool.from_function(
+                name="PolicyQuery",
+                func=self.rag_tool.retrieve_context,
+                description="يبحث في مستندات سياسات الموارد البشرية ويعيد المقاطع المتعلقة بالسؤال لتصيغ منها الإجابة النهائية. المدخلات: سؤال (نص باللغة العربية)"
+            )
+        else:
+            # In direct mode the RAG answer is returned to the user as is
+            policy_tool = StructuredTool.from_function(
                 name="PolicyQuery",
                 func=self.rag_tool.query,
-                description="يستخدم للإجابة عن أسئلة سياسات الموارد البشرية. المدخلات: سؤال (نص باللغة العربية)"
-            ),
+                description="يستخدم للإجابة عن أسئلة سياسات الموارد البشرية. المدخلات: سؤال (نص باللغة العربية)",
+                return_direct=self.policy_mode == "direct"
+            )
+
+        self.tools = [
+            policy_tool,
             StructuredTool.from_function(
                 name="CheckVacationBalance",
                 func=self.vacation_tool.check_balance,
@@ -133,49 +205,91 @@ class HRAgent:
 
         self.active_docs = []
 
+    def _load_history(self, employee_id: Optional[str]) -> List:
+        """Load the bounded chat history sent to the agent (summary and recent messages)"""
+        formatted_history, _ = self.memory.build(employee_id)
+        return formatted_history
+
+    def _save_history(self, employee_id: Optional[str], message: str, output: str):
+        """Append one exchange to the stored chat history"""
+        if employee_id:
+            self.chat_store.append_exchange(employee_id, message, output)
+            self.memory.maybe_refresh(employee_id)
+
+    def _needs_employee_id(self, message: str, employee_id: Optional[str]) -> bool:
+        """Vacation-related queries cannot be answered without an employee_id"""
+        return not employee_id and any(
+            keyword in message.lower() for keyword in ["رصيد اجازتي", "كم يوم باقي"]
+        )
+
+    def _build_context(self, message: str, employee_id: Optional[str], formatted_history: List,
+                       metadata: Optional[Dict]) -> Dict:
+        """Prepare the agent input"""
+        return {
+            "input": f"[المستخدم: {employee_id or 'غير معروف'}]\n{message}",
+            "chat_history": formatted_history,
+            "metadata": metadata or {}
+        }
+
+    def _route(self, message: str, employee_id: Optional[str]):
+        """Try the intent router; None means the agent should handle the message"""
+        if self.intent_router is None:
+            return None
+        try:
+            return self.intent_router.route(message, employee_id)
+        except Exception as e:
+            print(f"Error in intent router: {str(e)}")
+            return None
+
+    def _answers_directly(self, message: str) -> bool:
+        """In direct mode, recognised policy questions go straight to the RAG system"""
+        if self.policy_mode != "direct" or self.intent_router is None:
+            return False
+        try:
+            return self.intent_router.is_policy_question(message)
+        except Exception as e:
+            print(f"Error classifying policy question: {str(e)}")
+            return False
+
+    def _record_policy_usage(self, usage: LLMUsageHandler, direct: bool = False):
+        """Log latency and tokens of a policy answer, keyed by mode and path"""
+        if direct:
+            self.policy_stats.record(f"{self.policy_mode}/rag", usage)
+        elif "PolicyQuery" in usage.tools:
+            # In direct mode, a policy question the router missed costs the agent's tool choice too
+            path = "agent_fallback" if self.policy_mode == "direct" else "agent"
+            self.policy_stats.record(f"{self.policy_mode}/{path}", usage)
+
     def process_query(self, message: str, employee_id: Optional[str] = None, metadata: Optional[Dict] = None) -> str:
         """Process user query with structured chat format and history"""
         try:
-            # Load chat history
-            history = []
-            formatted_history = []
-            if employee_id:
-                history_file = f'data/chat_history_{employee_id}.json'
-                try:
-                    with open(history_file, 'r', encoding='utf-8') as f:
-                        history = json.load(f)
-                        formatted_history = [
-                            HumanMessage(content=msg["content"]) if msg["type"] == "user"
-                            else AIMessage(content=msg["content"])
-                            for msg in history
-                        ]
-                except FileNotFoundError:
-                    pass
-
             # Handle vacation-related queries without employee_id
-            if not employee_id and any(
-                    keyword in message.lower() for keyword in ["رصيد اجازتي", "كم يوم باقي"]
-            ):
+            if self._needs_employee_id(message, employee_id):
                 return "يرجى تقديم رقم الموظف الخاص بك للمتابعة"
 
-            # Prepare context for the agent
-            context = {
-                "input": f"[المستخدم: {employee_id or 'غير معروف'}]\n{message}",
-                "chat_history": formatted_history,
-                "metadata": metadata or {}
-            }
+            # Answer structured requests directly from the tools
+            routed = self._route(message, employee_id)
+            if routed is not None:
+                self._save_history(employee_id, message, routed.answer)
+                return routed.answer
+
+            usage = LLMUsageHandler()
+            if self._answers_directly(message):
+                answer = self.rag_tool.answer(message, callbacks=[usage])
+                self._record_policy_usage(usage, direct=True)
+                self._save_history(employee_id, message, answer)
+                return answer
+
+            # Prepare context for the agent, with the bounded chat history
+            formatted_history = self._load_history(employee_id)
+            context = self._build_context(message, employee_id, formatted_history, metadata)
 
             # Get agent response
-            result = self.agent_executor.invoke(context)
+            result = self.agent_executor.invoke(context, config={"callbacks": [usage]})
+            self._record_policy_usage(usage)
 
             # Save chat history
-            if employee_id:
-                new_history = history + [
-                    {"type": "user", "content": message},
-                    {"type": "bot", "content": result['output']}
-                ]
-                with open(history_file, 'w', encoding='utf-8') as f:
-                    json.dump(new_history, f, ensure_ascii=False, indent=2)
+            self._save_history(employee_id, message, result['output'])
 
             return result.get('output', "عذراً، حدث خطأ أثناء المعالجة. يرجى إعادة المحاولة")
 
@@ -183,6 +297,77 @@ class HRAgent:
             print(f"Error processing query: {str(e)}")
             return "عذراً، حدث خطأ أثناء معالجة طلبك. الرجاء المحاولة مرة أخرى."
 
+    def stream_query(self, message: str, employee_id: Optional[str] = None, metadata: Optional[Dict] = None,
+                     on_complete: Optional[Callable[[str], None]] = None,
+                     keepalive_seconds: float = 15.0) -> Iterator[Tuple[str, Dict]]:
+        """
+        Process a query like process_query, yielding (event, data) pairs as it runs.
+
+        Events: start, tool_start, tool_end, token (final answer text as it is
+        generated), ping while waiting, then done with the full response, or
+        error. The agent runs in a worker thread, so the history is saved and
+        `on_complete` called even if the client stops reading.
+        """
+        yield "start", {"timestamp": datetime.now().isoformat()}
+
+        if self._needs_employee_id(message, employee_id):
+            response = "يرجى تقديم رقم الموظف الخاص بك للمتابعة"
+            yield "token", {"text": response}
+            yield "done", {"response": response, "timestamp": datetime.now().isoformat()}
+            return
+
+        routed = self._route(message, employee_id)
+        if routed is not None:
+            self._save_history(employee_id, message, routed.answer)
+            if on_complete is not None:
+                on_complete(routed.answer)
+            yield "token", {"text": routed.answer}
+            yield "done", {
+                "response": routed.answer,
+                "intent": routed.intent,
+                "timestamp": datetime.now().isoformat()
+            }
+            return
+
+        events: "queue.Queue" = queue.Queue()
+        usage = LLMUsageHandler()
+
+        def run():
+            try:
+                if self._answers_directly(message):
+                    # The direct answer is plain text, streamed token by token
+                    handler = AgentStreamHandler(events, raw_text=True)
+                    output = self.rag_tool.answer(message, callbacks=[handler, usage])
+                    self._record_policy_usage(usage, direct=True)
+                else:
+                    handler = AgentStreamHandler(events)
+                    formatted_history = self._load_history(employee_id)
+                    context = self._build_context(message, employee_id, formatted_history, metadata)
+                    result = self.agent_executor.invoke(context, config={"callbacks": [handler, usage]})
+                    self._record_policy_usage(usage)
+                    output = result.get('output', "عذراً، حدث خطأ أثناء المعالجة. يرجى إعادة المحاولة")
+                self._save_history(employee_id, message, output)
+                if on_complete is not None:
+                    on_complete(output)
+                if not handler.streamed_answer:
+                    # The answer was not streamed (e.g. a parsing fallback); send it whole
+                    events.put(("token", {"text": output}))
+                events.put(("done", {"response": output, "timestamp": datetime.now().isoformat()}))
+            except Exception as e:
+                print(f"Error processing streamed query: {str(e)}")
+                events.put(("error", {"message": "عذراً، حدث خطأ أثناء معالجة طلبك. الرجاء المحاولة مرة أخرى."}))
+
+        threading.Thread(target=run, name="chat-stream", daemon=True).start()
+        while True:
+            try:
+                event, data = events.get(timeout=keepalive_seconds)
+            except queue.Empty:
+                yield "ping", {}
+                continue
+            yield event, data
+            if event in ("done", "error"):
+                return
+
     def add_document(self, filepath: str) -> bool:
         """Add a new document to the RAG system"""
         try:
@@ -194,30 +379,53 @@ class HRAgent:
             print(f"Error adding document: {str(e)}")
             return False
         
-    def get_all_tickets(self):
-
-        """Reads and returns all tickets from the CSV file, handling NaN values."""
-
+    def submit_document(self, filepath: str) -> Dict:
+        """Queue a document for background ingestion and return its job"""
+        job = self.ingestion_jobs.submit(filepath)
+        if filepath not in self.active_docs:
+            self.active_docs.append(filepath)
+        return job
+
+    def get_ingestion_job(self, job_id: str) -> Optional[Dict]:
+        """Get the state of a background ingestion or bulk ingestion job"""
+        return self.ingestion_jobs.get(job_id) or self.bulk_jobs.get(job_id)
+
+    def submit_bulk_ingest(self, source: str, force: bool = False, remove_source: bool = False) -> Dict:
+        """Queue a directory or zip archive for background bulk ingestion and return its job"""
+        return self.bulk_jobs.submit(source, force=force, remove_source=remove_source)
+
+    def _run_bulk_job(self, source: str, progress_callback=None, force: bool = False,
+                      remove_source: bool = False) -> Dict:
+        """Bulk job body; an uploaded archive is removed once it has been ingested"""
         try:
+            report = self.bulk_ingest(source, force=force)
+            if 'error' in report:
+                raise Exception(report['error'])
+            return report
+        finally:
+            if remove_source and os.path.isfile(source):
+                os.remove(source)
+
+    def bulk_ingest(self, source: str, force: bool = False) -> Dict:
+        """Ingest a directory or zip archive of documents through the bulk pipeline"""
+        try:
+            from bulk_ingest import BulkIngester
 
-            df = pd.read_csv(self.ticket_tool.tickets_file)
-
-
-
-            # Replace NaN values with appropriate defaults
-
-            df = df.fillna({'description': '', 'manager_id': '', 'response_date': '', 'updated_at': ''})
-
-
-
-            tickets = df.to_dict('records')
-
-            return tickets
-
+            report = BulkIngester(self.rag_tool.rag_system).ingest_source(source, force=force)
+            for item in report["ingested"]:
+                self.rag_tool.active_docs.append(item["file"])
+                self.active_docs.append(item["file"])
+            return report
         except Exception as e:
+            print(f"Error in bulk ingest: {str(e)}")
+            return {"error": str(e)}
 
+    def get_all_tickets(self):
+        """Returns all tickets from the ticket store; blank fields are None."""
+        try:
+            return self.ticket_tool.store.all()
+        except Exception as e:
             print(f"Error reading tickets: {str(e)}")
-
             return []
 
     def update_active_documents(self, document_list: List[str]) -> bool:
@@ -247,6 +455,22 @@ class HRAgent:
             print(f"Error creating vacation ticket: {str(e)}")
             return {"error": "Could not create vacation ticket"}
 
+    def get_stats(self) -> Dict:
+        """Get performance statistics from the RAG system"""
+        try:
+            stats = self.rag_tool.rag_system.get_stats()
+            if self.intent_router is not None:
+                stats["intent_router"] = self.intent_router.stats()
+            stats["vacation_balances"] = self.vacation_tool.stats()
+            stats["tickets"] = self.ticket_tool.store.stats()
+            stats["chat_store"] = self.chat_store.stats()
+            stats["conversation_memory"] = self.memory.stats()
+            stats["policy_answers"] = {"mode": self.policy_mode, "paths": self.policy_stats.stats()}
+            return stats
+        except Exception as e:
+            print(f"Error getting stats: {str(e)}")
+            return {"error": "Could not retrieve stats"}
+
     def get_employee_tickets(self, employee_id: str) -> Dict:
         """Get all tickets for an employee"""
         try:
@@ -0,0 +1,147 @@
+# answer_cache.py
+
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    """An answer cached under the embedding of the question that produced it"""
+    question: str
+    embedding: np.ndarray
+    answer: str
+    source_documents: List[Any]
+    used_collections: FrozenSet[str]
+    scope: Optional[FrozenSet[str]]  # None means "all collections"
+    latency: float
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class SemanticAnswerCache:
+    """Cache of RAG answers looked up by question-embedding similarity.
+
+    A question whose embedding has cosine similarity above `threshold` with a
+    cached question (over the same collection scope) gets the cached answer.
+    Entries are tagged with the collections whose chunks they used, so corpus
+    changes only evict the answers they can affect.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000,
+                 ttl_seconds: Optional[float] = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: List[CachedAnswer] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.latency_saved = 0.0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _scope_key(collection_ids: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+        return frozenset(collection_ids) if collection_ids else None
+
+    def _remove_where(self, predicate) -> int:
+        """Drop entries matching `predicate`; caller holds the lock."""
+        kept = [entry for entry in self._entries if not predicate(entry)]
+        removed = len(self._entries) - len(kept)
+        if removed:
+            self._entries = kept
+            self._matrix = None
+        return removed
+
+    def lookup(self, embedding: List[float],
+               collection_ids: Optional[Iterable[str]] = None) -> Optional[CachedAnswer]:
+        """Return the closest cached answer above the similarity threshold."""
+        started_at = time.monotonic()
+        scope = self._scope_key(collection_ids)
+        query = self._normalize(embedding)
+        with self._lock:
+            if self.ttl_seconds is not None:
+                self._remove_where(lambda e: started_at - e.created_at > self.ttl_seconds)
+            if not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._matrix = np.vstack([entry.embedding for entry in self._entries])
+
+            similarities = self._matrix @ query
+            for index in np.argsort(-similarities):
+                if similarities[index] < self.threshold:
+                    break
+                entry = self._entries[index]
+                if entry.scope == scope:
+                    self.hits += 1
+                    self.latency_saved += max(0.0, entry.latency - (time.monotonic() - started_at))
+                    return entry
+
+            self.misses += 1
+            return None
+
+    def store(self, question: str, embedding: List[float], answer: str,
+              source_documents: List[Any], used_collections: Iterable[str],
+              collection_ids: Optional[Iterable[str]] = None, latency: float = 0.0):
+        """Cache an answer produced for `question`."""
+        entry = CachedAnswer(
+            question=question,
+            embedding=self._normalize(embedding),
+            answer=answer,
+            source_documents=source_documents,
+            used_collections=frozenset(used_collections),
+            scope=self._scope_key(collection_ids),
+            latency=latency
+        )
+        with self._lock:
+            self._entries.append(entry)
+            if len(self._entries) > self.max_entries:
+                self._entries = self._entries[-self.max_entries:]
+            self._matrix = None
+
+    def invalidate_collections(self, collection_ids: Iterable[str]) -> int:
+        """Evict answers that used, or were scoped to, removed or changed collections."""
+        changed = frozenset(collection_ids)
+        with self._lock:
+            removed = self._remove_where(
+                lambda e: bool(e.used_collections & changed) or bool(e.scope and e.scope & changed)
+            )
+            self.invalidations += removed
+        if removed:
+            logger.info(f"Answer cache: evicted {removed} answers for {', '.join(sorted(changed))}")
+        return removed
+
+    def invalidate_added(self) -> int:
+        """Evict answers searched over all collections, which a new collection may change."""
+        with self._lock:
+            removed = self._remove_where(lambda e: e.scope is None)
+            self.invalidations += removed
+        if removed:
+            logger.info(f"Answer cache: evicted {removed} answers after a collection was added")
+        return removed
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit rate and latency saved."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "latency_saved_seconds": self.latency_saved
+        }
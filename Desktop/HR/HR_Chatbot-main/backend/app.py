@@ -1,13 +1,16 @@
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
 from agent import HRAgent
+from chat_stream import format_sse
 import pandas as pd
 from dotenv import load_dotenv
 from datetime import datetime
 import json
+import hashlib
+import config
 from tools.support_ticket_tool import SupportTicketTool
 import shutil
 
@@ -26,17 +29,34 @@ UPLOAD_FOLDER = 'data/documents'
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'doc', 'txt'}
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Server directories the bulk-ingest endpoint may read; uploaded archives wait in BULK_UPLOAD_FOLDER
+app.config['BULK_INGEST_ROOT'] = os.getenv('BULK_INGEST_ROOT', UPLOAD_FOLDER)
+app.config['BULK_UPLOAD_FOLDER'] = 'data/bulk_uploads'
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Initialize HR Agent
-agent = HRAgent(
-    google_api_key=os.getenv('GOOGLE_API_KEY'),
-    openai_api_key=os.getenv('OPENAI_API_KEY'),
-    vacations_file='data/vacations.csv',
-    tickets_file='data/tickets.csv'
-)
+# HR Agent, built by create_app(). Importing this module must stay free of
+# side effects: spawned bulk-ingest workers re-import the main module.
+agent = None
+
+
+def create_app():
+    """Build the HR agent once and return the Flask app (WSGI: "app:create_app()")."""
+    global agent
+    if agent is None:
+        agent = HRAgent(
+            google_api_key=os.getenv('GOOGLE_API_KEY'),
+            openai_api_key=os.getenv('OPENAI_API_KEY'),
+            vacations_file='data/vacations.csv',
+            tickets_file='data/tickets.csv'
+        )
+
+        # Resume ingestion jobs left unfinished by a previous run
+        agent.ingestion_jobs.start()
+        agent.bulk_jobs.start()
+    return app
+
 
 @app.route('/')
 def serve():
@@ -88,19 +108,43 @@ def login():
 
 @app.route('/api/chat/history/<employee_id>', methods=['GET'])
 def get_chat_history(employee_id):
+    """
+    Return a page of chat history, oldest message first.
+
+    Query parameters: limit (page size), cursor (message id to page from)
+    and direction ('older', the default, or 'newer'). Without a cursor the
+    latest messages are returned. Pages carry an ETag; a matching
+    If-None-Match gets 304 Not Modified.
+    """
     try:
-        # Try to load existing history
-        history_file = f'data/chat_history_{employee_id}.json'
+        store_config = config.CHAT_STORE_CONFIG
         try:
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-        except FileNotFoundError:
-            history = []
-        
-        return jsonify({
+            limit = int(request.args.get('limit', store_config["page_size"]))
+            cursor = request.args.get('cursor')
+            cursor = int(cursor) if cursor else None
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'limit and cursor must be integers'}), 400
+        limit = max(1, min(limit, store_config["max_page_size"]))
+        direction = request.args.get('direction', 'older')
+        if direction not in ('older', 'newer'):
+            return jsonify({'status': 'error', 'message': "direction must be 'older' or 'newer'"}), 400
+
+        page = agent.chat_store.page(employee_id, cursor=cursor, limit=limit, direction=direction)
+
+        response = jsonify({
             'status': 'success',
-            'history': history
+            'history': page['messages'],
+            'has_more': page['has_more'],
+            'older_cursor': page['older_cursor'],
+            'newer_cursor': page['newer_cursor']
         })
+        # Messages are append-only, so a page is identified by the ids it holds
+        response.set_etag(hashlib.sha1(json.dumps([
+            employee_id, direction, cursor, limit, page['has_more'],
+            [msg['id'] for msg in page['messages']]
+        ]).encode('utf-8')).hexdigest())
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -119,39 +163,9 @@ def chat():
         if not message:
             return jsonify({'error': 'Message is required'}), 400
         
-        # Process message through agent
+        # Process message through agent; the agent records the exchange
         response = agent.process_query(message, employee_id)
-        
-        # Save to chat history if employee_id is provided
-        if employee_id:
-            history_file = f'data/chat_history_{employee_id}.json'
-            try:
-                with open(history_file, 'r', encoding='utf-8') as f:
-                    history = json.load(f)
-            except FileNotFoundError:
-                history = []
-            
-            # Add new messages
-            timestamp = datetime.now().isoformat()
-            history.append({
-                'id': str(len(history) + 1),
-                'content': message,
-                'type': 'user',
-                'timestamp': timestamp,
-                'status': 'sent'
-            })
-            history.append({
-                'id': str(len(history) + 2),
-                'content': response,
-                'type': 'bot',
-                'timestamp': timestamp,
-                'status': 'sent'
-            })
-            
-            # Save updated history
-            with open(history_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
-        
+
         return jsonify({
             'response': response,
             'timestamp': datetime.now().isoformat()
@@ -164,6 +178,26 @@ def chat():
             'message': str(e)
         }), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream agent progress and the answer as server-sent events"""
+    data = request.json or {}
+    message = data.get('message', '').strip()
+    employee_id = data.get('type')
+
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    def generate():
+        # The agent records the exchange when it finishes, even if the client disconnects
+        for event, payload in agent.stream_query(message, employee_id):
+            yield format_sse(event, payload)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # let proxies pass events through immediately
+    })
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
@@ -201,8 +235,8 @@ def upload_document():
         # Get the timestamp when the file was uploaded
         uploaded_at = datetime.now().isoformat()
 
-        # Process the document with RAG system
-        agent.add_document(filepath)
+        # Queue the document for background processing with the RAG system
+        job = agent.submit_document(filepath)
 
         # Prepare document metadata
         document_metadata = {
@@ -212,16 +246,18 @@ def upload_document():
             'size': file_length,
             'uploadedBy': 'user_id',  # Replace with actual user ID if you have authentication
             'uploadedAt': uploaded_at,
-            'status': 'processing',  # You can update this status after RAG processing
-            'lastModified': uploaded_at
+            'status': 'processing',  # Poll /api/admin/jobs/<job_id> for progress
+            'lastModified': uploaded_at,
+            'jobId': job['job_id']
         }
 
         return jsonify({
             'message': 'تم رفع المستند بنجاح',
             'filename': filename,
             'document': document_metadata,
+            'job_id': job['job_id'],
             'status':'success'
-        }), 200
+        }), 202
 
     except Exception as e:
         print(f"Error in upload endpoint: {str(e)}")
@@ -230,6 +266,58 @@ def upload_document():
             'message': str(e)
         }), 500
 
+@app.route('/api/admin/jobs/<job_id>', methods=['GET'])
+def get_ingestion_job(job_id):
+    """Report stage, progress, chunk counts and errors of an ingestion job"""
+    try:
+        job = agent.get_ingestion_job(job_id)
+        if job is None:
+            return jsonify({'error': 'المهمة غير موجودة', 'status': 'error'}), 404
+        return jsonify({'job': job, 'status': 'success'})
+
+    except Exception as e:
+        print(f"Error getting ingestion job: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/admin/bulk-ingest', methods=['POST'])
+def bulk_ingest_documents():
+    """Queue a zip archive of documents, or a directory under BULK_INGEST_ROOT, for bulk ingestion"""
+    try:
+        force = request.form.get('force', request.args.get('force', '')).lower() == 'true'
+        if 'file' in request.files:
+            file = request.files['file']
+            if not file.filename.lower().endswith('.zip'):
+                return jsonify({'error': 'نوع الملف غير مسموح به', 'message': 'الرجاء رفع ملف ZIP'}), 400
+            os.makedirs(app.config['BULK_UPLOAD_FOLDER'], exist_ok=True)
+            archive_path = os.path.join(
+                app.config['BULK_UPLOAD_FOLDER'],
+                f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{secure_filename(file.filename)}"
+            )
+            file.save(archive_path)
+            # The job removes the archive once it has been ingested
+            job = agent.submit_bulk_ingest(archive_path, force=force, remove_source=True)
+        else:
+            directory = (request.get_json(silent=True) or {}).get('directory')
+            root = os.path.realpath(app.config['BULK_INGEST_ROOT'])
+            # Relative paths are taken from the root; symlinks and '..' are resolved first
+            target = os.path.realpath(os.path.join(root, directory)) if directory else None
+            if not target or os.path.commonpath([root, target]) != root or not os.path.isdir(target):
+                return jsonify({'error': 'المجلد غير موجود', 'message': 'الرجاء إرسال ملف ZIP أو مسار مجلد داخل مجلد المستندات'}), 400
+            job = agent.submit_bulk_ingest(target, force=force)
+
+        # Poll /api/admin/jobs/<job_id> for the report
+        return jsonify({'status': 'success', 'job_id': job['job_id'], 'job': job}), 202
+
+    except Exception as e:
+        print(f"Error in bulk ingest endpoint: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
 @app.route('/api/admin/documents', methods=['GET'])
 def list_documents():
     """List all available documents"""
@@ -277,6 +365,19 @@ def update_active_documents():
             'message': str(e)
         }), 500
 
+@app.route('/api/admin/stats', methods=['GET'])
+def get_stats():
+    """Report cache, collection residency and other performance counters"""
+    try:
+        return jsonify(agent.get_stats())
+
+    except Exception as e:
+        print(f"Error getting stats: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
 @app.route('/api/employee/vacation-balance/<employee_id>', methods=['GET'])
 def get_vacation_balance(employee_id):
     """Get vacation balance for an employee"""
@@ -383,6 +484,18 @@ def admin_get_tickets():
             'status': 'error'
         }), 500
     
+@app.route('/api/admin/tickets/export', methods=['GET'])
+def admin_export_tickets():
+    """Download all tickets as a tickets.csv file, for tools that still read the CSV."""
+    try:
+        export_path = os.path.join('data', 'tickets_export.csv')
+        agent.ticket_tool.store.export_csv(export_path)
+        return send_file(os.path.abspath(export_path), mimetype='text/csv',
+                         as_attachment=True, download_name='tickets.csv')
+    except Exception as e:
+        print(f"Error exporting tickets: {str(e)}")
+        return jsonify({'error': 'Could not export tickets', 'status': 'error'}), 500
+
 @app.route('/api/admin/documents/<document_id>', methods=['DELETE'])
 def delete_document(document_id):
     """Endpoint to delete a document and its associated ChromaDB collection."""
@@ -400,14 +513,13 @@ def delete_document(document_id):
         return jsonify({'error': 'Could not delete document', 'status': 'error'}), 500
 
 if __name__ == '__main__':
-    # Load initial documents if any exist
+    create_app()
+
+    # Load initial documents if any exist (unchanged files are skipped via the ingestion manifest)
     try:
-        for filename in os.listdir(app.config['UPLOAD_FOLDER']):
-            if allowed_file(filename):
-                print(f"Processing file: {filename}")
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                agent.add_document(filepath)
-        print("Initial documents loaded")
+        report = agent.bulk_ingest(app.config['UPLOAD_FOLDER'])
+        print(f"Initial documents loaded: {len(report.get('ingested', []))} ingested, "
+              f"{len(report.get('skipped', []))} unchanged, {len(report.get('failed', []))} failed")
     except Exception as e:
         print(f"Error loading initial documents: {str(e)}")
     
@@ -0,0 +1,393 @@
+# bulk_ingest.py
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import List, Dict, Any, Optional, Iterable
+
+import config
+from extract_worker import extract_windows
+from rag_system import DocumentMetadata, HRRAGSystem
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.doc', '.txt'}
+
+# Marks the end of a queue
+_DONE = object()
+
+
+def _archive_member_path(name: str) -> PurePosixPath:
+    """Relative path of a zip member; absolute paths and '..' are rejected"""
+    path = PurePosixPath(name.replace('\\', '/'))
+    if path.is_absolute() or '..' in path.parts or (path.parts and ':' in path.parts[0]):
+        raise ValueError(f"Unsafe path in archive: {name}")
+    return path
+
+
+def collect_documents(source: str, extract_to: Path) -> List[str]:
+    """
+    List the supported documents in a directory, zip archive or single file.
+
+    Zip members are extracted into `extract_to` under their path in the
+    archive, so the documents are kept like uploaded ones. Archives with
+    absolute or '..' member paths, or with more members or uncompressed
+    bytes than BULK_INGEST_CONFIG allows, are rejected.
+    """
+    source_path = Path(source)
+    if zipfile.is_zipfile(source_path):
+        settings = config.BULK_INGEST_CONFIG
+        max_members = settings["max_archive_members"]
+        max_bytes = settings["max_archive_bytes"]
+        extract_to.mkdir(parents=True, exist_ok=True)
+        paths = []
+        with zipfile.ZipFile(source_path) as archive:
+            members = [member for member in archive.infolist() if not member.is_dir()]
+            if len(members) > max_members:
+                raise ValueError(f"Archive has {len(members)} files, the limit is {max_members}")
+            if sum(member.file_size for member in members) > max_bytes:
+                raise ValueError(f"Archive expands to more than {max_bytes} bytes")
+            # Check every path before anything is written
+            documents = [
+                (member, relative) for member, relative in
+                ((member, _archive_member_path(member.filename)) for member in members)
+                if relative.suffix.lower() in SUPPORTED_EXTENSIONS
+            ]
+
+            written = 0
+            for member, relative in documents:
+                target = extract_to.joinpath(*relative.parts)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with archive.open(member) as src, open(target, 'wb') as dst:
+                    # The sizes in the archive directory may lie; count what is written
+                    while True:
+                        block = src.read(1 << 20)
+                        if not block:
+                            break
+                        written += len(block)
+                        if written > max_bytes:
+                            raise ValueError(f"Archive expands to more than {max_bytes} bytes")
+                        dst.write(block)
+                paths.append(str(target))
+        return paths
+    if source_path.is_dir():
+        return sorted(
+            str(p) for p in source_path.rglob('*')
+            if p.is_file() and p.suffix.lower() in SUPPORTED_EXTENSIONS
+        )
+    return [str(source_path)]
+
+
+@dataclass
+class _IngestJob:
+    """A document moving through the pipeline; written only by the writer thread"""
+    file_path: str
+    previous_entry: Optional[Dict[str, str]]
+    content_hash: str
+    metadata: Optional[DocumentMetadata] = None
+    vectorstore: Any = None
+    chunks_written: int = 0
+    windows_written: int = 0
+    windows_expected: Optional[int] = None
+    page_count: int = 0
+    write_seconds: float = 0.0
+    failed: bool = False
+
+
+@dataclass
+class _Window:
+    """Consecutive chunks of one document, starting at chunk `offset`"""
+    job: _IngestJob
+    offset: int
+    texts: List[str]
+    pages: List[Dict[str, int]]
+    vectors: Optional[List[List[float]]] = None
+    error: Optional[Exception] = None
+
+
+@dataclass
+class _Extracted:
+    """End of a document's extraction: its window count, or the error that stopped it"""
+    job: _IngestJob
+    windows: int = 0
+    error: Optional[Exception] = None
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage"""
+
+    def __init__(self):
+        self.files = 0
+        self.chunks = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, chunks: int, seconds: float, files: int = 1):
+        with self._lock:
+            self.files += files
+            self.chunks += chunks
+            self.busy_seconds += seconds
+
+    def report(self, wall_seconds: float) -> Dict[str, float]:
+        return {
+            "files": self.files,
+            "chunks": self.chunks,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "chunks_per_sec": self.chunks / wall_seconds if wall_seconds > 0 else 0.0,
+            "files_per_sec": self.files / wall_seconds if wall_seconds > 0 else 0.0
+        }
+
+
+class BulkIngester:
+    """Pipelined ingestion of many documents.
+
+    Extraction runs in a process pool, embedding in a thread pool and all
+    vector-store writes in a single writer thread. Documents flow through
+    the stages in windows of INGESTION_CONFIG["window_chunks"] chunks over
+    bounded queues, so memory use does not grow with document size and a
+    slow stage holds back the ones before it.
+    """
+
+    def __init__(self, rag_system: HRRAGSystem, extract_workers: Optional[int] = None,
+                 embed_workers: Optional[int] = None, queue_size: Optional[int] = None):
+        """Initialize the pipeline in front of `rag_system`."""
+        settings = config.BULK_INGEST_CONFIG
+        self.rag_system = rag_system
+        self.extract_workers = extract_workers or settings["extract_workers"]
+        self.embed_workers = embed_workers or settings["embed_workers"]
+        self.queue_size = queue_size or settings["queue_size"]
+
+    def ingest(self, paths: Iterable[str], force: bool = False) -> Dict[str, Any]:
+        """
+        Ingest documents through the pipeline.
+
+        Args:
+            paths: Document files to ingest
+            force: Re-ingest files the manifest reports as unchanged
+
+        Returns:
+            Report with ingested, skipped and failed files and per-stage throughput
+        """
+        started_at = time.monotonic()
+        stages = {"extract": StageStats(), "embed": StageStats(), "write": StageStats()}
+        report = {"ingested": [], "skipped": [], "failed": []}
+        report_lock = threading.Lock()
+        doc_processor = self.rag_system.doc_processor
+
+        jobs = []
+        for path in paths:
+            try:
+                needed, entry, content_hash = self.rag_system.needs_ingestion(path, force)
+            except Exception as e:
+                report["failed"].append({"file": path, "stage": "check", "error": str(e)})
+                continue
+            if needed:
+                jobs.append(_IngestJob(path, entry, content_hash))
+            else:
+                report["skipped"].append({"file": path, "collection_id": entry['collection_id']})
+
+        embed_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        write_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+
+        def embed_worker():
+            while True:
+                window = embed_queue.get()
+                if window is _DONE:
+                    break
+                try:
+                    embed_started = time.monotonic()
+                    window.vectors = doc_processor.embed_chunks(window.texts)
+                    stages["embed"].record(
+                        len(window.texts), time.monotonic() - embed_started,
+                        files=1 if window.offset == 0 else 0
+                    )
+                except Exception as e:
+                    window.error = e
+                # The writer reports failures, so every window reaches it
+                write_queue.put(window)
+
+        def fail(job: _IngestJob, stage: str, error: Exception):
+            """Report a document once and remove what was written of it; writer thread only"""
+            if job.failed:
+                return
+            job.failed = True
+            logger.error(f"Bulk ingest: {stage} failed for {job.file_path}: {str(error)}")
+            if job.metadata is not None:
+                self.rag_system.discard_partial_collection(job.metadata.collection_id, job.vectorstore)
+            with report_lock:
+                report["failed"].append({"file": job.file_path, "stage": stage, "error": str(error)})
+
+        def finish(job: _IngestJob):
+            """Publish a document once all of its windows are written"""
+            if job.failed or job.windows_expected is None or job.windows_written < job.windows_expected:
+                return
+            finish_started = time.monotonic()
+            try:
+                if job.metadata is None:
+                    job.metadata = doc_processor._create_metadata(job.file_path, job.content_hash)
+                job.metadata.page_count = job.page_count
+                self.rag_system.finish_collection(
+                    job.metadata, job.chunks_written, job.content_hash, job.vectorstore
+                )
+                self.rag_system.record_ingestion(
+                    job.file_path, job.metadata.collection_id, job.content_hash, job.previous_entry
+                )
+            except Exception as e:
+                fail(job, "write", e)
+                return
+            stages["write"].record(job.chunks_written, job.write_seconds + time.monotonic() - finish_started)
+            with report_lock:
+                report["ingested"].append({
+                    "file": job.file_path,
+                    "collection_id": job.metadata.collection_id,
+                    "chunks": job.chunks_written
+                })
+
+        def write_window(window: _Window):
+            job = window.job
+            if job.failed:
+                return
+            if window.error is not None:
+                fail(job, "embed", window.error)
+                return
+            write_started = time.monotonic()
+            try:
+                if job.metadata is None:
+                    job.metadata = doc_processor._create_metadata(job.file_path, job.content_hash)
+                chunk_metadata = [
+                    doc_processor.chunk_metadata(job.metadata, window.offset + i, pages)
+                    for i, pages in enumerate(window.pages)
+                ]
+                # Windows of one document may arrive out of order; the offset
+                # keeps chunk ids stable
+                job.vectorstore = self.rag_system.write_chunks(
+                    job.metadata, window.texts, window.vectors, chunk_metadata,
+                    window.offset, job.vectorstore
+                )
+            except Exception as e:
+                fail(job, "write", e)
+                return
+            job.chunks_written += len(window.texts)
+            job.windows_written += 1
+            job.page_count = max([job.page_count] + [p.get("page_end", 0) for p in window.pages])
+            job.write_seconds += time.monotonic() - write_started
+            finish(job)
+
+        def writer():
+            while True:
+                item = write_queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Window):
+                    write_window(item)
+                elif item.error is not None:
+                    fail(item.job, "extract", item.error)
+                else:
+                    item.job.windows_expected = item.windows
+                    finish(item.job)
+
+        embed_threads = [
+            threading.Thread(target=embed_worker, name=f"bulk-embed-{i}", daemon=True)
+            for i in range(self.embed_workers)
+        ]
+        writer_thread = threading.Thread(target=writer, name="bulk-writer", daemon=True)
+        for thread in embed_threads + [writer_thread]:
+            thread.start()
+
+        def hand_off(future, job: _IngestJob):
+            try:
+                chunks, windows, seconds = future.result()
+            except Exception as e:
+                write_queue.put(_Extracted(job, error=e))
+                return
+            stages["extract"].record(chunks, seconds)
+            write_queue.put(_Extracted(job, windows=windows))
+
+        # Spawned workers do not inherit the server's threads and locks; they
+        # only import extract_worker, never the server or the vector store
+        mp_context = multiprocessing.get_context("spawn")
+        with mp_context.Manager() as manager, \
+                ProcessPoolExecutor(max_workers=self.extract_workers, mp_context=mp_context) as executor:
+            # Workers block on this queue while the embedders are behind
+            windows = manager.Queue(maxsize=self.queue_size)
+
+            def drain():
+                while True:
+                    item = windows.get()
+                    if item is None:
+                        break
+                    job_index, offset, texts, pages = item
+                    embed_queue.put(_Window(jobs[job_index], offset, texts, pages))
+
+            drain_thread = threading.Thread(target=drain, name="bulk-drain", daemon=True)
+            drain_thread.start()
+
+            window_chunks = config.INGESTION_CONFIG["window_chunks"]
+            pending = {}
+            for index, job in enumerate(jobs):
+                if len(pending) >= self.extract_workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        hand_off(future, pending.pop(future))
+                future = executor.submit(extract_windows, job.file_path, index, windows, window_chunks)
+                pending[future] = job
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    hand_off(future, pending.pop(future))
+
+            # Every window was queued before its worker returned
+            windows.put(None)
+            drain_thread.join()
+
+        for _ in embed_threads:
+            embed_queue.put(_DONE)
+        for thread in embed_threads:
+            thread.join()
+        write_queue.put(_DONE)
+        writer_thread.join()
+
+        wall_seconds = time.monotonic() - started_at
+        report["wall_seconds"] = round(wall_seconds, 3)
+        report["stages"] = {name: stats.report(wall_seconds) for name, stats in stages.items()}
+        logger.info(
+            f"Bulk ingest: {len(report['ingested'])} ingested, {len(report['skipped'])} skipped, "
+            f"{len(report['failed'])} failed in {wall_seconds:.1f}s"
+        )
+        return report
+
+    def ingest_source(self, source: str, force: bool = False) -> Dict[str, Any]:
+        """Ingest every supported document in a directory, zip archive or file."""
+        paths = collect_documents(source, self.rag_system.doc_processor.docs_path)
+        return self.ingest(paths, force=force)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Bulk-ingest HR documents from a directory or zip archive")
+    parser.add_argument("source", help="directory, zip archive or document file")
+    parser.add_argument("--extract-workers", type=int, default=None)
+    parser.add_argument("--embed-workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-ingest unchanged files")
+    args = parser.parse_args()
+
+    rag_system = HRRAGSystem(os.getenv("GOOGLE_API_KEY"), os.getenv("OPENAI_API_KEY"))
+    ingester = BulkIngester(
+        rag_system,
+        extract_workers=args.extract_workers,
+        embed_workers=args.embed_workers,
+        queue_size=args.queue_size
+    )
+    print(json.dumps(ingester.ingest_source(args.source, force=args.force), ensure_ascii=False, indent=2))
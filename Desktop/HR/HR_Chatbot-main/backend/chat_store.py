@@ -0,0 +1,282 @@
+# chat_store.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ChatStore:
+    """Append-only chat history in SQLite.
+
+    Every message is one row with the schema the chat API returns: id,
+    content, type ("user" or "bot"), timestamp and status. An exchange is
+    appended in a single transaction, so a turn costs the same however long
+    the history is. All reads and writes share one connection and are
+    serialized by one lock; each holds it only for a short statement.
+    """
+
+    LEGACY_PATTERN = 'chat_history_*.json'
+
+    def __init__(self, db_path: Path):
+        """Open (or create) the store at `db_path`."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.appends = 0
+        self.append_seconds = 0.0
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                employee_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'sent'
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_employee ON messages(employee_id, id)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS migrated_files (name TEXT PRIMARY KEY, migrated_at TEXT NOT NULL)"
+        )
+        # Rolling summary per employee, covering every message up to last_message_id
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS summaries (
+                employee_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                last_message_id INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _record(row: Tuple) -> Dict[str, Any]:
+        message_id, message_type, content, timestamp, status = row
+        return {
+            "id": str(message_id),
+            "content": content,
+            "type": message_type,
+            "timestamp": timestamp,
+            "status": status
+        }
+
+    def append(self, employee_id: str, messages: List[Tuple[str, str]],
+               timestamp: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Append messages to an employee's history.
+
+        Args:
+            employee_id: Owner of the history
+            messages: (type, content) pairs, type being "user" or "bot"
+            timestamp: ISO timestamp for the messages; defaults to now
+
+        Returns:
+            The stored records
+        """
+        timestamp = timestamp or datetime.now().isoformat()
+        started_at = time.monotonic()
+        records = []
+        with self._lock:
+            for message_type, content in messages:
+                cursor = self._conn.execute(
+                    "INSERT INTO messages (employee_id, type, content, timestamp) VALUES (?, ?, ?, ?)",
+                    (str(employee_id), message_type, content, timestamp)
+                )
+                records.append(self._record((cursor.lastrowid, message_type, content, timestamp, 'sent')))
+            self._conn.commit()
+            self.appends += 1
+            self.append_seconds += time.monotonic() - started_at
+        return records
+
+    def append_exchange(self, employee_id: str, message: str, response: str) -> List[Dict[str, Any]]:
+        """Append a user message and the bot response as one write"""
+        return self.append(employee_id, [("user", message), ("bot", response)])
+
+    def history(self, employee_id: str) -> List[Dict[str, Any]]:
+        """Return an employee's messages, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, type, content, timestamp, status FROM messages WHERE employee_id = ? ORDER BY id",
+                (str(employee_id),)
+            ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def recent(self, employee_id: str, limit: int, after_id: int = 0) -> List[Dict[str, Any]]:
+        """Return the newest `limit` messages with an id above `after_id`, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, type, content, timestamp, status FROM messages "
+                "WHERE employee_id = ? AND id > ? ORDER BY id DESC LIMIT ?",
+                (str(employee_id), int(after_id), limit)
+            ).fetchall()
+        return [self._record(row) for row in reversed(rows)]
+
+    def page(self, employee_id: str, cursor: Optional[int] = None, limit: int = 50,
+             direction: str = 'older') -> Dict[str, Any]:
+        """
+        Return one page of an employee's messages, oldest first.
+
+        Pages are read through the (employee_id, id) index, so any page costs
+        the same however long the history is.
+
+        Args:
+            employee_id: Owner of the history
+            cursor: Message id to page from (exclusive); None starts at the newest
+                message for 'older' and at the oldest for 'newer'
+            limit: Page size
+            direction: 'older' for messages before the cursor, 'newer' for after it
+
+        Returns:
+            Dict with the messages, has_more, and the cursors for the adjacent pages
+        """
+        if direction == 'newer':
+            query = "SELECT id, type, content, timestamp, status FROM messages WHERE employee_id = ? AND id > ? ORDER BY id LIMIT ?"
+            bound = cursor if cursor is not None else 0
+        else:
+            query = "SELECT id, type, content, timestamp, status FROM messages WHERE employee_id = ? AND id < ? ORDER BY id DESC LIMIT ?"
+            bound = cursor if cursor is not None else 2 ** 63 - 1
+        with self._lock:
+            rows = self._conn.execute(query, (str(employee_id), bound, limit + 1)).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if direction != 'newer':
+            rows.reverse()
+        messages = [self._record(row) for row in rows]
+        return {
+            "messages": messages,
+            "has_more": has_more,
+            # Continue backwards from the first message, forwards from the last
+            "older_cursor": messages[0]["id"] if messages else None,
+            "newer_cursor": messages[-1]["id"] if messages else (str(cursor) if cursor is not None else None)
+        }
+
+    def count(self, employee_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE employee_id = ?", (str(employee_id),)
+            ).fetchone()[0]
+
+    def summary(self, employee_id: str) -> Dict[str, Any]:
+        """Return the stored summary and the id of the last message it covers (0 if none)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, last_message_id FROM summaries WHERE employee_id = ?", (str(employee_id),)
+            ).fetchone()
+        if row is None:
+            return {"summary": "", "last_message_id": 0}
+        return {"summary": row[0], "last_message_id": row[1]}
+
+    def save_summary(self, employee_id: str, summary: str, last_message_id: int):
+        """Store a summary covering messages up to `last_message_id`; an older summary never replaces a newer one"""
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO summaries (employee_id, summary, last_message_id, updated_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(employee_id) DO UPDATE SET
+                       summary = excluded.summary,
+                       last_message_id = excluded.last_message_id,
+                       updated_at = excluded.updated_at
+                   WHERE excluded.last_message_id >= summaries.last_message_id""",
+                (str(employee_id), summary, int(last_message_id), datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _dedupe_legacy(legacy: List[Dict[str, Any]]) -> List[List[Any]]:
+        """
+        Normalize legacy messages and drop the doubled exchanges.
+
+        The agent and the chat endpoint both appended every exchange, so
+        each one usually appears twice in a row, once without a timestamp.
+        """
+        messages = [
+            ['user' if msg.get('type') == 'user' else 'bot', str(msg['content']),
+             msg.get('timestamp'), msg.get('status') or 'sent']
+            for msg in legacy
+            if isinstance(msg, dict) and msg.get('content') is not None
+        ]
+        kept: List[List[Any]] = []
+        i = 0
+        while i < len(messages):
+            pair = messages[i:i + 2]
+            if len(pair) == 2 and len(kept) >= 2 and [m[:2] for m in kept[-2:]] == [m[:2] for m in pair]:
+                for previous, duplicate in zip(kept[-2:], pair):
+                    previous[2] = previous[2] or duplicate[2]
+                i += 2
+                continue
+            kept.append(messages[i])
+            i += 1
+        return kept
+
+    def migrate_json(self, data_dir: str) -> Dict[str, int]:
+        """
+        Import the legacy chat_history_<id>.json files found in `data_dir`.
+
+        Each file is imported and recorded in one transaction, then renamed
+        to .json.migrated; an interrupted migration resumes on the next start
+        and no file is imported twice.
+
+        Returns:
+            Number of messages imported per employee
+        """
+        imported = {}
+        for path in sorted(Path(data_dir).glob(self.LEGACY_PATTERN)):
+            employee_id = path.stem[len('chat_history_'):]
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    legacy = json.load(f)
+                fallback_timestamp = datetime.fromtimestamp(path.stat().st_mtime).isoformat()
+                rows = [
+                    (employee_id, message_type, content, timestamp or fallback_timestamp, status)
+                    for message_type, content, timestamp, status in self._dedupe_legacy(legacy)
+                ]
+                with self._lock:
+                    already = self._conn.execute(
+                        "SELECT 1 FROM migrated_files WHERE name = ?", (path.name,)
+                    ).fetchone()
+                    if already:
+                        rows = []
+                    self._conn.executemany(
+                        "INSERT INTO messages (employee_id, type, content, timestamp, status) VALUES (?, ?, ?, ?, ?)",
+                        rows
+                    )
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO migrated_files (name, migrated_at) VALUES (?, ?)",
+                        (path.name, datetime.now().isoformat())
+                    )
+                    self._conn.commit()
+                os.replace(path, path.with_name(path.name + '.migrated'))
+                imported[employee_id] = len(rows)
+                logger.info(f"Migrated {len(rows)} chat messages for {employee_id} from {path.name}")
+            except Exception as e:
+                with self._lock:
+                    self._conn.rollback()
+                logger.error(f"Error migrating chat history {path}: {str(e)}")
+        return imported
+
+    def stats(self) -> Dict[str, Any]:
+        """Return message and employee counts and append latency."""
+        with self._lock:
+            messages, employees = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT employee_id) FROM messages"
+            ).fetchone()
+            return {
+                "messages": messages,
+                "employees": employees,
+                "appends": self.appends,
+                "avg_append_ms": self.append_seconds / self.appends * 1000 if self.appends else 0.0
+            }
@@ -0,0 +1,131 @@
+# chat_stream.py
+
+import json
+import queue
+import re
+import time
+import logging
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+_FINAL_ANSWER = re.compile(r'"action"\s*:\s*"Final Answer"')
+_ACTION_INPUT = re.compile(r'"action_input"\s*:\s*"')
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class FinalAnswerExtractor:
+    """Pulls the final answer out of a streamed structured-chat JSON blob.
+
+    The agent answers with {"action": "Final Answer", "action_input": "..."};
+    once both keys have been seen, the characters of the action_input string
+    are decoded and returned as they arrive. Tool calls yield nothing.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.in_answer = False
+        self.finished = False
+
+    def feed(self, token: str) -> str:
+        """Add a streamed token and return any newly decoded answer text."""
+        if self.finished:
+            return ""
+        self.buffer += token
+        if not self.in_answer:
+            action = _FINAL_ANSWER.search(self.buffer)
+            if action is None:
+                return ""
+            start = _ACTION_INPUT.search(self.buffer, action.end())
+            if start is None:
+                return ""
+            self.in_answer = True
+            self.buffer = self.buffer[start.end():]
+
+        out = []
+        i = 0
+        while i < len(self.buffer):
+            char = self.buffer[i]
+            if char == '"':
+                self.finished = True
+                break
+            if char != '\\':
+                out.append(char)
+                i += 1
+                continue
+            # Escape sequences may be split across tokens; wait for the rest
+            if i + 1 >= len(self.buffer):
+                break
+            code = self.buffer[i + 1]
+            if code == 'u':
+                if i + 6 > len(self.buffer):
+                    break
+                try:
+                    out.append(chr(int(self.buffer[i + 2:i + 6], 16)))
+                except ValueError:
+                    out.append(self.buffer[i:i + 6])
+                i += 6
+            else:
+                out.append(_ESCAPES.get(code, code))
+                i += 2
+        self.buffer = self.buffer[i:]
+        return "".join(out)
+
+
+class AgentStreamHandler(BaseCallbackHandler):
+    """Callback handler turning an AgentExecutor run into stream events.
+
+    Events are put on `events` as (name, data) pairs: tool_start and
+    tool_end for every tool call, and token for each piece of the final
+    answer as the LLM generates it. With `raw_text` every generated token
+    is answer text, as for direct answers that are not agent JSON.
+    """
+
+    def __init__(self, events: "queue.Queue", raw_text: bool = False):
+        self.events = events
+        self.raw_text = raw_text
+        self.streamed_answer = ""
+        self._extractors: Dict[UUID, FinalAnswerExtractor] = {}
+        self._tools: Dict[UUID, Dict[str, Any]] = {}
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if self.raw_text:
+            text = token
+        else:
+            extractor = self._extractors.setdefault(run_id, FinalAnswerExtractor())
+            text = extractor.feed(token)
+        if text:
+            self.streamed_answer += text
+            self.events.put(("token", {"text": text}))
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._extractors.pop(run_id, None)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID,
+                      **kwargs: Any) -> None:
+        name = (serialized or {}).get("name", "tool")
+        self._tools[run_id] = {"name": name, "started_at": time.monotonic()}
+        self.events.put(("tool_start", {"tool": name, "input": input_str}))
+
+    def _finish_tool(self, run_id: UUID, **data: Any):
+        tool = self._tools.pop(run_id, None) or {"name": "tool", "started_at": time.monotonic()}
+        self.events.put(("tool_end", dict(
+            data,
+            tool=tool["name"],
+            elapsed_ms=round((time.monotonic() - tool["started_at"]) * 1000)
+        )))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        content = getattr(output, "content", output)
+        self._finish_tool(run_id, status="success", output=str(content)[:500])
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_tool(run_id, status="error", error=str(error))
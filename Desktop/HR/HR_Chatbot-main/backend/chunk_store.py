@@ -0,0 +1,193 @@
+# chunk_store.py
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Stay well under SQLite's bound-parameter limit
+_SQL_BATCH = 500
+
+
+def chunk_hash(text: str) -> str:
+    """Content address of a chunk: sha256 of its normalized text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class ChunkStore:
+    """Reference-counted table of which collections contain which chunks.
+
+    Chunk text and vectors live once in the vector index under their content
+    hash; a collection (or a merge of collections) is only an ordered list of
+    hashes here. Every list entry holds one reference, and a chunk whose
+    last reference is removed is reported as orphaned so its vector can be
+    deleted.
+    """
+
+    def __init__(self, db_path: Path):
+        """Open (or create) the store at `db_path`."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                chunk_hash TEXT PRIMARY KEY,
+                refcount INTEGER NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunk_refs (
+                collection_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                PRIMARY KEY (collection_id, position)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_refs_hash ON chunk_refs(chunk_hash)")
+        self._conn.commit()
+
+    def add_references(self, collection_id: str, hashes: List[str]) -> List[str]:
+        """
+        Append chunks to a collection's reference list.
+
+        Args:
+            collection_id: Collection receiving the chunks
+            hashes: Content hashes of the chunks, in collection order
+
+        Returns:
+            Hashes that were not stored before (their vectors must be written)
+        """
+        if not hashes:
+            return []
+        with self._lock:
+            start = self._conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM chunk_refs WHERE collection_id = ?",
+                (collection_id,)
+            ).fetchone()[0]
+            unique = list(dict.fromkeys(hashes))
+            existing = set()
+            for i in range(0, len(unique), _SQL_BATCH):
+                batch = unique[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                existing.update(row[0] for row in self._conn.execute(
+                    f"SELECT chunk_hash FROM chunks WHERE chunk_hash IN ({placeholders})", batch
+                ))
+
+            counts: Dict[str, int] = {}
+            for h in hashes:
+                counts[h] = counts.get(h, 0) + 1
+            self._conn.executemany(
+                "INSERT INTO chunk_refs (collection_id, position, chunk_hash) VALUES (?, ?, ?)",
+                [(collection_id, start + i, h) for i, h in enumerate(hashes)]
+            )
+            self._conn.executemany(
+                """INSERT INTO chunks (chunk_hash, refcount) VALUES (?, ?)
+                   ON CONFLICT(chunk_hash) DO UPDATE SET refcount = refcount + excluded.refcount""",
+                list(counts.items())
+            )
+            self._conn.commit()
+        return [h for h in unique if h not in existing]
+
+    def copy_references(self, source_ids: Iterable[str], target_id: str) -> int:
+        """Make `target_id` reference every chunk of the source collections, in order."""
+        hashes = []
+        for source_id in source_ids:
+            hashes.extend(self.hashes_for([source_id], ordered=True))
+        self.add_references(target_id, hashes)
+        return len(hashes)
+
+    def remove_collection(self, collection_id: str) -> List[str]:
+        """
+        Drop a collection's references.
+
+        Returns:
+            Hashes of chunks no longer referenced by any collection
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_hash, COUNT(*) FROM chunk_refs WHERE collection_id = ? GROUP BY chunk_hash",
+                (collection_id,)
+            ).fetchall()
+            if not rows:
+                return []
+            self._conn.execute("DELETE FROM chunk_refs WHERE collection_id = ?", (collection_id,))
+            self._conn.executemany(
+                "UPDATE chunks SET refcount = refcount - ? WHERE chunk_hash = ?",
+                [(count, h) for h, count in rows]
+            )
+            orphaned = []
+            for i in range(0, len(rows), _SQL_BATCH):
+                batch = [h for h, _ in rows[i:i + _SQL_BATCH]]
+                placeholders = ",".join("?" * len(batch))
+                orphaned.extend(row[0] for row in self._conn.execute(
+                    f"SELECT chunk_hash FROM chunks WHERE refcount <= 0 AND chunk_hash IN ({placeholders})",
+                    batch
+                ))
+            self._conn.execute("DELETE FROM chunks WHERE refcount <= 0")
+            self._conn.commit()
+        logger.info(
+            f"Chunk store: removed {sum(count for _, count in rows)} references of {collection_id}, "
+            f"{len(orphaned)} chunks orphaned"
+        )
+        return orphaned
+
+    def hashes_for(self, collection_ids: Iterable[str], ordered: bool = False) -> List[str]:
+        """Distinct chunks referenced by the given collections (in list order if `ordered`)."""
+        collection_ids = list(collection_ids)
+        if not collection_ids:
+            return []
+        placeholders = ",".join("?" * len(collection_ids))
+        with self._lock:
+            if ordered:
+                rows = self._conn.execute(
+                    f"""SELECT chunk_hash FROM chunk_refs WHERE collection_id IN ({placeholders})
+                        ORDER BY collection_id, position""",
+                    collection_ids
+                ).fetchall()
+                return [row[0] for row in rows]
+            rows = self._conn.execute(
+                f"SELECT DISTINCT chunk_hash FROM chunk_refs WHERE collection_id IN ({placeholders})",
+                collection_ids
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def collections_for(self, hashes: Iterable[str]) -> Dict[str, List[str]]:
+        """Map each chunk hash to the collections referencing it."""
+        unique = list(dict.fromkeys(hashes))
+        owners: Dict[str, List[str]] = {}
+        with self._lock:
+            for i in range(0, len(unique), _SQL_BATCH):
+                batch = unique[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for h, cid in self._conn.execute(
+                        f"""SELECT DISTINCT chunk_hash, collection_id FROM chunk_refs
+                            WHERE chunk_hash IN ({placeholders})""", batch):
+                    owners.setdefault(h, []).append(cid)
+        return owners
+
+    def clear(self):
+        """Forget every reference (used when rebuilding the index)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunk_refs")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Return unique chunks against references, i.e. how much storage sharing saves."""
+        with self._lock:
+            unique = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            references = self._conn.execute("SELECT COUNT(*) FROM chunk_refs").fetchone()[0]
+        return {
+            "unique_chunks": unique,
+            "references": references,
+            "shared_references": references - unique,
+            "dedup_ratio": references / unique if unique else 1.0
+        }
@@ -0,0 +1,301 @@
+# collection_catalog.py
+
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionCatalog:
+    """Lightweight JSON catalog of the per-document Chroma collections.
+
+    Holds id, title, chunk count, created time and content hash for every
+    collection so startup and listings never have to open a Chroma client.
+
+    A merged collection has no store of its own: its entry lists the
+    per-document collections it references in `members`. A collection that
+    was removed while a merge still references it stays on disk, marked
+    `hidden`, until the last merge referencing it is removed.
+    """
+
+    def __init__(self, catalog_path: Path):
+        """Load the catalog stored at `catalog_path`."""
+        self.catalog_path = Path(catalog_path)
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.catalog_path.exists():
+            try:
+                with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                logger.error(f"Error reading collection catalog: {str(e)}")
+
+    def _save(self):
+        """Atomically rewrite the catalog file."""
+        tmp_path = self.catalog_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.catalog_path)
+
+    def __contains__(self, collection_id: str) -> bool:
+        return collection_id in self.entries
+
+    def ids(self) -> List[str]:
+        return list(self.entries)
+
+    def get(self, collection_id: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(collection_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return list(self.entries.values())
+
+    def physical_ids(self) -> List[str]:
+        """Collections backed by their own store, i.e. everything except merges."""
+        return [cid for cid, entry in self.entries.items() if not entry.get("members")]
+
+    def referrers(self, collection_id: str) -> List[str]:
+        """Merged collections referencing `collection_id`."""
+        return [
+            cid for cid, entry in self.entries.items()
+            if collection_id in (entry.get("members") or ())
+        ]
+
+    def add(self, collection_id: str, title: str, chunk_count: Optional[int],
+            content_hash: Optional[str] = None, created: Optional[str] = None,
+            members: Optional[List[str]] = None):
+        """Add or replace a catalog entry."""
+        with self._lock:
+            self.entries[collection_id] = {
+                "collection_id": collection_id,
+                "title": title,
+                "chunk_count": chunk_count,
+                "created": created or datetime.now().isoformat(),
+                "content_hash": content_hash
+            }
+            if members is not None:
+                self.entries[collection_id]["members"] = list(members)
+            self._save()
+
+    def update(self, collection_id: str, **fields):
+        """Update fields of an existing entry."""
+        with self._lock:
+            if collection_id in self.entries:
+                self.entries[collection_id].update(fields)
+                self._save()
+
+    def remove(self, collection_id: str):
+        with self._lock:
+            if self.entries.pop(collection_id, None) is not None:
+                self._save()
+
+    def sync_with_directory(self, chroma_path: Path):
+        """
+        Reconcile the catalog with the collection directories on disk.
+
+        Directories missing from the catalog (e.g. created before it existed)
+        are added without opening them; their chunk count is filled in on
+        first use. Entries whose directory is gone are dropped; merged
+        collections have no directory and are kept.
+        """
+        on_disk = {d.name: d for d in chroma_path.iterdir() if d.is_dir()} if chroma_path.exists() else {}
+        with self._lock:
+            changed = False
+            for cid, collection_dir in on_disk.items():
+                if cid not in self.entries:
+                    self.entries[cid] = {
+                        "collection_id": cid,
+                        "title": cid,
+                        "chunk_count": None,
+                        "created": datetime.fromtimestamp(collection_dir.stat().st_ctime).isoformat(),
+                        "content_hash": None
+                    }
+                    changed = True
+            for cid in [cid for cid, entry in self.entries.items()
+                        if cid not in on_disk and not entry.get("members")]:
+                del self.entries[cid]
+                changed = True
+            if changed:
+                self._save()
+
+
+class LazyCollectionMap(MutableMapping):
+    """Mapping of collection id to vector store that opens stores on first access.
+
+    Membership and iteration come from the catalog, so listing collections or
+    checking for one never opens a Chroma client. At most `max_open` stores
+    (and roughly `max_bytes` of estimated index memory) stay resident; the
+    least recently used ones are closed and transparently reopened on access.
+    """
+
+    def __init__(self, catalog: CollectionCatalog, opener: Callable[[str], Any],
+                 closer: Optional[Callable[[Any], None]] = None,
+                 max_open: Optional[int] = None, max_bytes: Optional[int] = None,
+                 bytes_per_chunk: int = 10_240):
+        self.catalog = catalog
+        self._opener = opener
+        self._closer = closer
+        self.max_open = max_open
+        self.max_bytes = max_bytes
+        self.bytes_per_chunk = bytes_per_chunk
+
+        self._open: "OrderedDict[str, Any]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        # Stores removed while pinned; closed when their last search releases them
+        self._closing: Dict[str, Any] = {}
+        self._open_locks: Dict[str, threading.Lock] = {}
+        self._ever_opened = set()
+        self._lock = threading.RLock()
+
+        self.opens = 0
+        self.reopens = 0
+        self.evictions = 0
+        self.reopen_seconds = 0.0
+        self.max_reopen_seconds = 0.0
+
+    def _estimated_bytes(self, collection_id: str) -> int:
+        entry = self.catalog.get(collection_id) or {}
+        return (entry.get("chunk_count") or 0) * self.bytes_per_chunk
+
+    def resident_bytes(self) -> int:
+        return sum(self._estimated_bytes(cid) for cid in self._open)
+
+    def _over_budget(self) -> bool:
+        if self.max_open is not None and len(self._open) > self.max_open:
+            return True
+        return self.max_bytes is not None and self.resident_bytes() > self.max_bytes
+
+    def _close(self, collection_id: str, vectorstore):
+        if self._closer is None:
+            return
+        try:
+            self._closer(vectorstore)
+        except Exception as e:
+            logger.error(f"Error closing collection {collection_id}: {str(e)}")
+
+    def _evict(self, keep: Optional[str]):
+        """Close least recently used stores until back under the residency cap."""
+        for cid in list(self._open):
+            if not self._over_budget():
+                break
+            if cid == keep or self._pins.get(cid):
+                # In use by a running search; retried once it is released
+                continue
+            vectorstore = self._open.pop(cid)
+            self.evictions += 1
+            self._close(cid, vectorstore)
+            logger.info(f"Evicted collection: {cid}")
+
+    def __getitem__(self, collection_id: str):
+        with self._lock:
+            if collection_id in self._open:
+                self._open.move_to_end(collection_id)
+                return self._open[collection_id]
+            entry = self.catalog.get(collection_id)
+            if entry is None or entry.get("members"):
+                # Merged collections are resolved to their members by the caller
+                raise KeyError(collection_id)
+            open_lock = self._open_locks.setdefault(collection_id, threading.Lock())
+
+        # Different collections open concurrently; the same one only once
+        with open_lock:
+            with self._lock:
+                if collection_id in self._open:
+                    self._open.move_to_end(collection_id)
+                    return self._open[collection_id]
+
+            started_at = time.monotonic()
+            vectorstore = self._opener(collection_id)
+            elapsed = time.monotonic() - started_at
+            if self.catalog.get(collection_id)["chunk_count"] is None:
+                self.catalog.update(collection_id, chunk_count=vectorstore._collection.count())
+
+            with self._lock:
+                self.opens += 1
+                if collection_id in self._ever_opened:
+                    self.reopens += 1
+                    self.reopen_seconds += elapsed
+                    self.max_reopen_seconds = max(self.max_reopen_seconds, elapsed)
+                self._ever_opened.add(collection_id)
+                self._open[collection_id] = vectorstore
+                self._evict(keep=collection_id)
+
+        logger.info(f"Opened collection: {collection_id} in {elapsed * 1000:.0f} ms")
+        return vectorstore
+
+    @contextmanager
+    def using(self, collection_id: str):
+        """Open a store and keep it from being evicted while in use."""
+        with self._lock:
+            self._pins[collection_id] = self._pins.get(collection_id, 0) + 1
+        try:
+            yield self[collection_id]
+        finally:
+            with self._lock:
+                self._pins[collection_id] -= 1
+                if not self._pins[collection_id]:
+                    del self._pins[collection_id]
+                    if collection_id in self._closing:
+                        # Removed while this search was running
+                        self._close(collection_id, self._closing.pop(collection_id))
+                    # Catch up on evictions skipped while this store was pinned
+                    self._evict(keep=None)
+
+    def __setitem__(self, collection_id: str, vectorstore):
+        """Register an already opened store; callers add the catalog entry."""
+        with self._lock:
+            if collection_id not in self.catalog:
+                self.catalog.add(collection_id, title=collection_id, chunk_count=None)
+            self._open[collection_id] = vectorstore
+            self._open.move_to_end(collection_id)
+            self._ever_opened.add(collection_id)
+            self._evict(keep=collection_id)
+
+    def __delitem__(self, collection_id: str):
+        with self._lock:
+            if collection_id not in self.catalog:
+                raise KeyError(collection_id)
+            vectorstore = self._open.pop(collection_id, None)
+            if vectorstore is not None:
+                if self._pins.get(collection_id):
+                    # Like eviction, never close a store under a running search
+                    self._closing[collection_id] = vectorstore
+                else:
+                    self._close(collection_id, vectorstore)
+            self.catalog.remove(collection_id)
+
+    def __contains__(self, collection_id) -> bool:
+        return collection_id in self.catalog
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.catalog.ids())
+
+    def __len__(self) -> int:
+        return len(self.catalog.entries)
+
+    def is_open(self, collection_id: str) -> bool:
+        return collection_id in self._open
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the resident set and eviction/reopen counters."""
+        with self._lock:
+            return {
+                "resident": list(self._open),
+                "resident_count": len(self._open),
+                "resident_bytes_estimate": self.resident_bytes(),
+                "max_open": self.max_open,
+                "max_bytes": self.max_bytes,
+                "opens": self.opens,
+                "reopens": self.reopens,
+                "evictions": self.evictions,
+                "avg_reopen_ms": self.reopen_seconds / self.reopens * 1000 if self.reopens else 0.0,
+                "max_reopen_ms": self.max_reopen_seconds * 1000
+            }
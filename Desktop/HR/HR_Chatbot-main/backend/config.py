@@ -36,6 +36,135 @@ RAG_CONFIG = {
     "temperature": 0.3
 }
 
+# Vector index configuration
+# mode: 'collections' keeps one Chroma store per uploaded document,
+#       'unified' stores every chunk in a single (optionally sharded) index
+VECTOR_INDEX_CONFIG = {
+    "mode": os.getenv("VECTOR_INDEX_MODE", "collections"),
+    "num_shards": int(os.getenv("VECTOR_INDEX_SHARDS", "1")),
+    # "chroma" (HNSW) or "numpy" (memory-mapped float32 matrix, exact search);
+    # the numpy backend always uses the unified index
+    "backend": os.getenv("VECTOR_INDEX_BACKEND", "chroma"),
+    # numpy backend only: "int8" or "float16" first-pass scan with exact re-scoring
+    "quantization": os.getenv("VECTOR_INDEX_QUANTIZATION") or None,
+    "rescore_factor": 4,         # candidates re-scored at full precision per result
+    "migrate_legacy": True  # import data/chroma_db/* into the unified index on startup
+}
+
+# Retrieval configuration
+RETRIEVAL_CONFIG = {
+    "top_k": 15,                 # chunks passed to the LLM after merging
+    "per_collection_k": 10,      # chunks requested from each collection
+    "max_workers": 8,            # concurrent collection searches
+    "collection_timeout": 2.0,   # seconds a single collection search may run
+    "deadline": 3.0,             # seconds to wait for the whole fan-out
+    "max_distance": 0.6          # drop chunks further than this (None disables)
+}
+
+# Prompt context assembly (context_packer.py)
+CONTEXT_CONFIG = {
+    "max_tokens": 4000,               # token budget for retrieved context
+    "near_duplicate_threshold": 0.85  # shingle similarity treated as a duplicate
+}
+
+# Embedding cache configuration (stored under the RAG data directory)
+EMBEDDING_CACHE_CONFIG = {
+    "enabled": True,
+    "file_name": "embedding_cache.sqlite",
+    "max_entries": 200_000  # ~1.2 GB of ada-002 vectors at most
+}
+
+# In-memory cache of question embeddings shared across requests
+QUERY_EMBEDDING_CACHE_CONFIG = {
+    "max_entries": 2048,
+    "ttl_seconds": 6 * 3600
+}
+
+# Semantic answer cache for policy questions
+ANSWER_CACHE_CONFIG = {
+    "enabled": True,
+    "similarity_threshold": 0.95,  # cosine similarity between question embeddings
+    "max_entries": 1000,
+    "ttl_seconds": 24 * 3600
+}
+
+# Embedding request scheduling
+EMBEDDING_SCHEDULER_CONFIG = {
+    "max_batch_tokens": 32_000,  # tokens per embedding request
+    "max_batch_size": 256,       # chunks per embedding request
+    "concurrency": 4,            # requests in flight
+    "max_retries": 6,            # retries per batch after a 429
+    "initial_backoff": 1.0,
+    "max_backoff": 60.0
+}
+
+# Streaming ingestion: chunks are embedded and stored window by window, so
+# memory is bounded by the window rather than the document size
+INGESTION_CONFIG = {
+    "window_chunks": 128,        # chunks embedded and written per window
+    "page_buffer_chars": 16_384  # extracted text buffered before splitting
+}
+
+# Background ingestion of uploaded documents (ingestion_jobs.py)
+INGESTION_JOBS_CONFIG = {
+    "file_name": "ingestion_jobs.json",
+    "bulk_file_name": "bulk_ingest_jobs.json",  # bulk (directory/zip) ingestion jobs
+    "workers": 1,                # documents ingested concurrently
+    "max_finished_jobs": 500     # completed/failed jobs kept for status queries
+}
+
+# Bulk ingestion pipeline (bulk_ingest.py): extraction processes, embedding
+# threads and the depth of the queues between the stages
+BULK_INGEST_CONFIG = {
+    "extract_workers": max(1, min(4, (os.cpu_count() or 2) - 1)),
+    "embed_workers": 2,
+    "queue_size": 4,
+    "max_archive_members": 5_000,       # files allowed in one uploaded zip
+    "max_archive_bytes": 2 * 1024 ** 3  # uncompressed bytes allowed in one zip
+}
+
+# Limits on how many per-document Chroma collections stay open at once;
+# least recently used collections are closed and reopened on demand
+COLLECTION_RESIDENCY_CONFIG = {
+    "max_open": int(os.getenv("MAX_OPEN_COLLECTIONS", "32")),
+    "max_bytes": 512 * 1024 * 1024,  # estimated resident index memory
+    "bytes_per_chunk": 10_240        # ada-002 vector, HNSW links and text
+}
+
+# Local intent router (intent_router.py) answering structured requests such
+# as the vacation balance directly from the tools, without the LLM agent
+INTENT_ROUTER_CONFIG = {
+    "enabled": True,
+    "min_confidence": 0.8,          # rule confidence needed to bypass the agent
+    "max_words": 12,                # longer messages always go to the agent
+    "embedding_classifier": False,  # also match by similarity to example phrasings
+    "classifier_threshold": 0.9     # cosine similarity needed for a classifier match
+}
+
+# How policy questions are answered:
+#   "agent"   - the agent picks PolicyQuery, then writes its own final answer (three LLM calls)
+#   "direct"  - recognised policy questions skip the agent; the RAG answer is returned as is (one call).
+#               Questions IntentRouter.is_policy_question misses still go through the agent, which
+#               picks PolicyQuery and returns its answer unchanged: two calls, logged as "direct/agent_fallback"
+#   "context" - PolicyQuery returns the retrieved context and the agent writes the answer (two calls)
+POLICY_ANSWER_CONFIG = {
+    "mode": os.getenv("POLICY_ANSWER_MODE", "agent")
+}
+
+CHAT_STORE_CONFIG = {
+    "file_name": "chat_history.sqlite",  # under data/
+    "migrate_json": True,                # import chat_history_<id>.json files on startup
+    "page_size": 50,                     # history messages per page by default
+    "max_page_size": 200
+}
+
+CONVERSATION_MEMORY_CONFIG = {
+    "window_messages": 10,          # recent messages sent to the agent verbatim
+    "summary_batch": 10,            # messages past the window before the summary is refreshed
+    "max_prompt_tokens": 1500,      # cap on chat history tokens (summary + messages) per turn
+    "max_summary_tokens": 400
+}
+
 # Default admin credentials (for demo purposes)
 DEFAULT_ADMIN = {
     "username": "admin",
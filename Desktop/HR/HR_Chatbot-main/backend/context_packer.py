@@ -0,0 +1,243 @@
+# context_packer.py
+
+import hashlib
+import threading
+import logging
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple, Set
+
+from langchain_core.documents import Document
+
+from embedding_cache import normalize_text
+from embedding_scheduler import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Passage:
+    """One or more adjacent chunks of the same document"""
+    text: str
+    metadata: Dict[str, Any]
+    distance: float
+    first_chunk: Optional[int]
+    last_chunk: Optional[int]
+    chunk_count: int = 1
+    shingles: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class PackedContext:
+    """Context assembled for one prompt"""
+    text: str
+    documents: List[Document]
+    tokens: int
+    original_tokens: int
+    duplicates_dropped: int
+    chunks_merged: int
+
+
+def _chunk_index(metadata: Dict[str, Any]) -> Optional[int]:
+    try:
+        return int(metadata.get("chunk_id"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _document_key(metadata: Dict[str, Any]) -> Any:
+    """Stable id of the document a chunk was cut from (its content hash when known)."""
+    return metadata.get("document_id") or metadata.get("collection_id") or metadata.get("document_title")
+
+
+def _shingles(text: str, size: int = 5) -> Set[str]:
+    return {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+
+
+def join_overlapping(first: str, second: str, max_overlap: int = 400) -> str:
+    """Concatenate two consecutive chunks, dropping the text they share."""
+    for size in range(min(max_overlap, len(first), len(second)), 0, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
+
+
+class ContextPacker:
+    """Builds the LLM context from retrieved chunks under a token budget.
+
+    Exact duplicates (e.g. the same chunk from a document and a merged
+    collection) and near-duplicates are dropped, the closest chunks are
+    packed first until the budget is used, and consecutive chunks of one
+    document are then joined without their shared overlap.
+    """
+
+    def __init__(self, max_tokens: int = 4000, near_duplicate_threshold: float = 0.85,
+                 separator: str = "\n\n"):
+        """
+        Initialize the packer.
+
+        Args:
+            max_tokens: Token budget for the packed context
+            near_duplicate_threshold: Shingle Jaccard similarity above which
+                a passage counts as a duplicate of a better-ranked one
+            separator: Text placed between passages
+        """
+        self.max_tokens = max_tokens
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.separator = separator
+
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def _merge_adjacent(self, passages: List[_Passage]) -> Tuple[List[_Passage], int]:
+        """Join consecutive chunks of the same document into one passage."""
+        by_document: Dict[Any, List[_Passage]] = {}
+        merged = []
+        for passage in passages:
+            if passage.first_chunk is None:
+                merged.append(passage)
+            else:
+                by_document.setdefault(_document_key(passage.metadata), []).append(passage)
+
+        merged_count = 0
+        for group in by_document.values():
+            group.sort(key=lambda p: p.first_chunk)
+            current = group[0]
+            for passage in group[1:]:
+                if passage.first_chunk == current.last_chunk + 1:
+                    current.text = join_overlapping(current.text, passage.text)
+                    current.last_chunk = passage.last_chunk
+                    current.distance = min(current.distance, passage.distance)
+                    current.chunk_count += passage.chunk_count
+                    if "page_end" in passage.metadata:
+                        current.metadata["page_end"] = passage.metadata["page_end"]
+                    merged_count += 1
+                else:
+                    merged.append(current)
+                    current = passage
+            merged.append(current)
+        return merged, merged_count
+
+    @staticmethod
+    def _neighbour(passage: _Passage, selected: Dict[Tuple[Any, int], _Passage]) -> Optional[_Passage]:
+        """A selected chunk directly before or after `passage` in the same document."""
+        if passage.first_chunk is None:
+            return None
+        document = _document_key(passage.metadata)
+        return selected.get((document, passage.first_chunk - 1)) or selected.get((document, passage.first_chunk + 1))
+
+    def _cost(self, passage: _Passage, selected: Dict[Tuple[Any, int], _Passage]) -> int:
+        """Tokens a chunk adds to the context; shared overlap with a selected neighbour is free."""
+        neighbour = self._neighbour(passage, selected)
+        if neighbour is None:
+            return count_tokens(passage.text)
+        if neighbour.first_chunk < passage.first_chunk:
+            return count_tokens(join_overlapping(neighbour.text, passage.text)[len(neighbour.text):])
+        joined = join_overlapping(passage.text, neighbour.text)
+        return count_tokens(joined[:len(joined) - len(neighbour.text)])
+
+    def _is_near_duplicate(self, passage: _Passage, kept: List[_Passage]) -> bool:
+        for other in kept:
+            union = len(passage.shingles | other.shingles)
+            if union and len(passage.shingles & other.shingles) / union >= self.near_duplicate_threshold:
+                return True
+        return False
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text down to roughly `max_tokens` tokens."""
+        tokens = count_tokens(text)
+        if tokens <= max_tokens:
+            return text
+        return text[:max(0, int(len(text) * max_tokens / tokens))]
+
+    def pack(self, hits: List[Tuple[Document, float]]) -> PackedContext:
+        """
+        Assemble the context for one question.
+
+        Args:
+            hits: Retrieved (document, distance) pairs; lower distance is better
+
+        Returns:
+            PackedContext with the text to put in the prompt and the passages used
+        """
+        original_tokens = count_tokens("\n".join(doc.page_content for doc, _ in hits))
+
+        # Exact duplicates: keep the closest copy
+        seen = set()
+        passages = []
+        for doc, distance in sorted(hits, key=lambda hit: hit[1]):
+            digest = hashlib.sha1(normalize_text(doc.page_content).encode('utf-8')).hexdigest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            index = _chunk_index(doc.metadata)
+            passages.append(_Passage(
+                text=doc.page_content,
+                metadata=dict(doc.metadata),
+                distance=distance,
+                first_chunk=index,
+                last_chunk=index
+            ))
+        duplicates = len(hits) - len(passages)
+
+        # Closest chunks first; neighbours of a selected chunk cost only
+        # their non-overlapping text, since they are joined afterwards
+        selected: Dict[Tuple[Any, int], _Passage] = {}
+        chosen: List[_Passage] = []
+        used_tokens = 0
+        separator_tokens = count_tokens(self.separator)
+        for passage in passages:
+            passage.shingles = _shingles(normalize_text(passage.text))
+            if self._is_near_duplicate(passage, chosen):
+                duplicates += 1
+                continue
+            tokens = self._cost(passage, selected) + (separator_tokens if chosen else 0)
+            if used_tokens + tokens > self.max_tokens:
+                if chosen:
+                    # A smaller, lower-ranked chunk may still fit
+                    continue
+                passage.text = self._truncate(passage.text, self.max_tokens)
+                tokens = count_tokens(passage.text)
+            chosen.append(passage)
+            used_tokens += tokens
+            if passage.first_chunk is not None:
+                selected[(_document_key(passage.metadata), passage.first_chunk)] = passage
+
+        packed, merged = self._merge_adjacent(chosen)
+        packed.sort(key=lambda p: p.distance)
+
+        text = self.separator.join(p.text for p in packed)
+        documents = [
+            Document(page_content=p.text, metadata=dict(p.metadata, merged_chunks=p.chunk_count))
+            for p in packed
+        ]
+        result = PackedContext(
+            text=text,
+            documents=documents,
+            tokens=count_tokens(text),
+            original_tokens=original_tokens,
+            duplicates_dropped=duplicates,
+            chunks_merged=merged
+        )
+
+        with self._lock:
+            self.queries += 1
+            self.tokens_in += original_tokens
+            self.tokens_out += result.tokens
+        logger.info(
+            f"Context packer: {len(hits)} chunks -> {len(packed)} passages, "
+            f"{original_tokens} -> {result.tokens} tokens "
+            f"(saved {original_tokens - result.tokens}; {duplicates} duplicates dropped, {merged} merged)"
+        )
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return token savings across all packed queries."""
+        return {
+            "queries": self.queries,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "tokens_saved": self.tokens_in - self.tokens_out,
+            "avg_tokens_out": self.tokens_out / self.queries if self.queries else 0.0
+        }
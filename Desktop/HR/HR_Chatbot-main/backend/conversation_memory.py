@@ -0,0 +1,239 @@
+# conversation_memory.py
+
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from chat_store import ChatStore
+from embedding_scheduler import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """لخص المحادثة التالية بين موظف ومساعد الموارد البشرية في فقرة قصيرة.
+احتفظ بالحقائق المهمة فقط: رقم الموظف، التواريخ، أنواع الإجازات، أرقام التذاكر، القرارات والطلبات المعلقة.
+
+الملخص السابق:
+{summary}
+
+الرسائل الجديدة:
+{messages}
+
+الملخص المحدث:"""
+
+
+class ConversationMemory:
+    """Bounded chat history for the agent prompt.
+
+    The agent sees the most recent messages verbatim plus a rolling summary
+    of everything older. The summary is kept in the chat store together
+    with the id of the last message it covers, and is extended in the
+    background with each batch of messages that falls out of the window, so
+    a turn never waits on it. The history sent with a turn is capped at
+    `max_prompt_tokens`.
+    """
+
+    # Most messages sent to the LLM in one summary refresh
+    SUMMARY_STEP = 50
+
+    def __init__(self, llm, store: ChatStore, window_messages: int = 10,
+                 summary_batch: int = 10, max_prompt_tokens: int = 1500,
+                 max_summary_tokens: int = 400):
+        """
+        Initialize the memory.
+
+        Args:
+            llm: Chat model used to write the summaries
+            store: Chat store holding the messages and summaries
+            window_messages: Recent messages sent verbatim
+            summary_batch: Messages outside the window that trigger a summary refresh
+            max_prompt_tokens: Cap on history tokens (summary and messages) per turn
+            max_summary_tokens: Longer summaries are cut to this size
+        """
+        self.llm = llm
+        self.store = store
+        self.window_messages = window_messages
+        self.summary_batch = summary_batch
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_summary_tokens = max_summary_tokens
+
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.turns = 0
+        self.trimmed_turns = 0
+        self.prompt_tokens = 0
+        self.max_turn_tokens = 0
+        self.summaries = 0
+        self.summary_errors = 0
+        self.summary_seconds = 0.0
+
+    def load_summary(self, employee_id: str) -> Dict[str, Any]:
+        """Return the stored summary and the id of the last message it covers"""
+        try:
+            return self.store.summary(employee_id)
+        except Exception as e:
+            logger.error(f"Error reading chat summary for {employee_id}: {str(e)}")
+        return {"summary": "", "last_message_id": 0}
+
+    @staticmethod
+    def _to_message(msg: Dict[str, Any]):
+        if msg["type"] == "user":
+            return HumanMessage(content=msg["content"])
+        return AIMessage(content=msg["content"])
+
+    def build(self, employee_id: Optional[str]) -> Tuple[List, Dict[str, Any]]:
+        """
+        Build the chat_history messages for one turn.
+
+        Only the newest window_messages + summary_batch messages after the
+        summary watermark are read, through the (employee_id, id) index, so
+        the cost of a turn does not grow with the history.
+
+        Returns:
+            (messages, report) where report gives the message and token counts sent
+        """
+        if not employee_id:
+            state, pending = {"summary": "", "last_message_id": 0}, []
+        else:
+            state = self.load_summary(employee_id)
+            # Messages not yet in the summary; while a refresh is pending they
+            # can exceed the window, the token cap below still applies
+            pending = self.store.recent(
+                employee_id, self.window_messages + self.summary_batch, after_id=state["last_message_id"]
+            )
+        summary = state["summary"]
+        budget = self.max_prompt_tokens
+
+        summary_message = None
+        summary_tokens = 0
+        if summary:
+            content = f"ملخص المحادثة السابقة: {summary}"
+            summary_tokens = count_tokens(content)
+            if summary_tokens > budget // 2:
+                # Never let the summary crowd out the recent messages
+                content = content[:len(content) * (budget // 2) // summary_tokens]
+                summary_tokens = count_tokens(content)
+            summary_message = SystemMessage(content=content)
+            budget -= summary_tokens
+
+        recent = []
+        recent_tokens = 0
+        for msg in reversed(pending):
+            tokens = count_tokens(msg["content"])
+            if recent and recent_tokens + tokens > budget:
+                break
+            recent.append(msg)
+            recent_tokens += tokens
+        recent.reverse()
+
+        messages = ([summary_message] if summary_message else []) + [self._to_message(msg) for msg in recent]
+        trimmed = len(recent) < min(len(pending), self.window_messages)
+        report = {
+            "loaded_messages": len(pending),
+            "sent_messages": len(recent),
+            "summarized_through": state["last_message_id"],
+            "summary_tokens": summary_tokens,
+            "history_tokens": summary_tokens + recent_tokens,
+            "trimmed": trimmed
+        }
+
+        with self._lock:
+            self.turns += 1
+            self.prompt_tokens += report["history_tokens"]
+            self.max_turn_tokens = max(self.max_turn_tokens, report["history_tokens"])
+            if trimmed:
+                self.trimmed_turns += 1
+        logger.info(
+            f"Chat memory for {employee_id}: {len(recent)}/{len(pending)} messages, "
+            f"summary through {state['last_message_id']}, {report['history_tokens']} tokens"
+        )
+        return messages, report
+
+    def maybe_refresh(self, employee_id: Optional[str]):
+        """Fold messages that left the window into the summary, in the background"""
+        if not employee_id:
+            return
+        state = self.load_summary(employee_id)
+        # Refresh once a full batch past the window is unsummarized; reads at
+        # most window + batch rows
+        unsummarized = self.store.page(
+            employee_id, cursor=state["last_message_id"],
+            limit=self.window_messages + self.summary_batch, direction='newer'
+        )["messages"]
+        if len(unsummarized) < self.window_messages + self.summary_batch:
+            return
+        with self._lock:
+            if employee_id in self._refreshing:
+                return
+            self._refreshing.add(employee_id)
+        threading.Thread(
+            target=self._refresh,
+            args=(employee_id, state),
+            name=f"chat-summary-{employee_id}",
+            daemon=True
+        ).start()
+
+    def _refresh(self, employee_id: str, state: Dict[str, Any]):
+        """Fold the unsummarized messages before the window into the summary"""
+        try:
+            summary = state["summary"]
+            last_message_id = state["last_message_id"]
+            window = self.store.recent(employee_id, self.window_messages)
+            window_start = int(window[0]["id"]) if window else 0
+            # A long backlog (e.g. history from before the summary existed) is
+            # read and folded a batch at a time, each saved as it completes
+            step = max(self.summary_batch, self.SUMMARY_STEP)
+            while True:
+                started_at = time.monotonic()
+                batch = [
+                    msg for msg in self.store.page(
+                        employee_id, cursor=last_message_id, limit=step, direction='newer'
+                    )["messages"]
+                    if int(msg["id"]) < window_start
+                ]
+                if not batch:
+                    break
+                transcript = "\n".join(
+                    f"{'الموظف' if msg['type'] == 'user' else 'المساعد'}: {msg['content']}"
+                    for msg in batch
+                )
+                response = self.llm.invoke(SUMMARY_PROMPT.format(
+                    summary=summary or "لا يوجد",
+                    messages=transcript
+                ))
+                summary = getattr(response, "content", str(response)).strip()
+                tokens = count_tokens(summary)
+                if tokens > self.max_summary_tokens:
+                    summary = summary[:len(summary) * self.max_summary_tokens // tokens]
+                last_message_id = int(batch[-1]["id"])
+                self.store.save_summary(employee_id, summary, last_message_id)
+                elapsed = time.monotonic() - started_at
+                with self._lock:
+                    self.summaries += 1
+                    self.summary_seconds += elapsed
+                logger.info(
+                    f"Chat summary for {employee_id} now covers messages up to {last_message_id} ({elapsed:.2f}s)"
+                )
+        except Exception as e:
+            with self._lock:
+                self.summary_errors += 1
+            logger.error(f"Error summarizing chat history for {employee_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(employee_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return history token usage per turn and summary refresh counters."""
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "avg_history_tokens": self.prompt_tokens / self.turns if self.turns else 0.0,
+                "max_history_tokens": self.max_turn_tokens,
+                "max_prompt_tokens": self.max_prompt_tokens,
+                "trimmed_turns": self.trimmed_turns,
+                "summaries": self.summaries,
+                "summary_errors": self.summary_errors,
+                "avg_summary_ms": self.summary_seconds / self.summaries * 1000 if self.summaries else 0.0
+            }
@@ -0,0 +1,139 @@
+# document_extractor.py
+
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+import config
+
+
+class DocumentExtractor:
+    """Extracts and splits document text; holds no API clients, so it is cheap
+    to create in worker processes"""
+
+    def __init__(self):
+        """Initialize the text splitter."""
+        # Configure text splitter for Arabic and English
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=2048,
+            chunk_overlap=200,
+            length_function=len,
+            separators=["\n\n", "\n", ".", "!", "?", "؟", "،", " "]
+        )
+
+    def _extract_text(self, file_path: str) -> str:
+        """Extract text from different document types."""
+        file_type = Path(file_path).suffix.lower()
+        
+        try:
+            if file_type == '.pdf':
+                return self._extract_pdf_text(file_path)
+            elif file_type in ['.docx', '.doc']:
+                return self._extract_word_text(file_path)
+            elif file_type == '.txt':
+                return self._extract_txt_text(file_path)
+            else:
+                raise ValueError(f"Unsupported file type: {file_type}")
+                
+        except Exception as e:
+            raise Exception(f"Error extracting text: {str(e)}")
+
+    def _extract_pdf_text(self, file_path: str) -> str:
+        """Extract text from PDF files."""
+        try:
+            return "\n\n".join(text for _, text in self._iter_pdf_pages(file_path))
+                
+        except Exception as e:
+            raise Exception(f"Error extracting PDF text: {str(e)}")
+
+    def _iter_pdf_pages(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text) one PDF page at a time."""
+        from langchain_community.document_loaders import PyPDFLoader
+        loader = PyPDFLoader(file_path) # or parser="pypdfium"
+        for index, doc in enumerate(loader.lazy_load()):
+            yield doc.metadata.get("page", index) + 1, doc.page_content
+
+    def iter_pages(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text); only PDFs have more than one page."""
+        if Path(file_path).suffix.lower() == '.pdf':
+            try:
+                yield from self._iter_pdf_pages(file_path)
+            except Exception as e:
+                raise Exception(f"Error extracting PDF text: {str(e)}")
+        else:
+            yield 1, self._extract_text(file_path)
+
+    def _extract_word_text(self, file_path: str) -> str:
+        """Extract text from Word documents."""
+        try:
+            from docx import Document
+            
+            doc = Document(file_path)
+            text = ""
+            for paragraph in doc.paragraphs:
+                text += paragraph.text + "\n"
+            return text
+            
+        except Exception as e:
+            raise Exception(f"Error extracting Word text: {str(e)}")
+
+    def _extract_txt_text(self, file_path: str) -> str:
+        """Extract text from txt files."""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                return file.read()
+        except Exception as e:
+            raise Exception(f"Error extracting text file text: {str(e)}")
+
+    def iter_chunks(self, file_path: str) -> Iterator[Tuple[str, Dict[str, int]]]:
+        """
+        Split a document page by page into (chunk, page info) pairs.
+
+        Pages are buffered only until the buffer holds `page_buffer_chars` of
+        text. The last chunk of every split is carried into the next one, so
+        chunks still span page breaks as they did when the whole text was split.
+        """
+        buffer_limit = config.INGESTION_CONFIG["page_buffer_chars"]
+        buffer = ""
+        page_starts: List[Tuple[int, int]] = []  # (offset in buffer, page number)
+
+        def page_at(offset: int) -> int:
+            page = page_starts[0][1]
+            for start, number in page_starts:
+                if start > offset:
+                    break
+                page = number
+            return page
+
+        def split(final: bool) -> Iterator[Tuple[str, Dict[str, int]]]:
+            nonlocal buffer, page_starts
+            chunks = self.text_splitter.split_text(buffer)
+            carry = None if final or not chunks else chunks.pop()
+            cursor = 0
+            for chunk in chunks:
+                start = buffer.find(chunk, cursor)
+                start = cursor if start < 0 else start
+                yield chunk, {"page": page_at(start), "page_end": page_at(start + len(chunk) - 1)}
+                # Chunks overlap, so the next one may start before this one ends
+                cursor = start + 1
+
+            if carry is None:
+                buffer, page_starts = "", []
+                return
+            tail = buffer.find(carry, cursor)
+            tail = cursor if tail < 0 else tail
+            page_starts = [(0, page_at(tail))] + [
+                (start - tail, number) for start, number in page_starts if start > tail
+            ]
+            buffer = buffer[tail:]
+
+        for page_number, text in self.iter_pages(file_path):
+            if buffer:
+                buffer += "\n\n"
+            page_starts.append((len(buffer), page_number))
+            buffer += text
+            if len(buffer) >= buffer_limit:
+                yield from split(final=False)
+        if buffer.strip():
+            yield from split(final=True)
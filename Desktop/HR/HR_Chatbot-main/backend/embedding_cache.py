@@ -0,0 +1,240 @@
+# embedding_cache.py
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, List, Dict, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize chunk text so cosmetic differences share a cache entry."""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class CachedEmbeddings(Embeddings):
+    """Disk-backed, content-addressed cache in front of an embedding model.
+
+    Vectors are keyed by (model name, sha256 of the normalized text) in a
+    SQLite file, so re-ingesting unchanged chunks costs no API calls. The
+    least recently used entries are evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache_path: Path, max_entries: int = 200_000):
+        """Wrap `embeddings` with a cache stored at `cache_path`."""
+        self.embeddings = embeddings
+        self.model_name = getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.cache_path = Path(cache_path)
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Fetch cached vectors for `keys` and mark them as recently used."""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items: Dict[str, List[float]]):
+        """Persist new vectors and evict the least recently used overflow."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+            )
+            added = self._conn.total_changes - before
+            if added < len(items):
+                # Keys stored meanwhile (e.g. by another worker) keep their vector
+                # and only count as recently used
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ? AND last_access < ?",
+                    [(now, key, now) for key in items]
+                )
+            self._size += added
+            if self._size > self.max_entries:
+                # Other processes may write to the same file; count before evicting
+                self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                overflow = self._size - self.max_entries
+                if overflow > 0:
+                    cursor = self._conn.execute(
+                        """DELETE FROM embeddings WHERE key IN (
+                            SELECT key FROM embeddings ORDER BY last_access LIMIT ?
+                        )""",
+                        (overflow,)
+                    )
+                    self._size -= cursor.rowcount
+                    self.evictions += cursor.rowcount
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed chunks, calling the model only for texts not in the cache."""
+        keys = [self._key(text) for text in texts]
+        cached = self._lookup(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        uncached = sum(1 for key in keys if key not in cached)
+        self.hits += len(keys) - uncached
+        self.misses += uncached
+        logger.info(f"Embedding cache: {len(keys) - uncached} hits, {len(missing)} texts to embed")
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Queries are short-lived, so they go straight to the model."""
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> Dict[str, float]:
+        """Return cache counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class QueryEmbeddingCache:
+    """Process-wide LRU cache of question embeddings with a TTL.
+
+    Concurrent lookups for the same question share one in-flight embedding
+    call, and repeated questions within `ttl_seconds` skip the API entirely.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 6 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def get_or_compute(self, model_name: str, text: str,
+                       compute: Callable[[str], List[float]]) -> List[float]:
+        """Return the cached embedding of `text`, computing it at most once."""
+        key = f"{model_name}:{normalize_text(text)}"
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            vector = compute(text)
+        except Exception as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        future.set_result(vector)
+        return vector
+
+    def stats(self) -> Dict[str, float]:
+        """Return cache counters."""
+        lookups = self.hits + self.misses + self.shared
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_in_flight": self.shared,
+            "hit_rate": (self.hits + self.shared) / lookups if lookups else 0.0
+        }
+
+
+# Shared by every RAG system in the process
+query_embedding_cache = QueryEmbeddingCache(**config.QUERY_EMBEDDING_CACHE_CONFIG)
@@ -0,0 +1,160 @@
+# embedding_scheduler.py
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Callable, Optional, Tuple, Dict, Any
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to a character estimate
+    _ENCODING = None
+
+ProgressCallback = Callable[[int, int, float], None]
+
+
+def count_tokens(text: str) -> int:
+    """Count (or estimate) the tokens an embedding request will use."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Recognise a 429 from the embedding API, whatever client raised it."""
+    if type(error).__name__ == "RateLimitError":
+        return True
+    if getattr(error, "status_code", None) == 429:
+        return True
+    return "429" in str(error) or "rate limit" in str(error).lower()
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Read the server's Retry-After hint if the error carries one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingScheduler:
+    """Embeds chunks in token-bounded batches with bounded concurrency.
+
+    Batches run on a thread pool. A rate-limit response pauses every worker
+    for an adaptive backoff (doubling on consecutive 429s, honouring
+    Retry-After) and the batch is retried.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch_tokens: int = 32_000,
+                 max_batch_size: int = 256, concurrency: int = 4, max_retries: int = 6,
+                 initial_backoff: float = 1.0, max_backoff: float = 60.0):
+        """Initialize the scheduler in front of `embeddings`."""
+        self.embeddings = embeddings
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._backoff = 0.0
+        self._paused_until = 0.0
+        self.rate_limited = 0
+        self.last_run: Dict[str, Any] = {}
+
+    def make_batches(self, texts: List[str]) -> List[Tuple[int, int]]:
+        """Pack consecutive texts into (start, end) ranges under the token budget."""
+        batches = []
+        start, tokens = 0, 0
+        for i, text in enumerate(texts):
+            text_tokens = count_tokens(text)
+            if i > start and (tokens + text_tokens > self.max_batch_tokens
+                              or i - start >= self.max_batch_size):
+                batches.append((start, i))
+                start, tokens = i, 0
+            tokens += text_tokens
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    def _wait_if_paused(self):
+        with self._lock:
+            delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, backing off and retrying on rate limits."""
+        for attempt in range(self.max_retries + 1):
+            self._wait_if_paused()
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+                with self._lock:
+                    # Recover gradually after a successful call
+                    self._backoff /= 2
+                return vectors
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.rate_limited += 1
+                    self._backoff = min(
+                        self.max_backoff,
+                        max(self.initial_backoff, self._backoff * 2)
+                    )
+                    delay = _retry_after(e) or self._backoff
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                logger.warning(f"Embedding rate limited, backing off {delay:.1f}s (attempt {attempt + 1})")
+
+    def embed(self, texts: List[str], progress_callback: Optional[ProgressCallback] = None) -> List[List[float]]:
+        """
+        Embed all texts, preserving order.
+
+        Args:
+            texts: Chunks to embed
+            progress_callback: Called as (done_chunks, total_chunks, chunks_per_sec)
+                after every completed batch
+
+        Returns:
+            One vector per input text
+        """
+        batches = self.make_batches(texts)
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        started_at = time.monotonic()
+        done = 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed") as executor:
+            futures = {
+                executor.submit(self._embed_batch, texts[start:end]): (start, end)
+                for start, end in batches
+            }
+            for future in as_completed(futures):
+                start, end = futures[future]
+                vectors[start:end] = future.result()
+                done += end - start
+                rate = done / max(time.monotonic() - started_at, 1e-6)
+                if progress_callback:
+                    progress_callback(done, len(texts), rate)
+
+        elapsed = time.monotonic() - started_at
+        self.last_run = {
+            "chunks": len(texts),
+            "batches": len(batches),
+            "seconds": elapsed,
+            "chunks_per_sec": len(texts) / elapsed if elapsed > 0 else 0.0,
+            "rate_limited": self.rate_limited
+        }
+        logger.info(
+            f"Embedded {len(texts)} chunks in {len(batches)} batches "
+            f"({self.last_run['chunks_per_sec']:.1f} chunks/sec)"
+        )
+        return vectors
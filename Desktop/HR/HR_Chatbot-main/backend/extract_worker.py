@@ -0,0 +1,52 @@
+# extract_worker.py
+#
+# Process-pool entry points for bulk ingestion. Spawned workers import this
+# module, so it must stay light: no Flask app, agent, vector store or API
+# clients, only the document extractor.
+
+import time
+from typing import Optional, Tuple
+
+from document_extractor import DocumentExtractor
+
+# One extractor per worker process, created on first use
+_extractor: Optional[DocumentExtractor] = None
+
+
+def extract_windows(file_path: str, job_index: int, windows, window_chunks: int) -> Tuple[int, int, float]:
+    """
+    Extract and split one document, handing it over window by window.
+
+    Each window is put on `windows` as (job_index, offset, texts, pages) as
+    soon as it holds `window_chunks` chunks, so a worker never holds more
+    than one window of a document. `windows` is a bounded manager queue:
+    while the embedders are behind, put() blocks and extraction pauses.
+
+    Returns:
+        (chunk count, window count, seconds spent extracting)
+    """
+    global _extractor
+    if _extractor is None:
+        _extractor = DocumentExtractor()
+    started_at = time.monotonic()
+    blocked = 0.0
+    chunks, window_count = 0, 0
+    texts, pages = [], []
+
+    def hand_over():
+        nonlocal blocked, window_count, texts, pages
+        put_started = time.monotonic()
+        windows.put((job_index, chunks - len(texts), texts, pages))
+        blocked += time.monotonic() - put_started
+        window_count += 1
+        texts, pages = [], []
+
+    for text, page_info in _extractor.iter_chunks(file_path):
+        texts.append(text)
+        pages.append(page_info)
+        chunks += 1
+        if len(texts) >= window_chunks:
+            hand_over()
+    if texts:
+        hand_over()
+    return chunks, window_count, time.monotonic() - started_at - blocked
@@ -0,0 +1,194 @@
+# ingestion_jobs.py
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Takes (file_path, progress_callback, **options), returns the job result
+# (the collection id for single documents), raises on failure
+IngestFunction = Callable[..., Any]
+
+FINISHED_STATUSES = ('completed', 'failed')
+
+
+class IngestionJobQueue:
+    """Background queue of document ingestion jobs with persisted state.
+
+    Each job records its status, stage, progress, chunk counts and error in a
+    JSON file, so it can be polled while it runs and is still known after a
+    restart. Jobs that were queued or running when the process stopped are
+    queued again on start(). Each job id is on the work queue at most once,
+    and a worker claims a job by switching it from queued to running under
+    the lock, so a job never runs twice.
+    """
+
+    def __init__(self, ingest: IngestFunction, jobs_path: Path, workers: int = 1,
+                 max_finished_jobs: int = 500, save_interval: float = 1.0,
+                 result_field: str = 'collection_id'):
+        """
+        Initialize the queue.
+
+        Args:
+            ingest: Function that ingests one file
+            jobs_path: JSON file holding the job states
+            workers: Number of background worker threads
+            max_finished_jobs: Finished jobs kept before the oldest are dropped
+            save_interval: Minimum seconds between progress-only saves
+            result_field: Job field that receives the return value of `ingest`
+        """
+        self.ingest = ingest
+        self.jobs_path = Path(jobs_path)
+        self.workers = workers
+        self.max_finished_jobs = max_finished_jobs
+        self.save_interval = save_interval
+        self.result_field = result_field
+
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._queued: Set[str] = set()
+        self._threads: List[threading.Thread] = []
+        self._last_save = 0.0
+        self.jobs: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Read the persisted job states."""
+        if not self.jobs_path.exists():
+            return {}
+        try:
+            with open(self.jobs_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading ingestion jobs: {str(e)}")
+            return {}
+
+    def _save(self):
+        """Atomically rewrite the job file; caller holds the lock."""
+        finished = sorted(
+            (job for job in self.jobs.values() if job['status'] in FINISHED_STATUSES),
+            key=lambda job: job['updated_at']
+        )
+        for job in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job['job_id']]
+
+        self.jobs_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.jobs_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.jobs, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.jobs_path)
+        self._last_save = time.monotonic()
+
+    def _enqueue(self, job_id: str):
+        """Put a job on the work queue unless it is already there; caller holds the lock."""
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put(job_id)
+
+    def _update(self, job_id: str, force_save: bool = True, **fields):
+        with self._lock:
+            job = self.jobs[job_id]
+            job.update(fields, updated_at=datetime.now().isoformat())
+            if force_save or time.monotonic() - self._last_save >= self.save_interval:
+                self._save()
+
+    def start(self):
+        """Start the workers and re-queue jobs interrupted by a restart."""
+        with self._lock:
+            if self._threads:
+                return
+            interrupted = sorted(
+                (job for job in self.jobs.values()
+                 if job['status'] not in FINISHED_STATUSES and job['job_id'] not in self._queued),
+                key=lambda job: job['created_at']
+            )
+            for job in interrupted:
+                job.update(status='queued', stage='queued', progress=0.0)
+                self._enqueue(job['job_id'])
+            if interrupted:
+                self._save()
+                logger.info(f"Re-queued {len(interrupted)} interrupted ingestion jobs")
+
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"ingest-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, file_path: str, **options) -> Dict[str, Any]:
+        """Queue a file for ingestion and return its job record; `options` are passed to `ingest`."""
+        now = datetime.now().isoformat()
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'file_path': file_path,
+            'options': options,
+            'filename': os.path.basename(file_path),
+            'status': 'queued',
+            'stage': 'queued',
+            'progress': 0.0,
+            'chunks_embedded': 0,
+            'chunks_total': 0,
+            'chunks_per_sec': 0.0,
+            self.result_field: None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        with self._lock:
+            self.jobs[job['job_id']] = job
+            self._save()
+            self._enqueue(job['job_id'])
+            job = dict(job)
+        self.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception as e:
+                logger.error(f"Ingestion job {job_id} crashed: {str(e)}")
+
+    def _run(self, job_id: str):
+        """Run one job, reporting progress from the embedding scheduler."""
+        with self._lock:
+            self._queued.discard(job_id)
+            job = self.jobs.get(job_id)
+            if job is None or job['status'] != 'queued':
+                return
+            job.update(status='running', stage='extracting', updated_at=datetime.now().isoformat())
+            self._save()
+            job = dict(job)
+        started_at = time.monotonic()
+
+        def on_progress(embedded: int, seen: int, rate: float):
+            # Extraction runs ahead of embedding, so the total grows until the end
+            self._update(
+                job_id, force_save=False, stage='embedding',
+                chunks_embedded=embedded, chunks_total=seen, chunks_per_sec=rate,
+                progress=embedded / seen if seen else 0.0
+            )
+
+        try:
+            result = self.ingest(job['file_path'], on_progress, **job.get('options', {}))
+            self._update(
+                job_id, status='completed', stage='done', progress=1.0,
+                seconds=round(time.monotonic() - started_at, 3), **{self.result_field: result}
+            )
+            logger.info(f"Ingestion job {job_id} completed: {job['filename']}")
+        except Exception as e:
+            self._update(job_id, status='failed', stage='failed', error=str(e),
+                         seconds=round(time.monotonic() - started_at, 3))
+            logger.error(f"Ingestion job {job_id} failed: {str(e)}")
@@ -0,0 +1,120 @@
+# ingestion_manifest.py
+
+import csv
+import hashlib
+import os
+import threading
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Return the sha256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    """Persistent record of which document files have been ingested.
+
+    Maps each file path to its content hash, size, mtime and the collection
+    holding its chunks, so unchanged files can be skipped on restart or
+    re-upload.
+    """
+
+    FIELDS = ['file_path', 'content_hash', 'size', 'mtime', 'collection_id', 'ingested_at']
+
+    def __init__(self, manifest_path: Path):
+        """Load the manifest stored at `manifest_path` (a CSV file)."""
+        self.manifest_path = Path(manifest_path)
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, str]] = self._load()
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return str(Path(file_path).resolve())
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        """Read the manifest file if it exists."""
+        entries = {}
+        if not self.manifest_path.exists():
+            return entries
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8', newline='') as f:
+                for row in csv.DictReader(f):
+                    entries[row['file_path']] = row
+        except Exception as e:
+            logger.error(f"Error reading ingestion manifest: {str(e)}")
+        return entries
+
+    def _save(self):
+        """Atomically rewrite the manifest file."""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+            writer.writeheader()
+            writer.writerows(self.entries.values())
+        os.replace(tmp_path, self.manifest_path)
+
+    def get(self, file_path: str) -> Optional[Dict[str, str]]:
+        return self.entries.get(self._key(file_path))
+
+    def check(self, file_path: str) -> Tuple[str, Optional[Dict[str, str]], Optional[str]]:
+        """
+        Compare a file against its manifest entry.
+
+        Size and mtime are checked first; the content is only hashed when they
+        differ, so unchanged files cost one stat call.
+
+        Returns:
+            (status, entry, content_hash) where status is 'new', 'unchanged'
+            or 'modified'. content_hash is None when hashing was not needed.
+        """
+        entry = self.get(file_path)
+        if entry is None:
+            return 'new', None, None
+
+        stat = os.stat(file_path)
+        if int(entry['size']) == stat.st_size and float(entry['mtime']) == stat.st_mtime:
+            return 'unchanged', entry, entry['content_hash']
+
+        content_hash = hash_file(file_path)
+        if content_hash == entry['content_hash']:
+            # Touched but not changed: remember the new mtime
+            with self._lock:
+                entry['size'] = str(stat.st_size)
+                entry['mtime'] = repr(stat.st_mtime)
+                self._save()
+            return 'unchanged', entry, content_hash
+        return 'modified', entry, content_hash
+
+    def record(self, file_path: str, collection_id: str, content_hash: Optional[str] = None):
+        """Record that `file_path` has been ingested into `collection_id`."""
+        stat = os.stat(file_path)
+        with self._lock:
+            self.entries[self._key(file_path)] = {
+                'file_path': self._key(file_path),
+                'content_hash': content_hash or hash_file(file_path),
+                'size': str(stat.st_size),
+                'mtime': repr(stat.st_mtime),
+                'collection_id': collection_id,
+                'ingested_at': datetime.now().isoformat()
+            }
+            self._save()
+
+    def remove_collection(self, collection_id: str):
+        """Forget every file whose chunks lived in `collection_id`."""
+        with self._lock:
+            stale = [k for k, e in self.entries.items() if e['collection_id'] == collection_id]
+            for key in stale:
+                del self.entries[key]
+            if stale:
+                self._save()
@@ -0,0 +1,344 @@
+# intent_router.py
+
+import math
+import re
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DIACRITICS = re.compile(r"[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+_LETTER_VARIANTS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي"})
+
+TICKET_STATUS_LABELS = {
+    "pending": "قيد المراجعة",
+    "approved": "تمت الموافقة",
+    "rejected": "مرفوض",
+    "open": "مفتوحة",
+    "closed": "مغلقة"
+}
+
+
+def normalize_arabic(text: str) -> str:
+    """Fold the spelling variants users type: diacritics, tatweel, alef/yaa/taa forms, digits."""
+    text = _DIACRITICS.sub("", text)
+    text = text.translate(_LETTER_VARIANTS).translate(_ARABIC_DIGITS).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+@dataclass
+class IntentRule:
+    """A normalized-text pattern voting for an intent"""
+    intent: str
+    pattern: str
+    confidence: float
+
+
+# Patterns are matched against normalize_arabic() output
+DEFAULT_RULES = [
+    IntentRule("vacation_balance", r"\bرصيد(ي|ه)? (ال)?اجاز(ه|ات|اتي|تي)\b", 0.95),
+    IntentRule("vacation_balance", r"\bرصيدي\b", 0.85),
+    IntentRule("vacation_balance", r"\bكم (يوم|ايام) (باقي|متبقي|بقي|تبقي|متبقيه|باقيه)", 0.95),
+    IntentRule("vacation_balance", r"\b(ايام|يوم) اجازتي (ال)?(متبقيه|الباقيه|باقيه)\b", 0.9),
+    IntentRule("vacation_balance", r"\bكم (باقي|بقي|تبقي) (لي|عندي) (من )?(ال)?اجاز", 0.9),
+    IntentRule("vacation_balance", r"\b(vacation|leave) balance\b", 0.9),
+    IntentRule("my_requests", r"\bو?(طلباتي|تذاكري)\b", 0.9),
+    IntentRule("my_requests", r"\bحاله (طلبي|طلباتي|تذكرتي|تذاكري)\b", 0.9),
+    IntentRule("my_requests", r"\b(طلبات|تذاكر) (ال)?اجاز(ه|ات) (الخاصه بي|حقي|حقتي)\b", 0.85),
+    IntentRule("my_requests", r"\bmy (requests|tickets)\b", 0.9),
+]
+
+# Action verbs as verbal nouns, imperatives and first person (normalized, so انشئ is انشي)
+_ACTION_VERBS = (
+    r"تقديم|انشاء|الغاء|تعديل|حذف|سحب|تغيير"
+    r"|قدم|انشي|اطلب|الغ|الغي|عدل|احذف|اسحب"
+    r"|اقدم|اعدل|اغير"
+)
+# Requests, tickets and leaves, singular or plural, with or without a possessive suffix
+_ACTION_OBJECTS = r"(ال)?(طلب|طلبات|تذكره|تذكرت|تذاكر|اجازه|اجازت|اجازات)(ي|ه|ها|نا|كم)?"
+
+# Wording that means the user wants to act, not read data
+ACTION_BLOCKERS = [
+    r"\b(اريد|ابغي|ابغا|ابي|بدي|ودي|اود|حاب) (ان )?(" + _ACTION_VERBS + r")\b",
+    r"\b(" + _ACTION_VERBS + r") (لي )?" + _ACTION_OBJECTS + r"\b",
+    r"\b(cancel|modify|change|edit|update|delete|withdraw|submit|apply|create|book)\b",
+]
+
+# ... or wants to ask about policy
+DEFAULT_BLOCKERS = ACTION_BLOCKERS + [
+    r"\b(سياسه|سياسات|لائحه|نظام|قانون|يحق|لماذا|ليش|كيف يتم|كيف احسب)\b",
+    r"\b(policy|policies|rules|entitled|eligible|why)\b",
+]
+
+# Wording marking a question about HR policy, answered from the documents
+DEFAULT_POLICY_TERMS = [
+    r"\b(سياسه|سياسات|لائحه|نظام|قانون|انظمه|لوائح|شروط|اجراءات|policy|policies)\b",
+    r"\b(يحق|يسمح|مسموح|يجوز|استحق|استحقاق|تعويض|بدل|مكافاه|خصم|entitled|eligible)\b",
+    r"\b(مده|مدت|كم (يوم|ايام|ساعه|ساعات|شهر|اشهر)|عدد (ال)?ايام|(ال)?حد (ال)?(اقصي|ادني)|ساعات (ال)?عمل|how many days|duration)\b",
+    r"\b(ال)?(اجازه|اجازات) (ال)?(سنويه|مرضيه|امومه|اموميه|ابوه|زواج|وفاه|حج|دراسيه|استثنائيه|اضطراريه|عارضه|بدون راتب)\b",
+]
+# Wording about the employee's own numbers, which the documents cannot answer
+_PERSONAL_WORDS = re.compile(
+    r"\b(رصيد|رصيدي|باقي|متبقي|بقي|تبقي|عندي|لدي|طلبي|طلباتي|تذكرتي|تذاكري|اجازتي|balance)\b"
+)
+_QUESTION_WORDS = re.compile(r"\b(ما|ماهي|ماهو|كم|هل|كيف|متي|لماذا|ليش|وش|ايش|what|how|can|when)\b")
+
+# Example phrasings for the optional embedding classifier
+DEFAULT_EXAMPLES = {
+    "vacation_balance": [
+        "كم رصيد اجازتي",
+        "كم يوم اجازة باقي لي",
+        "ما هو رصيدي من الاجازات السنوية",
+        "ابغى اعرف كم يوم متبقي من اجازتي",
+    ],
+    "my_requests": [
+        "اعرض طلباتي",
+        "ما هي حالة طلب الاجازة الذي قدمته",
+        "وش صار على طلبي",
+        "اريد رؤية تذاكري السابقة",
+    ],
+}
+
+
+@dataclass
+class RoutedAnswer:
+    """Answer produced without the agent"""
+    intent: str
+    answer: str
+    confidence: float
+    method: str
+    latency_ms: float
+
+
+class EmbeddingIntentClassifier:
+    """Nearest-example intent classifier over sentence embeddings.
+
+    Example phrasings are embedded once, on first use; a message is
+    assigned the intent of its most similar example.
+    """
+
+    def __init__(self, embed: Callable[[str], List[float]],
+                 examples: Optional[Dict[str, List[str]]] = None):
+        """
+        Initialize the classifier.
+
+        Args:
+            embed: Function embedding one text (e.g. a cached embed_query)
+            examples: Example phrasings per intent
+        """
+        self.embed = embed
+        self.examples = examples or DEFAULT_EXAMPLES
+        self._vectors: Optional[List[Tuple[str, List[float]]]] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cosine(a: List[float], b: List[float]) -> float:
+        dot = sum(x * y for x, y in zip(a, b))
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        return dot / norm if norm else 0.0
+
+    def classify(self, text: str) -> Tuple[Optional[str], float]:
+        """Return (intent, similarity) of the closest example."""
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = [
+                    (intent, self.embed(normalize_arabic(example)))
+                    for intent, phrasings in self.examples.items()
+                    for example in phrasings
+                ]
+        vector = self.embed(text)
+        best_intent, best_score = None, 0.0
+        for intent, example_vector in self._vectors:
+            score = self._cosine(vector, example_vector)
+            if score > best_score:
+                best_intent, best_score = intent, score
+        return best_intent, float(best_score)
+
+
+class IntentRouter:
+    """Answers structured requests directly from the tools, bypassing the agent.
+
+    Messages are normalized and matched against keyword/pattern rules; an
+    optional embedding classifier covers phrasings the rules miss. Only a
+    confident, unambiguous match for a known employee is answered here.
+    Everything else (and any tool error) falls through to the agent.
+    """
+
+    def __init__(self, vacation_tool, ticket_tool, min_confidence: float = 0.8,
+                 max_words: int = 12, classifier: Optional[EmbeddingIntentClassifier] = None,
+                 classifier_threshold: float = 0.9, rules: Optional[List[IntentRule]] = None,
+                 blockers: Optional[List[str]] = None, policy_terms: Optional[List[str]] = None):
+        """
+        Initialize the router.
+
+        Args:
+            vacation_tool: VacationTool answering balance questions
+            ticket_tool: TicketTool listing an employee's requests
+            min_confidence: Rule confidence needed to answer directly
+            max_words: Longer messages are left to the agent
+            classifier: Optional embedding classifier consulted when no rule matches
+            classifier_threshold: Similarity needed for a classifier match
+            rules, blockers, policy_terms: Override the default patterns
+        """
+        self.vacation_tool = vacation_tool
+        self.ticket_tool = ticket_tool
+        self.min_confidence = min_confidence
+        self.max_words = max_words
+        self.classifier = classifier
+        self.classifier_threshold = classifier_threshold
+        self.rules = [(rule, re.compile(rule.pattern)) for rule in (rules or DEFAULT_RULES)]
+        self.blockers = [re.compile(pattern) for pattern in (blockers or DEFAULT_BLOCKERS)]
+        self.action_blockers = [re.compile(pattern) for pattern in ACTION_BLOCKERS]
+        self.policy_terms = [re.compile(pattern) for pattern in (policy_terms or DEFAULT_POLICY_TERMS)]
+        self.handlers = {
+            "vacation_balance": self._answer_balance,
+            "my_requests": self._answer_requests,
+        }
+
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.routed: Dict[str, int] = {}
+        self.fallthrough: Dict[str, int] = {}
+        self.route_seconds = 0.0
+
+    def classify(self, message: str) -> Tuple[Optional[str], float, str]:
+        """
+        Classify a message.
+
+        Returns:
+            (intent, confidence, method); intent is None with the fall-through reason as method
+        """
+        text = normalize_arabic(message)
+        if not text:
+            return None, 0.0, "empty"
+        if len(text.split()) > self.max_words:
+            return None, 0.0, "too_long"
+        if any(blocker.search(text) for blocker in self.blockers):
+            return None, 0.0, "blocked"
+
+        scores: Dict[str, float] = {}
+        for rule, pattern in self.rules:
+            if pattern.search(text):
+                scores[rule.intent] = max(scores.get(rule.intent, 0.0), rule.confidence)
+        if len(scores) > 1:
+            return None, 0.0, "ambiguous"
+        if scores:
+            intent, confidence = next(iter(scores.items()))
+            if confidence >= self.min_confidence:
+                return intent, confidence, "rules"
+            return None, confidence, "low_confidence"
+
+        if self.classifier is not None:
+            try:
+                intent, similarity = self.classifier.classify(text)
+            except Exception as e:
+                logger.error(f"Intent classifier failed: {str(e)}")
+                return None, 0.0, "classifier_error"
+            if intent is not None and similarity >= self.classifier_threshold:
+                return intent, similarity, "embedding"
+            return None, similarity, "low_confidence"
+        return None, 0.0, "no_match"
+
+    def is_policy_question(self, message: str) -> bool:
+        """
+        Whether `message` is a question about HR policy that the documents answer.
+
+        Requires a policy term and a question, no request to act, and no
+        structured-intent match or balance wording (those need the
+        employee's own data).
+        """
+        text = normalize_arabic(message)
+        if not text or not any(term.search(text) for term in self.policy_terms):
+            return False
+        if not (_QUESTION_WORDS.search(text) or message.rstrip().endswith(("?", "؟"))):
+            return False
+        if any(blocker.search(text) for blocker in self.action_blockers) or _PERSONAL_WORDS.search(text):
+            return False
+        return not any(pattern.search(text) for _, pattern in self.rules)
+
+    def route(self, message: str, employee_id: Optional[str]) -> Optional[RoutedAnswer]:
+        """Answer `message` directly if it is a confident structured request, else None."""
+        started_at = time.monotonic()
+        intent, confidence, method = self.classify(message)
+        answer = None
+        if intent is not None:
+            if not employee_id:
+                method = "missing_employee_id"
+            else:
+                answer = self.handlers[intent](employee_id)
+                if answer is None:
+                    method = "tool_error"
+        elapsed = time.monotonic() - started_at
+
+        with self._lock:
+            self.messages += 1
+            self.route_seconds += elapsed
+            if answer is not None:
+                self.routed[intent] = self.routed.get(intent, 0) + 1
+            else:
+                self.fallthrough[method] = self.fallthrough.get(method, 0) + 1
+
+        if answer is None:
+            return None
+        logger.info(f"Intent router: {intent} ({method}, {confidence:.2f}) answered in {elapsed * 1000:.1f} ms")
+        return RoutedAnswer(intent, answer, confidence, method, elapsed * 1000)
+
+    @staticmethod
+    def _days(value: Any) -> str:
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return str(value)
+        return str(int(value)) if value.is_integer() else f"{value:g}"
+
+    def _answer_balance(self, employee_id: str) -> Optional[str]:
+        result = self.vacation_tool.check_balance(employee_id)
+        if result.get("status") == "not_found":
+            return "لم يتم العثور على بيانات الموظف رقم " + str(employee_id)
+        if result.get("status") != "success":
+            return None
+        return (
+            f"رصيد إجازاتك السنوية: {self._days(result['annual_balance'])} يوماً\n"
+            f"الأيام المستخدمة: {self._days(result['used_days'])} يوماً\n"
+            f"الرصيد المتبقي: {self._days(result['remaining_balance'])} يوماً\n"
+            f"(آخر تحديث: {result['last_updated']})"
+        )
+
+    def _answer_requests(self, employee_id: str) -> Optional[str]:
+        result = self.ticket_tool.get_employee_tickets(employee_id)
+        if result.get("status") != "success":
+            return None
+        tickets = result.get("tickets") or []
+        if not tickets:
+            return "لا توجد لديك طلبات حالياً."
+        lines = [f"عدد طلباتك: {len(tickets)}"]
+        for ticket in tickets:
+            status = TICKET_STATUS_LABELS.get(str(ticket.get("status")), ticket.get("status"))
+            if not ticket.get("request_type") and ticket.get("summary"):
+                # Support tickets share the store but have no dates
+                lines.append(f"- {ticket.get('ticket_id')}: {ticket.get('summary')} - الحالة: {status}")
+                continue
+            lines.append(
+                f"- {ticket.get('ticket_id')}: {ticket.get('request_type')} "
+                f"من {ticket.get('start_date')} إلى {ticket.get('end_date')} "
+                f"({self._days(ticket.get('days_count'))} أيام) - الحالة: {status}"
+            )
+        return "\n".join(lines)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return routing hit rate, per-intent and fall-through counts."""
+        with self._lock:
+            routed = sum(self.routed.values())
+            return {
+                "messages": self.messages,
+                "routed": routed,
+                "hit_rate": routed / self.messages if self.messages else 0.0,
+                "by_intent": dict(self.routed),
+                "fallthrough": dict(self.fallthrough),
+                "avg_route_ms": self.route_seconds / self.messages * 1000 if self.messages else 0.0
+            }
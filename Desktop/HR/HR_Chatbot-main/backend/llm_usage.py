@@ -0,0 +1,96 @@
+# llm_usage.py
+
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from embedding_scheduler import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUsageHandler(BaseCallbackHandler):
+    """Counts the LLM calls, tokens and tool calls of one request.
+
+    Token counts come from the model's usage metadata when it reports them
+    and are estimated from the prompt and output text otherwise.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tools: List[str] = []
+        self._prompt_estimates: Dict[UUID, int] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *,
+                            run_id: UUID, **kwargs: Any) -> None:
+        text = "\n".join(str(m.content) for batch in messages for m in batch)
+        self._prompt_estimates[run_id] = count_tokens(text)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *,
+                     run_id: UUID, **kwargs: Any) -> None:
+        self._prompt_estimates[run_id] = count_tokens("\n".join(prompts))
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self.llm_calls += 1
+        prompt_estimate = self._prompt_estimates.pop(run_id, 0)
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if usage:
+            self.prompt_tokens += usage.get("input_tokens", 0)
+            self.completion_tokens += usage.get("output_tokens", 0)
+        else:
+            self.prompt_tokens += prompt_estimate
+            self.completion_tokens += count_tokens(generation.text) if generation is not None else 0
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID,
+                      **kwargs: Any) -> None:
+        self.tools.append((serialized or {}).get("name", "tool"))
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+
+class UsageStats:
+    """Latency and token totals per answering path, for comparing modes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.paths: Dict[str, Dict[str, float]] = {}
+
+    def record(self, path: str, usage: LLMUsageHandler, seconds: Optional[float] = None):
+        """Add one answered request to the totals of `path` and log it."""
+        seconds = usage.elapsed() if seconds is None else seconds
+        with self._lock:
+            totals = self.paths.setdefault(path, {
+                "requests": 0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0
+            })
+            totals["requests"] += 1
+            totals["llm_calls"] += usage.llm_calls
+            totals["prompt_tokens"] += usage.prompt_tokens
+            totals["completion_tokens"] += usage.completion_tokens
+            totals["seconds"] += seconds
+        logger.info(
+            f"{path}: {usage.llm_calls} LLM call(s), {usage.prompt_tokens} prompt + "
+            f"{usage.completion_tokens} completion tokens, {seconds:.2f}s"
+        )
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Return per-path averages."""
+        with self._lock:
+            return {
+                path: {
+                    "requests": totals["requests"],
+                    "avg_llm_calls": totals["llm_calls"] / totals["requests"],
+                    "avg_prompt_tokens": totals["prompt_tokens"] / totals["requests"],
+                    "avg_completion_tokens": totals["completion_tokens"] / totals["requests"],
+                    "avg_latency_ms": totals["seconds"] / totals["requests"] * 1000
+                }
+                for path, totals in self.paths.items()
+            }
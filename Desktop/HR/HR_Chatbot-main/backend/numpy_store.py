@@ -0,0 +1,692 @@
+# numpy_store.py
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: one process per index is assumed there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# First-pass dtypes for quantized scans; full-precision vectors stay on disk
+QUANTIZATIONS = {"int8": np.int8, "float16": np.float16}
+
+# Rows converted to float32 at a time during a quantized scan
+SCAN_BLOCK_ROWS = 1024
+
+
+def matches_filter(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the subset of Chroma's `where` syntax used by the RAG system."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Exclusive lock on `path` held against every process using the index."""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class _MetaFile:
+    """Read handle on one meta.jsonl.
+
+    A snapshot keeps reading the file it opened, so its row offsets stay
+    valid after a compaction replaces meta.jsonl (POSIX rename semantics).
+    """
+
+    def __init__(self, path: Path):
+        self._file = open(path, 'rb')
+        self._lock = threading.Lock()
+
+    def lines(self, spans: Iterable[Tuple[int, int]]) -> List[bytes]:
+        """Raw records at the given (offset, length) spans."""
+        with self._lock:
+            result = []
+            for start, length in spans:
+                self._file.seek(start)
+                result.append(self._file.read(length))
+            return result
+
+    def scan(self, offset: int, count: int) -> List[bytes]:
+        """Up to `count` complete lines starting at byte `offset`."""
+        with self._lock:
+            self._file.seek(offset)
+            result = []
+            while len(result) < count:
+                line = self._file.readline()
+                if not line.endswith(b"\n"):
+                    # End of file, or a record still being written
+                    break
+                result.append(line)
+            return result
+
+    def __del__(self):
+        file = getattr(self, '_file', None)
+        if file is not None:
+            file.close()
+
+
+@dataclass(frozen=True)
+class _State:
+    """Rows visible to readers; a refresh builds a new state instead of changing this one."""
+    matrix: np.ndarray                   # float32 rows, memory-mapped
+    norms: np.ndarray
+    ids: List[str]
+    row_of: Dict[str, int]               # id -> row
+    collection_codes: np.ndarray         # per row, index into the collection's code table (-1: none)
+    starts: np.ndarray                   # byte offset of each row's meta.jsonl record
+    lengths: np.ndarray
+    meta: Optional[_MetaFile] = None
+    quantized: Optional[np.ndarray] = None
+    scales: Optional[np.ndarray] = None
+
+    @property
+    def rows(self) -> int:
+        return len(self.ids)
+
+    @property
+    def meta_end(self) -> int:
+        return int(self.starts[-1] + self.lengths[-1]) if self.rows else 0
+
+    def id_mask(self, ids: Iterable[str]) -> np.ndarray:
+        """Boolean row mask of the given ids, built from the id -> row lookup."""
+        mask = np.zeros(self.rows, dtype=bool)
+        mask[np.fromiter((self.row_of[i] for i in ids if i in self.row_of), dtype=np.int64)] = True
+        return mask
+
+    def records(self, rows: Iterable[int]) -> List[Dict[str, Any]]:
+        """Read the {"id", "document", "metadata"} records of some rows from disk."""
+        rows = list(rows)
+        if not rows:
+            return []
+        return [json.loads(line) for line in self.meta.lines(
+            (int(self.starts[r]), int(self.lengths[r])) for r in rows
+        )]
+
+    def iter_metadatas(self) -> Iterator[Dict[str, Any]]:
+        for start in range(0, self.rows, SCAN_BLOCK_ROWS):
+            for record in self.records(range(start, min(start + SCAN_BLOCK_ROWS, self.rows))):
+                yield record["metadata"]
+
+
+class NumpyCollection:
+    """Float32 embedding matrix memory-mapped from disk plus a JSON-lines sidecar.
+
+    Files under `path`:
+        vectors.f32   raw row-major float32 matrix, one row per chunk
+        norms.f32     squared L2 norm of every row
+        meta.jsonl    one {"id", "document", "metadata"} record per row
+        header.json   embedding dimension and compaction generation
+
+    The matrix is opened read-only with np.memmap, so worker processes share
+    its pages through the OS page cache. Appends go to the end of the files
+    and readers remap when the file grows; deletes rewrite the files.
+
+    Only ids (with an id -> row lookup for id filters), collection ids and
+    the byte offset of every sidecar record are kept in memory; documents
+    and metadata are read from meta.jsonl for the rows a query returns.
+    Readers work on an immutable _State: refreshes and deletes build a new
+    one under the lock and swap it in, so a query never sees arrays from
+    two different versions of the files.
+
+    With `quantization` set ("int8" or "float16") a compact copy of the
+    matrix (vectors.gN.int8 + scales.gN.f32, or vectors.gN.float16) is scanned first
+    and the best `rescore_factor * k` candidates are re-scored exactly
+    against the float32 rows, so only those rows of the full matrix are read.
+    """
+
+    def __init__(self, path: Path, quantization: Optional[str] = None, rescore_factor: int = 4):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.path / "vectors.f32"
+        self.norms_path = self.path / "norms.f32"
+        self.meta_path = self.path / "meta.jsonl"
+        self.header_path = self.path / "header.json"
+        self._lock = threading.RLock()
+
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.quantization = quantization
+        self.rescore_factor = max(1, int(rescore_factor))
+
+        self.dim: Optional[int] = None
+        self.generation = 0
+        self._header_mtime = None
+
+        # collection_id -> code; only grows, so older states stay valid
+        self._collection_codes: Dict[str, int] = {}
+        self._state = self._empty_state()
+        self._refresh()
+
+    # -- loading -----------------------------------------------------------
+
+    def _read_header(self) -> bool:
+        """Reload header.json if it changed; True when the files were compacted."""
+        try:
+            mtime = self.header_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._header_mtime:
+            return False
+        with open(self.header_path, 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        self._header_mtime = mtime
+        self.dim = header["dim"]
+        compacted = header.get("generation", 0) != self.generation
+        self.generation = header.get("generation", 0)
+        return compacted
+
+    def _write_header(self):
+        tmp_path = self.header_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"dim": self.dim, "generation": self.generation}, f)
+        os.replace(tmp_path, self.header_path)
+        self._header_mtime = self.header_path.stat().st_mtime_ns
+
+    def _quantized_paths(self) -> Tuple[Path, Path]:
+        """Compact copy files; named per generation so compaction never reuses them."""
+        return (self.path / f"vectors.g{self.generation}.{self.quantization}",
+                self.path / f"scales.g{self.generation}.f32")
+
+    def _empty_state(self) -> _State:
+        return _State(
+            matrix=np.zeros((0, self.dim or 0), dtype=np.float32),
+            norms=np.zeros(0, dtype=np.float32),
+            ids=[],
+            row_of={},
+            collection_codes=np.zeros(0, dtype=np.int32),
+            starts=np.zeros(0, dtype=np.int64),
+            lengths=np.zeros(0, dtype=np.int64)
+        )
+
+    def _rows_on_disk(self) -> int:
+        if self.dim is None or not self.vectors_path.exists():
+            return 0
+        return self.vectors_path.stat().st_size // (self.dim * 4)
+
+    def _collection_code(self, collection_id: Optional[str]) -> int:
+        if collection_id is None:
+            return -1
+        return self._collection_codes.setdefault(collection_id, len(self._collection_codes))
+
+    def _refresh(self) -> _State:
+        """
+        Map rows appended since the last call (possibly by another process).
+
+        Returns:
+            The current state, to be used for the whole of one read
+        """
+        with self._lock:
+            state = self._state
+            if self._read_header():
+                # Another instance compacted the files: reload from scratch
+                state = self._empty_state()
+            rows = self._rows_on_disk()
+            if rows < state.rows:
+                state = self._empty_state()
+            if rows == state.rows and state is self._state:
+                return state
+
+            meta = state.meta
+            if meta is None and rows:
+                meta = _MetaFile(self.meta_path)
+            ids, codes, starts, lengths = [], [], [], []
+            offset = state.meta_end
+            for line in (meta.scan(offset, rows - state.rows) if rows > state.rows else []):
+                record = json.loads(line)
+                ids.append(record["id"])
+                codes.append(self._collection_code((record.get("metadata") or {}).get("collection_id")))
+                starts.append(offset)
+                lengths.append(len(line))
+                offset += len(line)
+
+            rows = state.rows + len(ids)
+            matrix = (
+                np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+                if rows else np.zeros((0, self.dim or 0), dtype=np.float32)
+            )
+            quantized, scales = (
+                self._sync_quantized(matrix, rows)
+                if self.quantization is not None and self.dim is not None else (None, None)
+            )
+            self._state = _State(
+                matrix=matrix,
+                norms=(
+                    np.fromfile(self.norms_path, dtype=np.float32, count=rows)
+                    if rows else np.zeros(0, dtype=np.float32)
+                ),
+                ids=state.ids + ids,
+                row_of={**state.row_of, **{chunk_id: state.rows + i for i, chunk_id in enumerate(ids)}},
+                collection_codes=np.concatenate([state.collection_codes, np.array(codes, dtype=np.int32)]),
+                starts=np.concatenate([state.starts, np.array(starts, dtype=np.int64)]),
+                lengths=np.concatenate([state.lengths, np.array(lengths, dtype=np.int64)]),
+                meta=meta,
+                quantized=quantized,
+                scales=scales
+            )
+            return self._state
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Quantize float32 rows; int8 uses one symmetric scale per row."""
+        if self.quantization == "float16":
+            return vectors.astype(np.float16), None
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def _sync_quantized(self, matrix: np.ndarray, rows: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Quantize rows missing from the compact copy, then map it.
+
+        Readers in every worker process call this from `_refresh`, so the
+        check and the append run under a file lock: otherwise two processes
+        could both truncate to the same row and interleave their writes.
+        """
+        quantized_path, scales_path = self._quantized_paths()
+        itemsize = np.dtype(QUANTIZATIONS[self.quantization]).itemsize
+
+        def complete_rows() -> int:
+            done = quantized_path.stat().st_size // (self.dim * itemsize) if quantized_path.exists() else 0
+            if self.quantization == "int8":
+                done = min(done, scales_path.stat().st_size // 4 if scales_path.exists() else 0)
+            return done
+
+        if complete_rows() < rows:
+            with _file_lock(self.path / "quantize.lock"):
+                # Re-read under the lock: another process may have caught up
+                done = complete_rows()
+                if done < rows:
+                    self._append_quantized(matrix, done, rows, quantized_path, scales_path, itemsize)
+                    logger.info(f"Quantized {rows - done} rows to {self.quantization} in {self.path}")
+
+        # Rows past `rows` may still be written by another process; only the
+        # complete prefix is mapped, and appends never touch it
+        dtype = QUANTIZATIONS[self.quantization]
+        quantized = (
+            np.memmap(quantized_path, dtype=dtype, mode='r', shape=(rows, self.dim))
+            if rows else np.zeros((0, self.dim), dtype=dtype)
+        )
+        scales = (
+            np.fromfile(scales_path, dtype=np.float32, count=rows)
+            if self.quantization == "int8" else None
+        )
+        return quantized, scales
+
+    def _append_quantized(self, matrix: np.ndarray, done: int, rows: int,
+                          quantized_path: Path, scales_path: Path, itemsize: int):
+        """Append rows `done:rows` to the compact copy; call with the file lock held."""
+        # Built incrementally from the float32 matrix, so enabling
+        # quantization on an existing index needs no re-embedding
+        with open(quantized_path, 'r+b' if quantized_path.exists() else 'wb') as qf:
+            # Drops a partial row left by a writer that died mid-append
+            qf.truncate(done * self.dim * itemsize)
+            qf.seek(0, os.SEEK_END)
+            sf = None
+            if self.quantization == "int8":
+                sf = open(scales_path, 'r+b' if scales_path.exists() else 'wb')
+            try:
+                if sf is not None:
+                    sf.truncate(done * 4)
+                    sf.seek(0, os.SEEK_END)
+                for start in range(done, rows, SCAN_BLOCK_ROWS):
+                    quantized, scales = self._quantize(np.asarray(matrix[start:start + SCAN_BLOCK_ROWS]))
+                    quantized.tofile(qf)
+                    if sf is not None:
+                        scales.tofile(sf)
+            finally:
+                if sf is not None:
+                    sf.close()
+
+    def resident_bytes(self) -> int:
+        """Bytes the first-pass scan touches: the compact copy, or the full matrix."""
+        state = self._refresh()
+        if state.quantized is not None:
+            return state.quantized.nbytes + (state.scales.nbytes if state.scales is not None else 0)
+        return state.matrix.nbytes
+
+    def _mask(self, state: _State, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Boolean row mask for a filter; None when every row matches."""
+        if not where:
+            return None
+        condition = where.get("collection_id") if len(where) == 1 else None
+        if isinstance(condition, str):
+            return state.collection_codes == self._collection_codes.get(condition, -2)
+        if isinstance(condition, dict) and list(condition) == ["$in"]:
+            codes = [self._collection_codes[c] for c in condition["$in"] if c in self._collection_codes]
+            return np.isin(state.collection_codes, codes)
+        # Any other filter reads the metadata of every row from the sidecar
+        return np.fromiter(
+            (matches_filter(m, where) for m in state.iter_metadatas()),
+            dtype=bool, count=state.rows
+        )
+
+    # -- Chroma collection API subset --------------------------------------
+
+    def count(self) -> int:
+        return self._refresh().rows
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+            metadatas: List[Dict[str, Any]]):
+        """Append rows to the matrix and sidecar."""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or not len(vectors):
+            return
+        with self._lock:
+            self._read_header()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._write_header()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index ({self.dim})")
+
+            # Sidecar first: rows only become visible once their vectors exist
+            with open(self.meta_path, 'a', encoding='utf-8') as f:
+                for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                    f.write(json.dumps(
+                        {"id": chunk_id, "document": document, "metadata": metadata or {}},
+                        ensure_ascii=False
+                    ) + "\n")
+            with open(self.norms_path, 'ab') as f:
+                np.einsum('ij,ij->i', vectors, vectors).astype(np.float32).tofile(f)
+            with open(self.vectors_path, 'ab') as f:
+                vectors.tofile(f)
+            self._refresh()
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None) -> Dict[str, Any]:
+        """Fetch stored rows, optionally filtered and paged."""
+        state = self._refresh()
+        include = include or ["documents", "metadatas"]
+        mask = self._mask(state, where)
+        rows = np.arange(state.rows) if mask is None else np.flatnonzero(mask)
+        if ids is not None:
+            rows = rows[state.id_mask(ids)[rows]]
+        start = offset or 0
+        rows = rows[start:start + limit] if limit is not None else rows[start:]
+
+        records = state.records(rows) if "documents" in include or "metadatas" in include else []
+        return {
+            "ids": [state.ids[r] for r in rows],
+            "embeddings": np.asarray(state.matrix[rows]) if "embeddings" in include else None,
+            "documents": [rec["document"] for rec in records] if "documents" in include else None,
+            "metadatas": [rec["metadata"] for rec in records] if "metadatas" in include else None
+        }
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """Remove rows by id or filter, compacting the files."""
+        with self._lock:
+            state = self._refresh()
+            if ids is None and where is None:
+                return
+            mask = self._mask(state, where)
+            drop = np.zeros(state.rows, dtype=bool) if ids is not None or mask is None else mask
+            if ids is not None:
+                drop |= state.id_mask(ids)
+            if not drop.any():
+                return
+
+            # Write the compacted copies next to the originals block by block,
+            # then swap them in; readers keep the state they already hold
+            keep = np.flatnonzero(~drop)
+            targets = (self.meta_path, self.norms_path, self.vectors_path)
+            tmp_paths = [target.with_suffix(target.suffix + '.tmp') for target in targets]
+            with open(tmp_paths[0], 'wb') as mf, open(tmp_paths[1], 'wb') as nf, open(tmp_paths[2], 'wb') as vf:
+                for start in range(0, len(keep), SCAN_BLOCK_ROWS):
+                    block = keep[start:start + SCAN_BLOCK_ROWS]
+                    mf.writelines(state.meta.lines(
+                        (int(state.starts[r]), int(state.lengths[r])) for r in block
+                    ))
+                    state.norms[block].tofile(nf)
+                    np.asarray(state.matrix[block]).tofile(vf)
+            for tmp_path, target in zip(tmp_paths, targets):
+                os.replace(tmp_path, target)
+
+            # Readers in other processes reload when the generation changes;
+            # compact copies of the old generation are rebuilt on demand
+            self.generation += 1
+            self._write_header()
+            current = set(self._quantized_paths()) if self.quantization is not None else set()
+            with _file_lock(self.path / "quantize.lock"):
+                for stale in list(self.path.glob("vectors.g*.*")) + list(self.path.glob("scales.g*.f32")):
+                    if stale not in current:
+                        stale.unlink()
+            self._state = self._empty_state()
+            self._refresh()
+
+    def _top_k(self, state: _State, embedding: List[float], k: int,
+               where: Optional[Dict[str, Any]] = None,
+               ids: Optional[Iterable[str]] = None) -> List[Tuple[int, float]]:
+        if not state.rows:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = float(query @ query)
+        if state.quantized is None:
+            distances = state.norms + query_norm - 2.0 * (state.matrix @ query)
+        else:
+            distances = state.norms + query_norm - 2.0 * self._approximate_scores(state, query)
+        mask = self._mask(state, where)
+        if ids is not None:
+            in_ids = state.id_mask(ids)
+            mask = in_ids if mask is None else mask & in_ids
+        if mask is not None:
+            distances = np.where(mask, distances, np.inf)
+
+        if state.quantized is not None:
+            pool = min(k * self.rescore_factor, len(distances))
+            candidates = np.sort(np.argpartition(distances, pool - 1)[:pool])
+            candidates = candidates[np.isfinite(distances[candidates])]
+            # Exact distances from the float32 rows, read only for the candidates
+            exact = state.norms[candidates] + query_norm - 2.0 * (np.asarray(state.matrix[candidates]) @ query)
+            order = np.argsort(exact)[:k]
+            return [(int(candidates[i]), float(exact[i])) for i in order]
+
+        k = min(k, len(distances))
+        candidates = np.argpartition(distances, k - 1)[:k]
+        candidates = candidates[np.argsort(distances[candidates])]
+        return [(int(r), float(distances[r])) for r in candidates if np.isfinite(distances[r])]
+
+    def query(self, embedding: List[float], k: int, where: Optional[Dict[str, Any]] = None,
+              ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Top-k by squared L2 distance (the same metric as Chroma's default).
+
+        One matrix-vector product scores every row; argpartition picks the k
+        best without sorting the whole array. When quantized, that pass runs
+        over the compact copy and its candidates are re-scored exactly.
+        `ids` restricts the search to those rows.
+
+        Returns:
+            (id, distance) pairs, closest first
+        """
+        state = self._refresh()
+        return [(state.ids[r], distance) for r, distance in self._top_k(state, embedding, k, where, ids)]
+
+    def search(self, embedding: List[float], k: int, where: Optional[Dict[str, Any]] = None,
+               ids: Optional[Iterable[str]] = None) -> List[Tuple[str, str, Dict[str, Any], float]]:
+        """Like query(), with the document and metadata of each hit read from the same state."""
+        state = self._refresh()
+        hits = self._top_k(state, embedding, k, where, ids)
+        records = state.records(r for r, _ in hits)
+        return [
+            (record["id"], record["document"], record["metadata"], distance)
+            for record, (_, distance) in zip(records, hits)
+        ]
+
+    def _approximate_scores(self, state: _State, query: np.ndarray) -> np.ndarray:
+        """Dot products of the query with every quantized row, block by block."""
+        scores = np.empty(state.rows, dtype=np.float32)
+        # Reused float32 buffer: converts one cache-sized block at a time
+        buffer = np.empty((SCAN_BLOCK_ROWS, self.dim), dtype=np.float32)
+        for start in range(0, len(scores), SCAN_BLOCK_ROWS):
+            block = state.quantized[start:start + SCAN_BLOCK_ROWS]
+            np.copyto(buffer[:len(block)], block, casting='unsafe')
+            scores[start:start + len(block)] = buffer[:len(block)] @ query
+        if state.scales is not None:
+            scores *= state.scales
+        return scores
+
+
+class NumpyVectorStore(VectorStore):
+    """LangChain vector store backed by a memory-mapped NumpyCollection.
+
+    Exposes the collection as `_collection`, like the Chroma wrapper, so the
+    vector index helpers work with either backend.
+    """
+
+    def __init__(self, persist_directory: str, embedding_function: Embeddings,
+                 quantization: Optional[str] = None, rescore_factor: int = 4):
+        self._collection = NumpyCollection(
+            Path(persist_directory), quantization=quantization, rescore_factor=rescore_factor
+        )
+        self._embedding_function = embedding_function
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[Dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self._collection.add(
+            ids=ids,
+            embeddings=self._embedding_function.embed_documents(texts),
+            documents=texts,
+            metadatas=metadatas or [{} for _ in texts]
+        )
+        return ids
+
+    def similarity_search_by_vector_with_relevance_scores(
+            self, embedding: List[float], k: int = 4,
+            filter: Optional[Dict[str, Any]] = None, ids: Optional[Iterable[str]] = None,
+            **kwargs: Any) -> List[Tuple[Document, float]]:
+        return [
+            (Document(page_content=document, metadata=metadata), distance)
+            for _, document, metadata, distance in self._collection.search(embedding, k, where=filter, ids=ids)
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(
+            self._embedding_function.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search(self, query: str, k: int = 4,
+                          filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings,
+                   metadatas: Optional[List[Dict]] = None, persist_directory: str = "./numpy_store",
+                   **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(persist_directory=persist_directory, embedding_function=embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=kwargs.get("ids"))
+        return store
+
+
+def recall_latency_report(path: Path, queries: np.ndarray, k: int = 10,
+                          quantizations: Iterable[str] = ("int8", "float16"),
+                          rescore_factor: int = 4) -> Dict[str, Dict[str, float]]:
+    """
+    Compare quantized search against the unquantized index stored at `path`.
+
+    Args:
+        path: Directory of a NumpyCollection (e.g. a npy_shard_XX directory)
+        queries: Query embeddings, one per row
+        k: Number of results compared
+        quantizations: Quantized modes to evaluate
+        rescore_factor: Candidates re-scored per result
+
+    Returns:
+        Per mode: recall@k against exact search, mean/p95 latency in ms and
+        the bytes scanned by the first pass
+    """
+    exact_store = NumpyCollection(path)
+    stores = {"float32": exact_store}
+    for mode in quantizations:
+        stores[mode] = NumpyCollection(path, quantization=mode, rescore_factor=rescore_factor)
+
+    truth = [{chunk_id for chunk_id, _ in exact_store.query(q, k)} for q in queries]
+    report = {}
+    for mode, store in stores.items():
+        latencies, found = [], 0
+        for q, expected in zip(queries, truth):
+            started_at = time.perf_counter()
+            hits = store.query(q, k)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+            found += len(expected & {chunk_id for chunk_id, _ in hits})
+        report[mode] = {
+            "recall_at_k": found / max(1, sum(len(t) for t in truth)),
+            "mean_ms": float(np.mean(latencies)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "scan_bytes": store.resident_bytes()
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs latency of quantized vector search")
+    parser.add_argument("path", help="NumPy shard directory, e.g. data/vector_index_numpy/npy_shard_00")
+    parser.add_argument("--queries", type=int, default=200, help="number of sampled queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    # Stored vectors with a little noise stand in for real question embeddings
+    collection = NumpyCollection(Path(args.path))
+    rng = np.random.default_rng(0)
+    sample = rng.choice(collection.count(), size=min(args.queries, collection.count()), replace=False)
+    vectors = np.asarray(collection._refresh().matrix[np.sort(sample)])
+    vectors = vectors + rng.normal(scale=0.01, size=vectors.shape).astype(np.float32)
+
+    print(json.dumps(
+        recall_latency_report(Path(args.path), vectors, k=args.k, rescore_factor=args.rescore_factor),
+        indent=2
+    ))
@@ -1,18 +1,33 @@
 # rag_system.py
 
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import google.generativeai as genai
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 from langchain.document_loaders import PyPDFLoader
 from langchain_openai import OpenAIEmbeddings , ChatOpenAI  # Import OpenAIEmbeddings
+import config
+from embedding_cache import CachedEmbeddings, query_embedding_cache
+from ingestion_manifest import IngestionManifest, hash_file
+from embedding_scheduler import EmbeddingScheduler, ProgressCallback
+from collection_catalog import CollectionCatalog, LazyCollectionMap
+from answer_cache import SemanticAnswerCache
+from context_packer import ContextPacker
+from document_extractor import DocumentExtractor
+from vector_index import (
+    ShardedVectorIndex,
+    merge_top_k,
+    add_embeddings_in_batches
+)
 
 
 
@@ -31,18 +46,11 @@ class DocumentMetadata:
     page_count: int
     status: str  # 'processing', 'active', 'error'
     error_message: Optional[str] = None
+    content_hash: Optional[str] = None
     last_updated: str = datetime.now().isoformat()
 
-@dataclass
-class ProcessedDocument:
-    """Processed document information"""
-    chunks: List[str]
-    metadata: DocumentMetadata
-    collection_path: str
-    total_chunks: int
-    embedding_status: str  # 'pending', 'completed', 'error'
-
-class DocumentProcessor:
+
+class DocumentProcessor(DocumentExtractor):
     """Handles document processing and embedding"""
     
     def __init__(self, google_api_key: str, openai_api_key: str, base_path: str = "./data"):
@@ -56,115 +64,29 @@ class DocumentProcessor:
             api_key=self.openai_api_key,
             model="text-embedding-ada-002"
         )
-        
-        # Configure text splitter for Arabic and English
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2048,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", ".", "!", "?", "؟", "،", " "]
+        if config.EMBEDDING_CACHE_CONFIG["enabled"]:
+            # Unchanged chunks are served from disk instead of the API
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                Path(base_path) / config.EMBEDDING_CACHE_CONFIG["file_name"],
+                max_entries=config.EMBEDDING_CACHE_CONFIG["max_entries"]
+            )
+
+        # Batches embedding requests and adapts to rate limits
+        self.embedding_scheduler = EmbeddingScheduler(
+            self.embeddings, **config.EMBEDDING_SCHEDULER_CONFIG
         )
         
+        # Text splitter for Arabic and English
+        super().__init__()
+
         # Ensure directory structure exists
         self.docs_path = Path(base_path) / "documents"
         self.chroma_path = Path(base_path) / "chroma_db"
         self.docs_path.mkdir(parents=True, exist_ok=True)
         self.chroma_path.mkdir(parents=True, exist_ok=True)
 
-    def process_document(self, file_path: str) -> ProcessedDocument:
-        """
-        Process a document and prepare it for embedding.
-        
-        Args:
-            file_path: Path to the document file
-            
-        Returns:
-            ProcessedDocument object containing chunks and metadata
-        """
-        try:
-            logger.info(f"Starting document processing: {file_path}")
-            
-            # Extract text based on file type
-            text = self._extract_text(file_path)
-            
-            # Create document metadata
-            metadata = self._create_metadata(file_path)
-            
-            # Split text into chunks
-            chunks = self.text_splitter.split_text(text)
-            
-            # Create collection path
-            collection_path = self.chroma_path / metadata.collection_id
-            
-            # Create processed document
-            processed_doc = ProcessedDocument(
-                chunks=chunks,
-                metadata=metadata,
-                collection_path=str(collection_path),
-                total_chunks=len(chunks),
-                embedding_status='pending'
-            )
-            
-            logger.info(f"Document processed successfully: {metadata.collection_id}")
-            return processed_doc
-            
-        except Exception as e:
-            error_msg = f"Error processing document: {str(e)}"
-            logger.error(error_msg)
-            raise Exception(error_msg)
-
-    def _extract_text(self, file_path: str) -> str:
-        """Extract text from different document types."""
-        file_type = Path(file_path).suffix.lower()
-        
-        try:
-            if file_type == '.pdf':
-                return self._extract_pdf_text(file_path)
-            elif file_type in ['.docx', '.doc']:
-                return self._extract_word_text(file_path)
-            elif file_type == '.txt':
-                return self._extract_txt_text(file_path)
-            else:
-                raise ValueError(f"Unsupported file type: {file_type}")
-                
-        except Exception as e:
-            raise Exception(f"Error extracting text: {str(e)}")
-
-    def _extract_pdf_text(self, file_path: str) -> str:
-        """Extract text from PDF files."""
-        try:
-            from langchain_community.document_loaders import PyPDFLoader
-            loader = PyPDFLoader(file_path) # or parser="pypdfium"
-            documents = loader.load()
-            text = "\n\n".join([doc.page_content for doc in documents])
-            return text
-                
-        except Exception as e:
-            raise Exception(f"Error extracting PDF text: {str(e)}")
-
-    def _extract_word_text(self, file_path: str) -> str:
-        """Extract text from Word documents."""
-        try:
-            from docx import Document
-            
-            doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
-            
-        except Exception as e:
-            raise Exception(f"Error extracting Word text: {str(e)}")
-
-    def _extract_txt_text(self, file_path: str) -> str:
-        """Extract text from txt files."""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
-        except Exception as e:
-            raise Exception(f"Error extracting text file text: {str(e)}")
-
-    def _create_metadata(self, file_path: str) -> DocumentMetadata:
+    def _create_metadata(self, file_path: str, content_hash: Optional[str] = None) -> DocumentMetadata:
         """Create metadata for a document."""
         file_path = Path(file_path)
         creation_time = datetime.fromtimestamp(file_path.stat().st_ctime)
@@ -173,44 +95,82 @@ class DocumentProcessor:
             title=file_path.name,
             file_type=file_path.suffix[1:],  # Remove the dot
             created_date=creation_time.isoformat(),
-            collection_id=f"doc_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            collection_id=f"doc_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}",
             page_count=0,  # Will be updated based on document type
-            status='processing'
+            status='processing',
+            content_hash=content_hash
         )
 
-    def create_embeddings(self, processed_doc: ProcessedDocument) -> Chroma:
-        """Create embeddings for processed document chunks."""
-        try:
-            logger.info(f"Creating embeddings for document: {processed_doc.metadata.collection_id}")
-            
-            # Prepare metadata for each chunk
-            chunk_metadata = []
-            for i, chunk in enumerate(processed_doc.chunks):
-                chunk_metadata.append({
-                    "chunk_id": str(i),
-                    "document_title": processed_doc.metadata.title,
-                    "collection_id": processed_doc.metadata.collection_id
-                })
-            
-            # Create and persist vector store
-            vectorstore = Chroma.from_texts(
-                texts=processed_doc.chunks,
-                metadatas=chunk_metadata,
-                embedding=self.embeddings,
-                persist_directory=processed_doc.collection_path
-            )
-            
-        
-            
-            logger.info(f"Embeddings created successfully: {processed_doc.metadata.collection_id}")
-            return vectorstore
-            
-        except Exception as e:
-            error_msg = f"Error creating embeddings: {str(e)}"
-            logger.error(error_msg)
-            raise Exception(error_msg)
-        
-        
+    @staticmethod
+    def chunk_metadata(metadata: DocumentMetadata, index: int,
+                       pages: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """Metadata stored alongside the embedding of one chunk."""
+        return {
+            "chunk_id": str(index),
+            "document_id": metadata.content_hash or metadata.collection_id,
+            "document_title": metadata.title,
+            "collection_id": metadata.collection_id,
+            **(pages or {})
+        }
+
+    def stream_document(self, file_path: str, metadata: DocumentMetadata,
+                        progress_callback: Optional[ProgressCallback] = None
+                        ) -> Iterator[Tuple[List[str], List[List[float]], List[Dict[str, Any]]]]:
+        """
+        Extract, split and embed a document window by window.
+
+        While one window is being embedded the next one is extracted, so at
+        most two windows of chunks are held in memory at a time.
+
+        Args:
+            file_path: Path to the document file
+            metadata: Metadata of the document; page_count is filled in
+            progress_callback: Called as (embedded_chunks, chunks_seen, chunks_per_sec)
+
+        Yields:
+            (texts, vectors, chunk_metadata) for each window, in document order
+        """
+        window_chunks = config.INGESTION_CONFIG["window_chunks"]
+        counts = {"seen": 0, "embedded": 0}
+
+        def windows() -> Iterator[Tuple[List[str], List[Dict[str, Any]]]]:
+            texts, chunk_metadata = [], []
+            for text, pages in self.iter_chunks(file_path):
+                chunk_metadata.append(self.chunk_metadata(metadata, counts["seen"], pages))
+                texts.append(text)
+                counts["seen"] += 1
+                metadata.page_count = max(metadata.page_count, pages["page_end"])
+                if len(texts) >= window_chunks:
+                    yield texts, chunk_metadata
+                    texts, chunk_metadata = [], []
+            if texts:
+                yield texts, chunk_metadata
+
+        def embed_window(texts: List[str]) -> List[List[float]]:
+            offset = counts["embedded"]
+            callback = None
+            if progress_callback:
+                callback = lambda done, total, rate: progress_callback(offset + done, counts["seen"], rate)
+            vectors = self.embed_chunks(texts, callback)
+            counts["embedded"] += len(texts)
+            return vectors
+
+        pending = None
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-window") as executor:
+            for texts, chunk_metadata in windows():
+                future = executor.submit(embed_window, texts)
+                if pending is not None:
+                    yield pending[0], pending[2].result(), pending[1]
+                pending = (texts, chunk_metadata, future)
+            if pending is not None:
+                yield pending[0], pending[2].result(), pending[1]
+
+    def embed_chunks(self, chunks: List[str],
+                     progress_callback: Optional[ProgressCallback] = None) -> List[List[float]]:
+        """Embed chunks through the batching, rate-limit-aware scheduler."""
+        return self.embedding_scheduler.embed(chunks, progress_callback)
+
+
 # Continuing rag_system.py
 
 class HRRAGSystem:
@@ -231,116 +191,532 @@ class HRRAGSystem:
             google_api_key=self.google_api_key
         )
         
-        # Keep track of active collections
-        self.active_collections: Dict[str, Chroma] = {}
-        
-        # Initialize from existing collections if any
-        self._load_existing_collections()
+        # Keep track of active collections; the catalog answers listings and
+        # membership checks, and stores are only opened on first use
+        self.catalog = CollectionCatalog(self.base_path / "collection_catalog.json")
+        self.active_collections = LazyCollectionMap(
+            self.catalog,
+            self._open_collection,
+            closer=self._close_collection,
+            **config.COLLECTION_RESIDENCY_CONFIG
+        )
+
+        # Which files have been ingested, so unchanged ones are not re-embedded
+        self.manifest = IngestionManifest(self.base_path / config.DOCUMENT_MAPPING_FILE.name)
+
+        # Bounded pool used to search collections concurrently
+        self.retrieval_config = config.RETRIEVAL_CONFIG
+        self._search_pool = ThreadPoolExecutor(
+            max_workers=self.retrieval_config["max_workers"],
+            thread_name_prefix="rag-search"
+        )
+        # Searches that outlived their timeout, by collection; a running
+        # search cannot be cancelled, so the collection is skipped until it ends
+        self._abandoned_searches: Dict[str, Future] = {}
+        self._abandoned_lock = threading.Lock()
+
+        # Deduplicates and budgets the retrieved context for the prompt
+        self.context_packer = ContextPacker(
+            max_tokens=config.CONTEXT_CONFIG["max_tokens"],
+            near_duplicate_threshold=config.CONTEXT_CONFIG["near_duplicate_threshold"]
+        )
+
+        # Semantic cache of generated answers
+        self.answer_cache: Optional[SemanticAnswerCache] = None
+        if config.ANSWER_CACHE_CONFIG["enabled"]:
+            self.answer_cache = SemanticAnswerCache(
+                threshold=config.ANSWER_CACHE_CONFIG["similarity_threshold"],
+                max_entries=config.ANSWER_CACHE_CONFIG["max_entries"],
+                ttl_seconds=config.ANSWER_CACHE_CONFIG["ttl_seconds"]
+            )
+
+        # Unified index replacing the per-document collections when enabled
+        self.vector_index: Optional[ShardedVectorIndex] = None
+        if (config.VECTOR_INDEX_CONFIG["mode"] == "unified"
+                or config.VECTOR_INDEX_CONFIG.get("backend") == "numpy"):
+            self._open_vector_index()
+        else:
+            # Initialize from existing collections if any
+            self._load_existing_collections()
+
+    def _open_vector_index(self):
+        """Open the unified vector index and import legacy per-document collections."""
+        backend = config.VECTOR_INDEX_CONFIG.get("backend", "chroma")
+        # Each backend keeps its own index so the two can be benchmarked side by side
+        index_dir = "vector_index" if backend == "chroma" else f"vector_index_{backend}"
+        self.vector_index = ShardedVectorIndex(
+            self.base_path / index_dir,
+            self.doc_processor.embeddings,
+            num_shards=config.VECTOR_INDEX_CONFIG["num_shards"],
+            backend=backend,
+            quantization=config.VECTOR_INDEX_CONFIG.get("quantization"),
+            rescore_factor=config.VECTOR_INDEX_CONFIG.get("rescore_factor", 4)
+        )
+        if config.VECTOR_INDEX_CONFIG.get("migrate_legacy", True):
+            imported = self.vector_index.migrate_legacy_collections(self.base_path / "chroma_db")
+            if imported:
+                logger.info(f"Imported {len(imported)} legacy collections into the vector index")
 
     def _load_existing_collections(self):
-        """Load existing collections from chroma_db directory."""
+        """Load existing collections from the catalog without opening them."""
         logger.info("Loading existing collections...")
         try:
-            chroma_path = self.base_path / "chroma_db"
-            if chroma_path.exists():
-                for collection_dir in chroma_path.iterdir():
-                    if collection_dir.is_dir():
-                        try:
-                            vectorstore = Chroma(
-                                persist_directory=str(collection_dir),
-                                embedding_function=self.doc_processor.embeddings
-                            )
-                            self.active_collections[collection_dir.name] = vectorstore
-                            # Log the number of documents in the collection
-                            num_docs = vectorstore._collection.count()
-                            logger.info(f"Loaded collection: {collection_dir.name} with {num_docs} documents")
-                        except Exception as e:
-                            logger.error(f"Error loading collection {collection_dir.name}: {str(e)}")
-
+            self.catalog.sync_with_directory(self.base_path / "chroma_db")
+            logger.info(f"Catalog lists {len(self.active_collections)} collections")
         except Exception as e:
             logger.error(f"Error loading existing collections: {str(e)}")
 
+    def _open_collection(self, collection_id: str) -> Chroma:
+        """Open a persisted per-document collection."""
+        return Chroma(
+            persist_directory=str(self.base_path / "chroma_db" / collection_id),
+            embedding_function=self.doc_processor.embeddings
+        )
+
 
-    def process_document(self, file_path: str) -> str:
+    @staticmethod
+    def _close_collection(vectorstore: Chroma):
+        """
+        Release the client, SQLite handle and HNSW index behind a Chroma store.
+
+        chromadb has no public close(), and its shared-system cache keeps a
+        dropped client's index resident, so the client's system is stopped
+        and removed from that cache. These are chromadb 0.5 internals (the
+        version is pinned in requirements.txt); without them the store is
+        only dropped and stays resident until the process exits.
+        """
+        client = getattr(vectorstore, "_client", None)
+        system = getattr(client, "_system", None)
+        try:
+            from chromadb.api.shared_system_client import SharedSystemClient
+            systems = SharedSystemClient._identifier_to_system
+        except (ImportError, AttributeError):
+            systems = None
+        if system is None or systems is None:
+            logger.warning("This chromadb version cannot close a collection; dropping the reference only")
+            return
+        system.stop()
+        systems.pop(client._identifier, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return cache and collection residency statistics."""
+        stats = {
+            "collections": self.active_collections.stats(),
+            "query_embedding_cache": query_embedding_cache.stats(),
+            "context": self.context_packer.stats()
+        }
+        if self.answer_cache is not None:
+            stats["answer_cache"] = self.answer_cache.stats()
+        if self.vector_index is not None:
+            stats["vector_index"] = self.vector_index.stats()
+        if hasattr(self.doc_processor.embeddings, "stats"):
+            stats["embedding_cache"] = self.doc_processor.embeddings.stats()
+        return stats
+
+    def process_document(self, file_path: str, force: bool = False,
+                         progress_callback: Optional[ProgressCallback] = None) -> str:
         """
         Process a new document and add it to the RAG system.
+
+        Files recorded in the ingestion manifest with unchanged content are
+        skipped; modified files are re-ingested and their old collection removed.
         
         Args:
             file_path: Path to the document file
+            force: Re-ingest even if the file is unchanged
+            progress_callback: Called as (embedded_chunks, chunks_seen, chunks_per_sec)
             
         Returns:
-            collection_id: ID of the created collection
+            collection_id: ID of the created (or already existing) collection
         """
         try:
-            # Process document
-            processed_doc = self.doc_processor.process_document(file_path)
-            
-            # Create embeddings
-            logger.info(
-                f"Creating embeddings for document: {processed_doc.metadata.collection_id}"
-            )
-            vectorstore = self.doc_processor.create_embeddings(processed_doc)
-            # Log the number of chunks embedded:
-            logger.info(f"Created embeddings for {len(processed_doc.chunks)} chunks.")
-
-            # Add to active collections
-            self.active_collections[
-                processed_doc.metadata.collection_id
-            ] = vectorstore
-
-            # Update metadata status
-            processed_doc.metadata.status = "active"
-            processed_doc.embedding_status = "completed"
-
-            # log the active collections
-            logger.info(
-                f"Active collections: {', '.join(self.active_collections.keys())}"
-            )
-            
-            return processed_doc.metadata.collection_id
+            needed, entry, content_hash = self.needs_ingestion(file_path, force)
+            if not needed:
+                logger.info(f"Skipping unchanged document: {file_path} ({entry['collection_id']})")
+                return entry['collection_id']
+
+            collection_id = self._ingest_document(file_path, content_hash, progress_callback)
+            self.record_ingestion(file_path, collection_id, content_hash, entry)
+            return collection_id
+
+        except Exception as e:
+            logger.error(f"Error processing document: {str(e)}")
+            raise
+
+    def needs_ingestion(self, file_path: str, force: bool = False
+                        ) -> Tuple[bool, Optional[Dict[str, str]], Optional[str]]:
+        """
+        Check a file against the ingestion manifest.
+
+        Returns:
+            (needed, manifest_entry, content_hash); unchanged files whose
+            collection still exists are not needed
+        """
+        status, entry, content_hash = self.manifest.check(file_path)
+        if status == 'unchanged' and not force and self._has_collection(entry['collection_id']):
+            return False, entry, content_hash
+        return True, entry, content_hash or hash_file(file_path)
+
+    def record_ingestion(self, file_path: str, collection_id: str, content_hash: str,
+                         previous_entry: Optional[Dict[str, str]] = None):
+        """Record a finished ingestion and drop what it supersedes."""
+        self.manifest.record(file_path, collection_id, content_hash)
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_added()
+
+        if previous_entry is not None and previous_entry['collection_id'] != collection_id:
+            # The file changed, so its previous chunks are stale
+            self.remove_collection(previous_entry['collection_id'])
+
+    def _has_collection(self, collection_id: str) -> bool:
+        """Check whether a collection is currently available for queries."""
+        if self.vector_index is not None:
+            return self.vector_index.has_collection(collection_id)
+        entry = self.catalog.get(collection_id)
+        return entry is not None and not entry.get("hidden")
+
+    def _resolve_collections(self, collection_ids: Optional[List[str]] = None) -> List[str]:
+        """Expand merged collections into the per-document stores they reference."""
+        if not collection_ids:
+            # Every store once; hidden ones are still referenced by a merge
+            return self.catalog.physical_ids()
+        resolved = []
+        for cid in collection_ids:
+            entry = self.catalog.get(cid)
+            if entry is None:
+                continue
+            resolved.extend(m for m in entry.get("members") or [cid] if m in self.catalog)
+        return list(dict.fromkeys(resolved))
+
+    def _ingest_document(self, file_path: str, content_hash: Optional[str] = None,
+                         progress_callback: Optional[ProgressCallback] = None) -> str:
+        """
+        Stream a document into the vector store, returning its collection ID.
+
+        Chunks are embedded and written window by window, so memory use does
+        not grow with the document. A failed ingestion removes the chunks
+        already written.
+        """
+        metadata = self.doc_processor._create_metadata(file_path, content_hash)
+        collection_id = metadata.collection_id
+        vectorstore = None
+        chunk_count = 0
+        try:
+            logger.info(f"Creating embeddings for document: {collection_id}")
+            for texts, vectors, chunk_metadata in self.doc_processor.stream_document(
+                    file_path, metadata, progress_callback):
+                vectorstore = self.write_chunks(
+                    metadata, texts, vectors, chunk_metadata, chunk_count, vectorstore
+                )
+                chunk_count += len(texts)
+                logger.info(f"Stored {chunk_count} chunks of {metadata.title}")
+
+            self.finish_collection(metadata, chunk_count, content_hash, vectorstore)
+            return collection_id
             
         except Exception as e:
             logger.error(f"Error processing document: {str(e)}")
+            self.discard_partial_collection(collection_id, vectorstore)
             raise
 
-    def query(self, question: str, collection_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    def write_chunks(self, metadata: DocumentMetadata, texts: List[str], vectors: List[List[float]],
+                     chunk_metadata: List[Dict[str, Any]], offset: int = 0,
+                     vectorstore: Optional[Chroma] = None) -> Optional[Chroma]:
+        """
+        Persist embedded chunks of a document being ingested.
+
+        Args:
+            metadata: Metadata of the document
+            texts, vectors, chunk_metadata: The chunks to store
+            offset: Number of chunks of this document already stored
+            vectorstore: Store returned by the previous call for this document
+
+        Returns:
+            The per-document store to pass to the next call (None with the unified index)
+        """
+        if self.vector_index is not None:
+            self.vector_index.add_embeddings(
+                metadata.collection_id, metadata.title, texts, vectors, chunk_metadata
+            )
+            return None
+
+        if vectorstore is None:
+            vectorstore = self._create_collection_store(metadata.collection_id)
+        add_embeddings_in_batches(
+            vectorstore,
+            [f"chunk_{offset + i}" for i in range(len(texts))],
+            vectors,
+            texts,
+            chunk_metadata
+        )
+        return vectorstore
+
+    def finish_collection(self, metadata: DocumentMetadata, chunk_count: int,
+                          content_hash: Optional[str] = None, vectorstore: Optional[Chroma] = None):
+        """Make a fully written document available for queries."""
+        metadata.status = "active"
+        if self.vector_index is not None:
+            logger.info(f"Indexed {chunk_count} chunks ({metadata.page_count} pages).")
+            return
+
+        # Log the number of chunks embedded:
+        logger.info(f"Created embeddings for {chunk_count} chunks ({metadata.page_count} pages).")
+
+        # Add to active collections
+        self.catalog.add(
+            metadata.collection_id,
+            title=metadata.title,
+            chunk_count=chunk_count,
+            content_hash=content_hash
+        )
+        self.active_collections[metadata.collection_id] = (
+            vectorstore or self._create_collection_store(metadata.collection_id)
+        )
+
+        # log the active collections
+        logger.info(
+            f"Active collections: {', '.join(self.active_collections.keys())}"
+        )
+
+    def _create_collection_store(self, collection_id: str) -> Chroma:
+        """Create the Chroma store for a new per-document collection."""
+        return Chroma(
+            persist_directory=str(self.doc_processor.chroma_path / collection_id),
+            embedding_function=self.doc_processor.embeddings
+        )
+
+    def discard_partial_collection(self, collection_id: str, vectorstore: Optional[Chroma]):
+        """Remove whatever a failed ingestion managed to write."""
+        try:
+            if self.vector_index is not None:
+                self.vector_index.delete_collection(collection_id)
+            elif vectorstore is not None:
+                import shutil
+                self._close_collection(vectorstore)
+                shutil.rmtree(str(self.doc_processor.chroma_path / collection_id), ignore_errors=True)
+        except Exception as e:
+            logger.error(f"Error discarding partial collection {collection_id}: {str(e)}")
+
+    def query(self, question: str, collection_ids: Optional[List[str]] = None,
+              callbacks: Optional[List[Any]] = None) -> Dict[str, Any]:
         """
         Query the RAG system with a question.
         
         Args:
             question: The question to ask
             collection_ids: Optional list of specific collection IDs to query
+            callbacks: Optional LangChain callbacks for the answer generation
             
         Returns:
             Dict containing answer and source documents
         """
         try:
-            # If no specific collections provided, use all active ones
-            collections_to_query = []
-            if collection_ids:
-                for cid in collection_ids:
-                    if cid in self.active_collections:
-                        collections_to_query.append(self.active_collections[cid])
-            else:
-                collections_to_query = list(self.active_collections.values())
-
-            if not collections_to_query:
+            started_at = time.monotonic()
+            embedding = self._embed_question(question)
+
+            # Near-duplicate questions are answered from the semantic cache
+            if self.answer_cache is not None:
+                cached = self.answer_cache.lookup(embedding, collection_ids)
+                if cached is not None:
+                    logger.info(f"Answer cache hit for question: {question}")
+                    return {
+                        "answer": cached.answer,
+                        "source_documents": cached.source_documents
+                    }
+
+            hits = self._retrieve(question, collection_ids, embedding)
+            if hits is None:
                 return {
                     "answer": "عذراً، لا توجد مستندات متاحة للبحث.",
                     "source_documents": []
                 }
 
-            # Combine results from all collections
-            all_docs = []
-            for vectorstore in collections_to_query:
-                docs = vectorstore.similarity_search(question, k=10)
-                all_docs.extend(docs)
+            docs = [doc for doc, _ in hits]
+            result = self._generate_answer(question, hits, callbacks)
+
+            if self.answer_cache is not None and docs:
+                self.answer_cache.store(
+                    question,
+                    embedding,
+                    result["answer"],
+                    result["source_documents"],
+                    used_collections={
+                        cid
+                        for doc in docs
+                        for cid in doc.metadata.get("collections") or [
+                            doc.metadata.get("source_collection") or doc.metadata.get("collection_id")
+                        ]
+                    },
+                    collection_ids=collection_ids,
+                    latency=time.monotonic() - started_at
+                )
+            return result
+
+        except Exception as e:
+            logger.error(f"Error processing query: {str(e)}")
+            return {
+                "answer": "عذراً، حدث خطأ أثناء معالجة السؤال.",
+                "source_documents": []
+            }
+
+    def _retrieve(self, question: str, collection_ids: Optional[List[str]],
+                  embedding: List[float]) -> Optional[List[Tuple[Any, float]]]:
+        """Retrieve the closest chunks; None when there is nothing to search."""
+        if self.vector_index is not None:
+            if not self.vector_index.list_collections():
+                return None
+            return self.vector_index.search(
+                question,
+                k=self.retrieval_config["top_k"],
+                collection_ids=collection_ids,
+                max_distance=self.retrieval_config["max_distance"],
+                embedding=embedding
+            )
+
+        # If no specific collections provided, use all active ones;
+        # a merged collection is searched through its members
+        collections_to_query = self._resolve_collections(collection_ids)
+        if not collections_to_query:
+            return None
+
+        # Search all collections concurrently and keep the best-scoring chunks
+        return self._search_collections(question, collections_to_query, embedding)
+
+    def retrieve_context(self, question: str, collection_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Retrieve and pack the context for a question without generating an answer.
+
+        Returns:
+            Dict with the packed context text and its source documents
+        """
+        try:
+            hits = self._retrieve(question, collection_ids, self._embed_question(question))
+            if not hits:
+                return {"context": "", "source_documents": []}
+            packed = self.context_packer.pack(hits)
+            return {"context": packed.text, "source_documents": packed.documents}
+        except Exception as e:
+            logger.error(f"Error retrieving context: {str(e)}")
+            return {"context": "", "source_documents": []}
+
+    def _search_collections(self, question: str, collections: List[str],
+                            embedding: Optional[List[float]] = None) -> List[Any]:
+        """
+        Fan a similarity search out over several collections.
+
+        Searches run on the bounded worker pool; collections that are not
+        open yet are opened inside the worker. Collections that run longer
+        than `collection_timeout`, or are still pending at the global
+        `deadline`, are skipped. A search that is already running cannot be
+        stopped, so its collection is left out of later fan-outs until it
+        finishes instead of tying up more workers. Results are merged by
+        distance.
+
+        Returns:
+            List of (document, distance) pairs, closest first
+        """
+        cfg = self.retrieval_config
+        started_at = time.monotonic()
+        deadline_at = started_at + cfg["deadline"]
+        task_starts: Dict[str, float] = {}
+
+        # One embedding per question, shared by every collection search
+        if embedding is None:
+            embedding = self._embed_question(question)
+
+        def search(cid: str):
+            task_starts[cid] = time.monotonic()
+            with self.active_collections.using(cid) as vectorstore:
+                hits = vectorstore.similarity_search_by_vector_with_relevance_scores(
+                    embedding, k=cfg["per_collection_k"]
+                )
+            for doc, _ in hits:
+                # Merged collections keep their sources' collection_id metadata
+                doc.metadata["source_collection"] = cid
+            return hits
+
+        with self._abandoned_lock:
+            busy = [cid for cid in collections if cid in self._abandoned_searches]
+        if busy:
+            logger.warning(f"Skipped collections still running an earlier search: {', '.join(busy)}")
+        futures = {
+            self._search_pool.submit(search, cid): cid for cid in collections if cid not in busy
+        }
+
+        results = []
+        pending = set(futures)
+        timed_out = []
+        while pending:
+            now = time.monotonic()
+            if now >= deadline_at:
+                break
+            done, pending = wait(
+                pending,
+                timeout=min(deadline_at - now, cfg["collection_timeout"]),
+                return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    logger.error(f"Error searching collection {futures[future]}: {str(e)}")
+
+            # Stop waiting for collections that exceeded their own timeout
+            now = time.monotonic()
+            for future in list(pending):
+                cid = futures[future]
+                if cid in task_starts and now - task_starts[cid] > cfg["collection_timeout"]:
+                    pending.discard(future)
+                    timed_out.append(cid)
+                    self._abandon_search(cid, future)
+
+        for future in pending:
+            if not future.cancel():
+                self._abandon_search(futures[future], future)
+            timed_out.append(futures[future])
+        if timed_out:
+            logger.warning(f"Skipped slow collections: {', '.join(timed_out)}")
+        timed_out += busy
+
+        hits = merge_top_k(results, cfg["top_k"], cfg["max_distance"])
+        logger.info(
+            f"Retrieved {len(hits)}/{len(results)} chunks from "
+            f"{len(collections) - len(timed_out)}/{len(collections)} collections "
+            f"in {(time.monotonic() - started_at) * 1000:.0f} ms"
+        )
+        return hits
+
+    def _abandon_search(self, collection_id: str, future: Future):
+        """Remember a search left running past its timeout until it finishes."""
+        def release(finished: Future):
+            with self._abandoned_lock:
+                if self._abandoned_searches.get(collection_id) is finished:
+                    del self._abandoned_searches[collection_id]
+
+        with self._abandoned_lock:
+            self._abandoned_searches[collection_id] = future
+        future.add_done_callback(release)
+
+    def _embed_question(self, question: str) -> List[float]:
+        """Embed a question through the process-wide query embedding cache."""
+        embeddings = self.doc_processor.embeddings
+        model_name = getattr(embeddings, "model_name", None) or getattr(embeddings, "model", "default")
+        return query_embedding_cache.get_or_compute(model_name, question, embeddings.embed_query)
+
+    def _generate_answer(self, question: str, hits: List[Tuple[Any, float]],
+                         callbacks: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """Generate an answer from the retrieved (chunk, distance) pairs."""
+        if not hits:
+            return {
+                "answer": "عذراً، لم أجد معلومات ذات صلة في المستندات المتاحة.",
+                "source_documents": []
+            }
 
-            # Sort by relevance (assumed from order) and take top results
-            context = "\n".join(doc.page_content for doc in all_docs[:15])
+        packed = self.context_packer.pack(hits)
+        context = packed.text
 
-            # Generate response using LLM
-            prompt = f"""أنت مساعد متخصص في الموارد البشرية. استخدم المعلومات التالية للإجابة على السؤال.
+        # Generate response using LLM
+        prompt = f"""أنت مساعد متخصص في الموارد البشرية. استخدم المعلومات التالية للإجابة على السؤال.
             إذا لم تجد المعلومات في النص المتوفر، قل ذلك بصراحة.
 
             السؤال: {question}
@@ -350,62 +726,59 @@ class HRRAGSystem:
 
             الإجابة:"""
 
-            response = self.llm.invoke(prompt)
+        if callbacks:
+            # Streamed, so the callbacks (e.g. the chat stream) receive the answer token by token
+            answer = "".join(
+                chunk.content for chunk in self.llm.stream(prompt, config={"callbacks": callbacks})
+            )
+        else:
+            answer = self.llm.invoke(prompt).content
 
-            return {
-                "answer": response.content,
-                "source_documents": all_docs[:3]
-            }
+        return {
+            "answer": answer,
+            "source_documents": packed.documents[:3]
+        }
 
-        except Exception as e:
-            logger.error(f"Error processing query: {str(e)}")
-            return {
-                "answer": "عذراً، حدث خطأ أثناء معالجة السؤال.",
-                "source_documents": []
-            }
-
-    def merge_collections(self, collection_ids: List[str]) -> Optional[str]:
+    def merge_collections(self, collection_ids: List[str],
+                          remove_sources: bool = False) -> Optional[str]:
         """
         Merge multiple collections into a new one.
-        
+
+        The merged collection only references the chunks of its sources;
+        nothing is copied or re-embedded.
+
         Args:
             collection_ids: List of collection IDs to merge
-            
+            remove_sources: Remove the source collections once the merge succeeded
+
         Returns:
             New collection ID if successful, None otherwise
         """
         try:
             # Validate collections exist
-            collections = []
             for cid in collection_ids:
-                if cid in self.active_collections:
-                    collections.append(self.active_collections[cid])
-                else:
+                if not self._has_collection(cid):
                     raise ValueError(f"Collection not found: {cid}")
 
             # Create new collection ID
-            merged_id = f"merged_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            merged_path = self.base_path / "chroma_db" / merged_id
+            merged_id = f"merged_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
 
-            # Get all documents from collections
-            all_texts = []
-            all_metadata = []
-            
-            for vectorstore in collections:
-                docs = vectorstore.get()
-                all_texts.extend(docs['documents'])
-                all_metadata.extend(docs['metadatas'])
-
-            # Create new merged collection
-            merged_vectorstore = Chroma.from_texts(
-                texts=all_texts,
-                metadatas=all_metadata,
-                embedding=self.doc_processor.embeddings,
-                persist_directory=str(merged_path)
-            )
-
-            # Add to active collections
-            self.active_collections[merged_id] = merged_vectorstore
+            if self.vector_index is not None:
+                self.vector_index.copy_collections(collection_ids, merged_id, title=merged_id)
+            else:
+                members = self._resolve_collections(collection_ids)
+                self.catalog.add(
+                    merged_id,
+                    title=merged_id,
+                    chunk_count=sum((self.catalog.get(cid) or {}).get("chunk_count") or 0 for cid in members),
+                    members=members
+                )
+            if self.answer_cache is not None:
+                self.answer_cache.invalidate_added()
+
+            if remove_sources:
+                for cid in collection_ids:
+                    self.remove_collection(cid)
 
             return merged_id
 
@@ -413,40 +786,22 @@ class HRRAGSystem:
             logger.error(f"Error merging collections: {str(e)}")
             return None
 
-    def remove_collection(self, collection_id: str) -> bool:
-        """
-        Remove a collection from the system.
-
-        Args:
-            collection_id: ID of the collection to remove
+    def _delete_collection_store(self, collection_id: str):
+        """Close and delete the Chroma directory of a per-document collection."""
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_collections([collection_id])
 
-        Returns:
-            bool: True if successful, False otherwise
-        """
-        print(f"Attempting to remove collection: {collection_id}")
-        try:
-            if collection_id in self.active_collections:
-                # Remove from active collections
-                del self.active_collections[collection_id]
-
-                # Remove directory
-                collection_path = self.base_path / "chroma_db" / collection_id
-                if collection_path.exists():
-                    import shutil
-                    shutil.rmtree(str(collection_path))
-                    print(f"Removed collection directory: {collection_path}")
-                else:
-                    print(f"Collection directory not found: {collection_path}")
-
-                logger.info(f"Removed collection: {collection_id}")
-                return True
-            else:
-                logger.warning(f"Collection not found in active collections: {collection_id}")
-                return False
+        # Remove from active collections
+        del self.active_collections[collection_id]
 
-        except Exception as e:
-            logger.error(f"Error removing collection: {str(e)}")
-            return False
+        # Remove directory
+        collection_path = self.base_path / "chroma_db" / collection_id
+        if collection_path.exists():
+            import shutil
+            shutil.rmtree(str(collection_path))
+            print(f"Removed collection directory: {collection_path}")
+        else:
+            print(f"Collection directory not found: {collection_path}")
 
     def get_active_collections(self) -> List[Dict[str, Any]]:
         """
@@ -456,21 +811,28 @@ class HRRAGSystem:
             List of collection information dictionaries
         """
         try:
-            collections_info = []
-            for cid, vectorstore in self.active_collections.items():
-                try:
-                    docs = vectorstore.get()
-                    collections_info.append({
+            if self.vector_index is not None:
+                return [
+                    {
                         "collection_id": cid,
-                        "document_count": len(docs['documents']),
-                        "created": datetime.fromtimestamp(
-                            (self.base_path / "chroma_db" / cid).stat().st_ctime
-                        ).isoformat()
-                    })
-                except Exception as e:
-                    logger.error(f"Error getting info for collection {cid}: {str(e)}")
-                    
-            return collections_info
+                        "title": info["title"],
+                        "document_count": info["chunk_count"],
+                        "created": info["created"]
+                    }
+                    for cid, info in self.vector_index.list_collections().items()
+                ]
+
+            # Answered from the catalog, without opening any collection
+            return [
+                {
+                    "collection_id": entry["collection_id"],
+                    "title": entry["title"],
+                    "document_count": entry["chunk_count"],
+                    "created": entry["created"]
+                }
+                for entry in self.catalog.list()
+                if not entry.get("hidden")
+            ]
             
         except Exception as e:
             logger.error(f"Error getting collections info: {str(e)}")
@@ -488,25 +850,40 @@ class HRRAGSystem:
         """
         print(f"Attempting to remove collection: {collection_id}")
         try:
-            if collection_id in self.active_collections:
-                # Remove from active collections
-                del self.active_collections[collection_id]
-
-                # Remove directory
-                collection_path = self.base_path / "chroma_db" / collection_id
-                if collection_path.exists():
-                    import shutil
-                    shutil.rmtree(str(collection_path))
-                    print(f"Removed collection directory: {collection_path}")
-                else:
-                    print(f"Collection directory not found: {collection_path}")
-
-                logger.info(f"Removed collection: {collection_id}")
-                return True
-            else:
+            if self.answer_cache is not None:
+                self.answer_cache.invalidate_collections([collection_id])
+
+            if self.vector_index is not None:
+                if self.vector_index.delete_collection(collection_id):
+                    self.manifest.remove_collection(collection_id)
+                    logger.info(f"Removed collection: {collection_id}")
+                    return True
+                logger.warning(f"Collection not found in vector index: {collection_id}")
+                return False
+
+            entry = self.catalog.get(collection_id)
+            if entry is None or entry.get("hidden"):
                 logger.warning(f"Collection not found in active collections: {collection_id}")
                 return False
 
+            if entry.get("members"):
+                # A merge owns no store; its members may now be unreferenced
+                self.catalog.remove(collection_id)
+                for member in entry["members"]:
+                    member_entry = self.catalog.get(member)
+                    if member_entry and member_entry.get("hidden") and not self.catalog.referrers(member):
+                        self._delete_collection_store(member)
+            elif self.catalog.referrers(collection_id):
+                # Still referenced by a merge; kept on disk but no longer listed
+                self.catalog.update(collection_id, hidden=True)
+                logger.info(f"Collection {collection_id} is still referenced by merged collections; hidden")
+            else:
+                self._delete_collection_store(collection_id)
+
+            self.manifest.remove_collection(collection_id)
+            logger.info(f"Removed collection: {collection_id}")
+            return True
+
         except Exception as e:
             logger.error(f"Error removing collection: {str(e)}")
             return False
\ No newline at end of file
@@ -0,0 +1,47 @@
+# conftest.py
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import rag_system
+from intent_router import IntentRouter
+from tools.ticket_tool import TicketTool
+from tools.vacation_tool import VacationTool
+
+
+@pytest.fixture
+def vacation_tool(tmp_path):
+    vacations_file = tmp_path / "vacations.csv"
+    pd.DataFrame([{
+        "employee_id": 1001, "name": "محمد", "position": "محاسب", "department": "المالية",
+        "annual_balance": 21, "used_days": 5.5, "remaining_balance": 15.5, "last_updated": "2025-01-01"
+    }]).to_csv(vacations_file, index=False)
+    return VacationTool(str(vacations_file))
+
+
+@pytest.fixture
+def ticket_tool(tmp_path):
+    return TicketTool(str(tmp_path / "tickets.csv"))
+
+
+@pytest.fixture
+def router(vacation_tool, ticket_tool):
+    return IntentRouter(vacation_tool, ticket_tool)
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    """RAG system over per-document collections with offline fake embeddings."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(rag_system, "OpenAIEmbeddings", lambda api_key, model: DeterministicFakeEmbedding(size=32))
+    monkeypatch.setitem(config.VECTOR_INDEX_CONFIG, "mode", "collections")
+    monkeypatch.setitem(config.RETRIEVAL_CONFIG, "max_distance", None)
+    return rag_system.HRRAGSystem("test-key", "test-key", base_path=str(tmp_path / "data"))
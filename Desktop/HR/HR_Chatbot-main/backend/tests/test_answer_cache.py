@@ -0,0 +1,78 @@
+# test_answer_cache.py
+
+import math
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from answer_cache import SemanticAnswerCache
+
+
+def at_similarity(similarity):
+    """A unit vector with the given cosine similarity to [1, 0]."""
+    return [similarity, math.sqrt(1 - similarity ** 2)]
+
+
+def store(cache, answer, used=("a",), scope=None):
+    cache.store(answer, [1.0, 0.0], answer, [], used_collections=used, collection_ids=scope)
+
+
+def test_lookup_hits_only_above_the_threshold_and_in_the_same_scope():
+    cache = SemanticAnswerCache(threshold=0.95)
+    store(cache, "all")
+    store(cache, "scoped", scope=["a"])
+
+    assert cache.lookup(at_similarity(0.97)).answer == "all"
+    assert cache.lookup(at_similarity(0.93)) is None
+    assert cache.lookup(at_similarity(0.97), ["a"]).answer == "scoped"
+    assert cache.lookup(at_similarity(0.97), ["a", "b"]) is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_adding_a_collection_evicts_only_unscoped_answers():
+    cache = SemanticAnswerCache()
+    store(cache, "all")
+    store(cache, "scoped", scope=["a"])
+
+    assert cache.invalidate_added() == 1
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0], ["a"]).answer == "scoped"
+
+
+def test_removing_a_collection_evicts_answers_that_used_or_were_scoped_to_it():
+    cache = SemanticAnswerCache()
+    store(cache, "used a", used=("a", "b"))
+    store(cache, "scoped to a", used=("b",), scope=["a", "b"])
+    store(cache, "only c", used=("c",), scope=["c"])
+
+    assert cache.invalidate_collections(["a"]) == 2
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0], ["c"]).answer == "only c"
+    assert cache.stats()["invalidations"] == 2
+
+
+@pytest.fixture
+def answering_rag(rag, tmp_path):
+    document = tmp_path / "annual.txt"
+    document.write_text("مدة الإجازة السنوية ثلاثون يوما. " * 40, encoding="utf-8")
+    rag.collection_id = rag.process_document(str(document))
+    rag.llm = GenericFakeChatModel(messages=iter(AIMessage(content=f"answer {i}") for i in range(10)))
+    return rag
+
+
+def test_corpus_changes_invalidate_cached_rag_answers(answering_rag, tmp_path):
+    rag = answering_rag
+    question = "ما هي مدة الإجازة السنوية؟"
+    assert rag.query(question)["answer"] == "answer 0"
+    assert rag.query(question)["answer"] == "answer 0"
+
+    # A new document may answer the question better
+    document = tmp_path / "sick.txt"
+    document.write_text("مدة الإجازة المرضية خمسة عشر يوما. " * 40, encoding="utf-8")
+    rag.process_document(str(document))
+    assert rag.query(question)["answer"] == "answer 1"
+
+    assert rag.remove_collection(rag.collection_id)
+    assert rag.query(question)["answer"] == "answer 2"
+    assert rag.answer_cache.stats()["hits"] == 1
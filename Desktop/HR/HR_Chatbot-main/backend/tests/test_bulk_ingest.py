@@ -0,0 +1,95 @@
+# test_bulk_ingest.py
+
+import importlib
+import os
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+import config
+from bulk_ingest import collect_documents
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return str(path)
+
+
+def test_zip_members_are_extracted_under_their_archive_path(tmp_path):
+    source = make_zip(tmp_path / "docs.zip", {
+        "policies/annual.txt": "annual leave",
+        "policies/sick.TXT": "sick leave",
+        "notes.md": "not a document"
+    })
+    extract_to = tmp_path / "extracted"
+
+    paths = collect_documents(source, extract_to)
+    assert sorted(paths) == [str(extract_to / "policies" / "annual.txt"), str(extract_to / "policies" / "sick.TXT")]
+    assert (extract_to / "policies" / "annual.txt").read_text() == "annual leave"
+
+
+@pytest.mark.parametrize("name", ["../escape.txt", "docs/../../escape.txt", "/etc/escape.txt", "C:/escape.txt"])
+def test_unsafe_member_paths_reject_the_whole_archive(tmp_path, name):
+    source = make_zip(tmp_path / "docs.zip", {"safe.txt": "fine", name: "escaped"})
+    extract_to = tmp_path / "extracted" / "inner"
+
+    with pytest.raises(ValueError, match="Unsafe path"):
+        collect_documents(source, extract_to)
+    # Paths are checked before anything is written
+    assert not list(extract_to.rglob("*.txt"))
+    assert not (tmp_path / "escape.txt").exists() and not (tmp_path / "extracted" / "escape.txt").exists()
+
+
+def test_archives_over_the_size_or_count_limit_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.BULK_INGEST_CONFIG, "max_archive_bytes", 1000)
+    monkeypatch.setitem(config.BULK_INGEST_CONFIG, "max_archive_members", 3)
+
+    # Compresses to a few bytes but expands past the limit
+    too_big = make_zip(tmp_path / "big.zip", {"small.txt": "x" * 10, "big.txt": "x" * 5000})
+    with pytest.raises(ValueError, match="more than 1000 bytes"):
+        collect_documents(too_big, tmp_path / "big")
+    assert not list((tmp_path / "big").rglob("*.txt"))
+
+    too_many = make_zip(tmp_path / "many.zip", {f"{i}.txt": "x" for i in range(4)})
+    with pytest.raises(ValueError, match="4 files, the limit is 3"):
+        collect_documents(too_many, tmp_path / "many")
+
+    assert len(collect_documents(make_zip(tmp_path / "ok.zip", {f"{i}.txt": "x" for i in range(3)}),
+                                 tmp_path / "ok")) == 3
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app_module = importlib.import_module("app")
+    root = tmp_path / "documents"
+    (root / "policies").mkdir(parents=True)
+    (tmp_path / "outside").mkdir()
+    os.symlink(tmp_path / "outside", root / "link")
+    submitted = []
+
+    def submit_bulk_ingest(source, force=False, remove_source=False):
+        submitted.append(source)
+        return {"job_id": str(len(submitted))}
+
+    monkeypatch.setattr(app_module, "agent", SimpleNamespace(submit_bulk_ingest=submit_bulk_ingest))
+    monkeypatch.setitem(app_module.app.config, "BULK_INGEST_ROOT", str(root))
+    test_client = app_module.app.test_client()
+    test_client.root, test_client.submitted = root, submitted
+    return test_client
+
+
+def test_bulk_ingest_endpoint_only_accepts_directories_under_the_root(client, tmp_path):
+    def post(directory):
+        return client.post("/api/admin/bulk-ingest", json={"directory": directory}).status_code
+
+    assert post("policies") == 202
+    assert post(str(client.root / "policies")) == 202
+    assert client.submitted == [os.path.realpath(client.root / "policies")] * 2
+
+    for directory in ["../outside", "policies/../../outside", str(tmp_path / "outside"), "link", "missing", ""]:
+        assert post(directory) == 400, directory
+    assert len(client.submitted) == 2
@@ -0,0 +1,134 @@
+# test_chat_store.py
+
+import importlib
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import chat_store as chat_store_module
+from chat_store import ChatStore
+
+
+@pytest.fixture
+def chat_store(tmp_path):
+    store = ChatStore(tmp_path / "chat.sqlite")
+    for i in range(7):
+        store.append_exchange("1001", f"question {i}", f"answer {i}")
+    store.append_exchange("2002", "other employee", "other answer")
+    return store
+
+
+@pytest.fixture
+def client(chat_store, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app_module = importlib.import_module("app")
+    monkeypatch.setattr(app_module, "agent", SimpleNamespace(chat_store=chat_store))
+    return app_module.app.test_client()
+
+
+def test_pages_walk_backwards_and_forwards_without_gaps(chat_store):
+    pages, cursor = [], None
+    while True:
+        page = chat_store.page("1001", cursor=cursor, limit=4)
+        pages.append(page)
+        if not page["has_more"]:
+            break
+        cursor = page["older_cursor"]
+
+    backwards = [msg["content"] for page in reversed(pages) for msg in page["messages"]]
+    assert len(pages) == 4
+    assert backwards == [msg["content"] for msg in chat_store.history("1001")]
+    assert backwards[0] == "question 0" and backwards[-1] == "answer 6"
+
+    forwards, cursor = [], None
+    while True:
+        page = chat_store.page("1001", cursor=cursor, limit=5, direction="newer")
+        forwards += [msg["content"] for msg in page["messages"]]
+        cursor = page["newer_cursor"]
+        if not page["has_more"]:
+            break
+    assert forwards == backwards
+
+    # Nothing newer yet: the cursor stays where it was
+    empty = chat_store.page("1001", cursor=cursor, direction="newer")
+    assert empty["messages"] == [] and empty["newer_cursor"] == cursor
+
+
+def test_history_endpoint_serves_pages_with_etags(client, chat_store):
+    response = client.get("/api/chat/history/1001?limit=3")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [msg["content"] for msg in body["history"]] == ["answer 5", "question 6", "answer 6"]
+    assert body["has_more"] is True
+    etag = response.headers["ETag"]
+
+    assert client.get("/api/chat/history/1001?limit=3", headers={"If-None-Match": etag}).status_code == 304
+
+    older = client.get(f"/api/chat/history/1001?limit=3&cursor={body['older_cursor']}")
+    assert [msg["content"] for msg in older.get_json()["history"]] == ["question 4", "answer 4", "question 5"]
+    assert older.headers["ETag"] != etag
+
+    # A new message changes the latest page
+    chat_store.append_exchange("1001", "question 7", "answer 7")
+    changed = client.get("/api/chat/history/1001?limit=3", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.get_json()["history"][-1]["content"] == "answer 7"
+
+
+@pytest.mark.parametrize("query", ["limit=abc", "cursor=x", "direction=sideways"])
+def test_history_endpoint_rejects_bad_parameters(client, query):
+    assert client.get(f"/api/chat/history/1001?{query}").status_code == 400
+
+
+def test_dedupe_legacy_drops_doubled_exchanges_only():
+    legacy = [
+        {"type": "user", "content": "question 1"},
+        {"type": "assistant", "content": "answer 1"},
+        # The same exchange appended again by the chat endpoint, with timestamps
+        {"type": "user", "content": "question 1", "timestamp": "2025-01-01T10:00:00"},
+        {"type": "bot", "content": "answer 1", "timestamp": "2025-01-01T10:00:01", "status": "sent"},
+        # Asked again later with a different answer: a real exchange
+        {"type": "user", "content": "question 1", "timestamp": "2025-01-02T10:00:00"},
+        {"type": "bot", "content": "answer 2", "timestamp": "2025-01-02T10:00:01"},
+        "not a message",
+        {"type": "user"},
+    ]
+    assert ChatStore._dedupe_legacy(legacy) == [
+        ["user", "question 1", "2025-01-01T10:00:00", "sent"],
+        ["bot", "answer 1", "2025-01-01T10:00:01", "sent"],
+        ["user", "question 1", "2025-01-02T10:00:00", "sent"],
+        ["bot", "answer 2", "2025-01-02T10:00:01", "sent"],
+    ]
+
+
+def test_interrupted_migration_resumes_without_duplicates(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    exchange = [{"type": "user", "content": "q"}, {"type": "bot", "content": "a"}]
+    (data_dir / "chat_history_1001.json").write_text(json.dumps(exchange * 2), encoding="utf-8")
+    (data_dir / "chat_history_2002.json").write_text(json.dumps(exchange), encoding="utf-8")
+    store = ChatStore(data_dir / "chat.sqlite")
+
+    # Stopped after the import was committed but before the file was renamed
+    replace = chat_store_module.os.replace
+
+    def crash_on_1001(src, dst):
+        if "1001" in str(src):
+            raise OSError("interrupted")
+        replace(src, dst)
+
+    monkeypatch.setattr(chat_store_module.os, "replace", crash_on_1001)
+    assert store.migrate_json(str(data_dir)) == {"2002": 2}
+    assert (data_dir / "chat_history_1001.json").exists()
+    assert store.count("1001") == 2
+    monkeypatch.undo()
+
+    # The rerun renames the file without importing it again
+    restarted = ChatStore(data_dir / "chat.sqlite")
+    assert restarted.migrate_json(str(data_dir)) == {"1001": 0}
+    assert restarted.count("1001") == 2 and restarted.count("2002") == 2
+    assert sorted(path.name for path in data_dir.glob("chat_history_*")) == [
+        "chat_history_1001.json.migrated", "chat_history_2002.json.migrated"
+    ]
+    assert restarted.migrate_json(str(data_dir)) == {}
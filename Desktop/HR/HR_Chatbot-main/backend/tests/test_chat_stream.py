@@ -0,0 +1,67 @@
+# test_chat_stream.py
+
+import json
+import queue
+from uuid import uuid4
+
+import pytest
+
+from chat_stream import AgentStreamHandler, FinalAnswerExtractor, format_sse
+
+ANSWER = 'مدة الإجازة "ثلاثون" يوماً\nوفق المادة 5\\أ'
+FINAL_BLOB = (
+    '```json\n{\n  "action": "Final Answer",\n  "action_input": '
+    + json.dumps(ANSWER).replace("ا", "\\u0627") + "\n}\n```"
+)
+TOOL_BLOB = '```json\n{"action": "PolicyQuery", "action_input": "ما هي مدة الإجازة؟"}\n```'
+
+
+def split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64])
+def test_answer_is_decoded_across_any_token_split(size):
+    extractor = FinalAnswerExtractor()
+    pieces = [extractor.feed(token) for token in split(FINAL_BLOB, size)]
+    assert "".join(pieces) == ANSWER
+    # Text arrives as it is generated, not all at the end
+    assert size == 64 or sum(1 for piece in pieces if piece) > 1
+
+
+def test_tool_calls_yield_nothing():
+    extractor = FinalAnswerExtractor()
+    assert "".join(extractor.feed(token) for token in split(TOOL_BLOB, 3)) == ""
+
+
+def parse_sse(stream):
+    events = []
+    for block in stream.split("\n\n")[:-1]:
+        event_line, data_line = block.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+def test_handler_streams_the_final_answer_as_sse_tokens():
+    events = queue.Queue()
+    handler = AgentStreamHandler(events)
+    tool_run, final_run = uuid4(), uuid4()
+    for token in split(TOOL_BLOB, 4):
+        handler.on_llm_new_token(token, run_id=tool_run)
+    handler.on_llm_end(None, run_id=tool_run)
+    for token in split(FINAL_BLOB, 4):
+        handler.on_llm_new_token(token, run_id=final_run)
+
+    stream = ""
+    while not events.empty():
+        stream += format_sse(*events.get())
+    # Arabic is sent as is, one JSON line per event
+    assert 'data: {"text": "م"}' in stream
+    sent = parse_sse(stream)
+    assert {event for event, _ in sent} == {"token"}
+    assert "".join(data["text"] for _, data in sent) == ANSWER == handler.streamed_answer
+
+
+def test_format_sse_keeps_newlines_inside_the_data_line():
+    assert format_sse("token", {"text": "سطر\nآخر"}) == 'event: token\ndata: {"text": "سطر\\nآخر"}\n\n'
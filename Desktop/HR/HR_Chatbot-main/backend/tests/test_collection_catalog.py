@@ -0,0 +1,54 @@
+# test_collection_catalog.py
+
+from types import SimpleNamespace
+
+import pytest
+
+from collection_catalog import CollectionCatalog, LazyCollectionMap
+
+
+class FakeStore:
+    def __init__(self, collection_id, chunks=10):
+        self.collection_id = collection_id
+        self.closed = False
+        self._collection = SimpleNamespace(count=lambda: chunks)
+
+
+@pytest.fixture
+def collections(tmp_path):
+    catalog = CollectionCatalog(tmp_path / "catalog.json")
+    for cid in ("a", "b", "c"):
+        catalog.add(cid, title=cid, chunk_count=10)
+    closed = []
+
+    def close(store):
+        store.closed = True
+        closed.append(store.collection_id)
+
+    mapping = LazyCollectionMap(catalog, FakeStore, closer=close, max_open=2)
+    mapping.closed = closed
+    return mapping
+
+
+def test_least_recently_used_store_is_closed_unless_pinned(collections):
+    with collections.using("a") as store_a:
+        collections["b"]
+        collections["c"]
+        # "a" is in use, so "b" goes instead
+        assert collections.closed == ["b"]
+        assert not store_a.closed
+    assert collections.stats()["resident_count"] == 2
+
+
+def test_removing_a_pinned_store_closes_it_after_the_search(collections):
+    with collections.using("a") as store:
+        del collections["a"]
+        assert "a" not in collections
+        assert not store.closed and collections.closed == []
+    assert store.closed and collections.closed == ["a"]
+
+    collections["b"]
+    del collections["b"]
+    assert collections.closed == ["a", "b"]
+    with pytest.raises(KeyError):
+        collections["b"]
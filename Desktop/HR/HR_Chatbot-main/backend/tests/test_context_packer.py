@@ -0,0 +1,76 @@
+# test_context_packer.py
+
+from langchain_core.documents import Document
+
+from context_packer import ContextPacker
+from embedding_scheduler import count_tokens
+
+SENTENCES = [
+    "Annual leave is 21 working days for employees with less than five years of service.",
+    "Employees with more than five years of service are entitled to 30 days of annual leave.",
+    "Sick leave requires a medical report when it exceeds two consecutive days.",
+    "Maternity leave is 90 days with full pay and may start two weeks before the due date.",
+    "Unpaid leave needs the approval of the department manager and human resources.",
+    "Overtime is paid at one and a half times the hourly wage on working days.",
+]
+
+
+def hit(text, chunk_id, distance, document_id="doc-a", **metadata):
+    return (Document(page_content=text, metadata=dict(
+        metadata, chunk_id=str(chunk_id), document_id=document_id, document_title="policy.pdf"
+    )), distance)
+
+
+def test_exact_and_near_duplicates_are_dropped():
+    packer = ContextPacker(max_tokens=1000)
+    packed = packer.pack([
+        hit(SENTENCES[0], 0, 0.1),
+        hit(SENTENCES[0], 0, 0.3, collection_id="merged"),
+        hit(SENTENCES[0].replace("21", "22"), 7, 0.2, document_id="doc-b"),
+        hit(SENTENCES[2], 4, 0.4),
+    ])
+
+    assert packed.duplicates_dropped == 2
+    assert [doc.page_content for doc in packed.documents] == [SENTENCES[0], SENTENCES[2]]
+    assert packed.tokens < packed.original_tokens
+
+
+def test_closest_chunks_fill_the_budget_first():
+    budget = count_tokens(SENTENCES[3]) + count_tokens(SENTENCES[5]) + count_tokens("\n\n")
+    packer = ContextPacker(max_tokens=budget)
+    packed = packer.pack([
+        hit(SENTENCES[3], 10, 0.1),
+        hit(SENTENCES[1] + " " + SENTENCES[4], 20, 0.2),
+        hit(SENTENCES[5], 30, 0.3),
+    ])
+
+    assert packed.tokens <= budget
+    assert [doc.page_content for doc in packed.documents] == [SENTENCES[3], SENTENCES[5]]
+
+    single = ContextPacker(max_tokens=5).pack([hit(SENTENCES[1], 0, 0.1)])
+    assert single.documents and single.tokens <= 6
+
+
+def test_adjacent_chunks_of_one_document_are_joined_across_collections():
+    overlap = "with full pay"
+    first = "Maternity leave is 90 days " + overlap
+    second = overlap + " and may start two weeks before the due date."
+    packed = ContextPacker(max_tokens=1000).pack([
+        hit(first, 3, 0.2, collection_id="doc_1"),
+        # The same document reached through a merged collection
+        hit(second, 4, 0.1, collection_id="merged_7"),
+    ])
+
+    assert packed.chunks_merged == 1
+    assert packed.documents[0].page_content == "Maternity leave is 90 days with full pay and may start two weeks before the due date."
+    assert packed.documents[0].metadata["merged_chunks"] == 2
+
+
+def test_chunks_of_different_documents_with_one_title_stay_apart():
+    packed = ContextPacker(max_tokens=1000).pack([
+        hit(SENTENCES[0], 3, 0.1, document_id="hash-2024"),
+        hit(SENTENCES[1], 4, 0.2, document_id="hash-2025"),
+    ])
+
+    assert packed.chunks_merged == 0
+    assert len(packed.documents) == 2
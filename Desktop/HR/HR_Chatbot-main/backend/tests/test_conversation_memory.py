@@ -0,0 +1,119 @@
+# test_conversation_memory.py
+
+import threading
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, SystemMessage
+
+from chat_store import ChatStore
+from conversation_memory import ConversationMemory
+from embedding_scheduler import count_tokens
+
+
+class RecordingChatModel(GenericFakeChatModel):
+    """Fake chat model that keeps the prompts it was sent."""
+
+    prompts: list = []
+
+    def _generate(self, messages, *args, **kwargs):
+        self.prompts.append(messages[-1].content)
+        return super()._generate(messages, *args, **kwargs)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChatStore(tmp_path / "chat.sqlite")
+
+
+@pytest.fixture
+def llm():
+    return RecordingChatModel(prompts=[], messages=iter(AIMessage(content=f"summary {i}") for i in range(1, 10)))
+
+
+def add_exchanges(store, first, count, employee_id="1001"):
+    for i in range(first, first + count):
+        store.append_exchange(employee_id, f"question {i}", f"answer {i}")
+
+
+def refresh(memory, employee_id="1001"):
+    """Run maybe_refresh and wait for its background summary."""
+    memory.maybe_refresh(employee_id)
+    for thread in threading.enumerate():
+        if thread.name == f"chat-summary-{employee_id}":
+            thread.join(timeout=10)
+
+
+def contents(messages):
+    return [message.content for message in messages]
+
+
+def test_summary_watermark_advances_one_batch_at_a_time(store, llm):
+    memory = ConversationMemory(llm, store, window_messages=4, summary_batch=4)
+
+    add_exchanges(store, 0, 3)
+    refresh(memory)
+    messages, report = memory.build("1001")
+    # Not a full batch past the window yet: everything is sent, nothing summarized
+    assert llm.prompts == [] and report["summarized_through"] == 0
+    assert contents(messages)[0] == "question 0" and len(messages) == 6
+
+    add_exchanges(store, 3, 1)
+    refresh(memory)
+    ids = [int(msg["id"]) for msg in store.history("1001")]
+    assert store.summary("1001") == {"summary": "summary 1", "last_message_id": ids[3]}
+    assert "question 0" in llm.prompts[0] and "answer 1" in llm.prompts[0] and "question 2" not in llm.prompts[0]
+
+    messages, report = memory.build("1001")
+    assert isinstance(messages[0], SystemMessage) and "summary 1" in messages[0].content
+    assert contents(messages[1:]) == ["question 2", "answer 2", "question 3", "answer 3"]
+    assert report["summarized_through"] == ids[3] and report["loaded_messages"] == 4
+
+    add_exchanges(store, 4, 2)
+    refresh(memory)
+    # Only the batch that left the window is sent, on top of the previous summary
+    assert len(llm.prompts) == 2
+    assert "summary 1" in llm.prompts[1] and "question 2" in llm.prompts[1]
+    assert "answer 1" not in llm.prompts[1] and "question 4" not in llm.prompts[1]
+    assert store.summary("1001")["last_message_id"] == int(store.history("1001")[7]["id"])
+
+    messages, _ = memory.build("1001")
+    assert "summary 2" in messages[0].content
+    assert contents(messages[1:]) == ["question 4", "answer 4", "question 5", "answer 5"]
+    assert memory.stats()["summaries"] == 2
+
+
+def test_window_holds_unsummarized_messages_up_to_a_batch_past_it(store, llm):
+    memory = ConversationMemory(llm, store, window_messages=4, summary_batch=2)
+    add_exchanges(store, 0, 5)
+
+    # No summary yet: the newest window + batch messages are read
+    messages, report = memory.build("1001")
+    assert contents(messages) == [f"{kind} {i}" for i in range(2, 5) for kind in ("question", "answer")]
+    assert report["loaded_messages"] == 6 and not report["trimmed"]
+
+
+def test_history_is_capped_at_max_prompt_tokens(store, llm):
+    long_text = "سياسة الإجازات " * 20
+    per_message = count_tokens(long_text)
+    memory = ConversationMemory(llm, store, window_messages=10, summary_batch=10,
+                                max_prompt_tokens=3 * per_message + 5)
+    for _ in range(5):
+        store.append_exchange("1001", long_text, long_text)
+
+    messages, report = memory.build("1001")
+    assert len(messages) == 3
+    assert report["trimmed"] and report["history_tokens"] <= memory.max_prompt_tokens
+    assert memory.stats()["trimmed_turns"] == 1
+
+    # A summary gets at most half the budget; the rest goes to recent messages
+    store.save_summary("1001", "ملخص طويل " * 500, int(store.history("1001")[1]["id"]))
+    messages, report = memory.build("1001")
+    assert isinstance(messages[0], SystemMessage)
+    assert report["summary_tokens"] <= memory.max_prompt_tokens // 2
+    assert report["history_tokens"] <= memory.max_prompt_tokens and len(messages) >= 2
+
+    # The newest message is always sent, even when it alone is over the cap
+    memory.max_prompt_tokens = 5
+    messages, _ = memory.build("1001")
+    assert contents(messages)[-1] == long_text
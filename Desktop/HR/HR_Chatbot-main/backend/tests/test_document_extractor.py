@@ -0,0 +1,69 @@
+# test_document_extractor.py
+
+import bisect
+
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+import config
+from document_extractor import DocumentExtractor
+
+
+def make_pdf(path, pages):
+    """Write a PDF with one line of Helvetica text per page."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica")
+    }))
+    for text in pages:
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})
+        })
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 9 Tf 30 770 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    # Pages of 8 to 68 sentences: some chunks span pages, long pages split inside
+    return make_pdf(tmp_path / "policy.pdf", [
+        " ".join(f"Page {p} rule {i} allows leave number {p * 100 + i} after approval."
+                 for i in range(8 + 20 * (p % 4)))
+        for p in range(1, 13)
+    ])
+
+
+def test_page_windows_split_like_the_whole_document(pdf, monkeypatch):
+    # Far below the text size, so the buffer is split and carried over many times
+    monkeypatch.setitem(config.INGESTION_CONFIG, "page_buffer_chars", 1500)
+    extractor = DocumentExtractor()
+    pages = list(extractor.iter_pages(pdf))
+    assert [number for number, _ in pages] == list(range(1, 13))
+
+    whole = extractor._extract_pdf_text(pdf)
+    chunks = list(extractor.iter_chunks(pdf))
+    assert [chunk for chunk, _ in chunks] == extractor.text_splitter.split_text(whole)
+    assert any(info["page"] != info["page_end"] for _, info in chunks)
+    assert any(info["page"] == previous["page"] for (_, info), (_, previous) in zip(chunks[1:], chunks))
+
+    # Page numbers match where each chunk starts and ends in the whole text
+    page_starts, offset = [], 0
+    for _, text in pages:
+        page_starts.append(offset)
+        offset += len(text) + 2
+    cursor = 0
+    for chunk, info in chunks:
+        start = whole.find(chunk, cursor)
+        assert info == {
+            "page": bisect.bisect_right(page_starts, start),
+            "page_end": bisect.bisect_right(page_starts, start + len(chunk) - 1)
+        }
+        cursor = start + 1
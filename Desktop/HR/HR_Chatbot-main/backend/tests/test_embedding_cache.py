@@ -0,0 +1,48 @@
+# test_embedding_cache.py
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_cached_texts_are_not_embedded_again(tmp_path):
+    model = CountingEmbeddings(size=8)
+    cache = CachedEmbeddings(model, tmp_path / "cache.sqlite")
+
+    first = cache.embed_documents(["leave policy", "sick  leave", "leave policy"])
+    second = cache.embed_documents(["sick leave", "overtime"])
+
+    assert model.calls == 3
+    assert second[0] == pytest.approx(first[1], rel=1e-6)
+    assert cache.stats()["entries"] == 3
+
+
+def test_storing_known_keys_does_not_grow_the_count(tmp_path):
+    cache = CachedEmbeddings(CountingEmbeddings(size=8), tmp_path / "cache.sqlite")
+    vectors = {cache._key(f"text {i}"): [float(i)] * 8 for i in range(3)}
+    cache._store(vectors)
+    cache._store(vectors)
+
+    assert cache.stats()["entries"] == 3
+    assert CachedEmbeddings(CountingEmbeddings(size=8), tmp_path / "cache.sqlite").stats()["entries"] == 3
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = CachedEmbeddings(CountingEmbeddings(size=8), tmp_path / "cache.sqlite", max_entries=3)
+    cache.embed_documents(["a", "b", "c"])
+    cache._conn.execute("UPDATE embeddings SET last_access = 0 WHERE key = ?", (cache._key("a"),))
+    cache.embed_documents(["d"])
+
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["evictions"] == 1
+    assert cache._lookup([cache._key("a")]) == {}
+    assert set(cache._lookup([cache._key(t) for t in "bcd"])) == {cache._key(t) for t in "bcd"}
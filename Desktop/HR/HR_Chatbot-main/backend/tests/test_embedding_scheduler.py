@@ -0,0 +1,92 @@
+# test_embedding_scheduler.py
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+import embedding_scheduler
+from embedding_scheduler import EmbeddingScheduler, count_tokens
+
+
+class RateLimitError(Exception):
+    """Shaped like the OpenAI client's 429 error."""
+
+    def __init__(self, retry_after):
+        super().__init__("Error code: 429")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after})
+
+
+class FakeEmbeddings(Embeddings):
+    """Embeds a text as [its leading number, its length]; the first call can be rate limited."""
+
+    def __init__(self, retry_after=None):
+        self.retry_after = retry_after
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+            if self.retry_after is not None:
+                retry_after, self.retry_after = self.retry_after, None
+                raise RateLimitError(retry_after)
+        return [[float(text.split()[0]), float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def texts(count, words=20):
+    return [f"{i} " + "policy " * words for i in range(count)]
+
+
+def test_batches_stay_under_the_token_and_size_limits():
+    chunks = texts(10)
+    per_text = count_tokens(chunks[1])
+    scheduler = EmbeddingScheduler(FakeEmbeddings(), max_batch_tokens=3 * per_text, max_batch_size=100)
+    assert scheduler.make_batches(chunks) == [(0, 3), (3, 6), (6, 9), (9, 10)]
+
+    scheduler.max_batch_size = 2
+    assert scheduler.make_batches(chunks) == [(0, 2), (2, 4), (4, 6), (6, 8), (8, 10)]
+
+    # A text over the budget on its own still gets a batch
+    oversized = chunks[:2] + ["2 " + "policy " * 400] + chunks[3:5]
+    scheduler.max_batch_size = 100
+    assert scheduler.make_batches(oversized) == [(0, 2), (2, 3), (3, 5)]
+
+
+def test_rate_limit_backs_off_for_retry_after_and_retries(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(embedding_scheduler.time, "sleep", sleeps.append)
+    fake = FakeEmbeddings(retry_after="2.5")
+    scheduler = EmbeddingScheduler(fake, concurrency=1, initial_backoff=1.0)
+
+    vectors = scheduler.embed(texts(4))
+    assert [vector[0] for vector in vectors] == [0.0, 1.0, 2.0, 3.0]
+    # The rejected batch is sent again after the server's hint, not the 1s default
+    assert len(fake.batches) == 2 and fake.batches[0] == fake.batches[1]
+    assert sleeps == [pytest.approx(2.5, abs=0.1)]
+    assert scheduler.rate_limited == 1 and scheduler.last_run["rate_limited"] == 1
+
+
+def test_rate_limit_without_retry_after_uses_the_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(embedding_scheduler.time, "sleep", sleeps.append)
+    scheduler = EmbeddingScheduler(FakeEmbeddings(retry_after="soon"), concurrency=1, initial_backoff=0.5)
+
+    scheduler.embed(texts(2))
+    assert sleeps == [pytest.approx(0.5, abs=0.1)]
+
+
+def test_progress_callback_reports_every_batch_in_order():
+    chunks = texts(7)
+    scheduler = EmbeddingScheduler(FakeEmbeddings(), max_batch_size=3, concurrency=2)
+    progress = []
+
+    vectors = scheduler.embed(chunks, progress_callback=lambda done, total, rate: progress.append((done, total, rate)))
+    assert [vector[0] for vector in vectors] == [float(i) for i in range(7)]
+    assert sorted(done for done, _, _ in progress) == [done for done, _, _ in progress]
+    assert [done for done, _, _ in progress][-1] == 7 and len(progress) == 3
+    assert all(total == 7 and rate > 0 for _, total, rate in progress)
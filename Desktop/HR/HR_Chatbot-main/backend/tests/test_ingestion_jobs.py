@@ -0,0 +1,87 @@
+# test_ingestion_jobs.py
+
+import json
+import threading
+import time
+from collections import Counter
+
+from ingestion_jobs import IngestionJobQueue
+
+
+class RecordingIngest:
+    """Ingest function that counts calls per file."""
+
+    def __init__(self, fail_on=()):
+        self.calls = Counter()
+        self.fail_on = set(fail_on)
+        self._lock = threading.Lock()
+
+    def __call__(self, file_path, progress_callback=None, **options):
+        with self._lock:
+            self.calls[file_path] += 1
+        if progress_callback:
+            progress_callback(1, 2, 10.0)
+        time.sleep(0.01)
+        if file_path in self.fail_on:
+            raise RuntimeError("broken file")
+        return f"collection-{file_path}"
+
+
+def wait_for(jobs, job_ids, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(jobs.get(job_id)['status'] in ('completed', 'failed') for job_id in job_ids):
+            return
+        time.sleep(0.01)
+    raise AssertionError("jobs did not finish")
+
+
+def persisted_job(job_id, file_path, status, created_at):
+    return {
+        'job_id': job_id, 'file_path': file_path, 'options': {}, 'filename': file_path,
+        'status': status, 'stage': status, 'progress': 0.5, 'chunks_embedded': 0,
+        'chunks_total': 0, 'chunks_per_sec': 0.0, 'collection_id': None, 'error': None,
+        'created_at': created_at, 'updated_at': created_at
+    }
+
+
+def test_submitted_jobs_run_exactly_once(tmp_path):
+    ingest = RecordingIngest(fail_on={"bad.pdf"})
+    jobs = IngestionJobQueue(ingest, tmp_path / "jobs.json", workers=4)
+
+    submitted = [jobs.submit(f"doc{i}.pdf") for i in range(20)] + [jobs.submit("bad.pdf")]
+    wait_for(jobs, [job['job_id'] for job in submitted])
+
+    assert all(count == 1 for count in ingest.calls.values())
+    assert len(ingest.calls) == 21
+    job = jobs.get(submitted[0]['job_id'])
+    assert job['status'] == 'completed' and job['collection_id'] == "collection-doc0.pdf"
+    failed = jobs.get(submitted[-1]['job_id'])
+    assert failed['status'] == 'failed' and failed['error'] == "broken file"
+
+
+def test_interrupted_jobs_are_recovered_after_restart(tmp_path):
+    jobs_path = tmp_path / "jobs.json"
+    jobs_path.write_text(json.dumps({
+        'a': persisted_job('a', "running.pdf", 'running', '2025-01-01T10:00:00'),
+        'b': persisted_job('b', "queued.pdf", 'queued', '2025-01-01T10:01:00'),
+        'c': dict(persisted_job('c', "done.pdf", 'completed', '2025-01-01T09:00:00'), collection_id="x"),
+    }), encoding='utf-8')
+
+    ingest = RecordingIngest()
+    jobs = IngestionJobQueue(ingest, jobs_path, workers=2)
+    assert jobs.get('a')['status'] == 'running'
+
+    # Submitting before start() must not queue the new job a second time
+    new_job = jobs.submit("new.pdf")
+    jobs.start()
+    wait_for(jobs, ['a', 'b', new_job['job_id']])
+
+    assert ingest.calls == Counter({"running.pdf": 1, "queued.pdf": 1, "new.pdf": 1})
+    assert jobs.get('c')['collection_id'] == "x"
+
+    # The finished states survive another restart
+    reloaded = IngestionJobQueue(RecordingIngest(), jobs_path)
+    assert {job_id: job['status'] for job_id, job in reloaded.jobs.items()} == {
+        'a': 'completed', 'b': 'completed', 'c': 'completed', new_job['job_id']: 'completed'
+    }
@@ -0,0 +1,62 @@
+# test_ingestion_manifest.py
+
+import os
+
+import pytest
+
+import ingestion_manifest
+
+
+@pytest.fixture
+def ingested(rag, tmp_path, monkeypatch):
+    """A policy file ingested once, with every later ingestion and hash counted."""
+    document = tmp_path / "policy.txt"
+    document.write_text("مدة الإجازة السنوية ثلاثون يوما. " * 40, encoding="utf-8")
+    collection_id = rag.process_document(str(document))
+
+    calls = {"ingest": 0, "hash": 0}
+    ingest, hash_file = rag._ingest_document, ingestion_manifest.hash_file
+
+    def counting_ingest(*args, **kwargs):
+        calls["ingest"] += 1
+        return ingest(*args, **kwargs)
+
+    def counting_hash(*args, **kwargs):
+        calls["hash"] += 1
+        return hash_file(*args, **kwargs)
+
+    monkeypatch.setattr(rag, "_ingest_document", counting_ingest)
+    monkeypatch.setattr(ingestion_manifest, "hash_file", counting_hash)
+    return rag, document, collection_id, calls
+
+
+def test_unchanged_file_is_skipped_without_hashing(ingested):
+    rag, document, collection_id, calls = ingested
+
+    assert rag.process_document(str(document)) == collection_id
+    assert calls == {"ingest": 0, "hash": 0}
+
+
+def test_touched_identical_file_is_skipped_via_the_hash(ingested):
+    rag, document, collection_id, calls = ingested
+    stat = document.stat()
+    os.utime(document, (stat.st_atime + 60, stat.st_mtime + 60))
+
+    assert rag.process_document(str(document)) == collection_id
+    assert calls == {"ingest": 0, "hash": 1}
+    # The new mtime is remembered, so the next check is a stat call again
+    assert float(rag.manifest.get(str(document))["mtime"]) == document.stat().st_mtime
+    assert rag.process_document(str(document)) == collection_id
+    assert calls == {"ingest": 0, "hash": 1}
+
+
+def test_changed_file_is_re_embedded_and_replaces_its_collection(ingested):
+    rag, document, collection_id, calls = ingested
+    document.write_text("مدة الإجازة المرضية خمسة عشر يوما. " * 40, encoding="utf-8")
+
+    new_collection_id = rag.process_document(str(document))
+    assert calls["ingest"] == 1
+    assert new_collection_id != collection_id
+    assert rag.manifest.get(str(document))["collection_id"] == new_collection_id
+    assert rag._has_collection(new_collection_id)
+    assert not rag._has_collection(collection_id)
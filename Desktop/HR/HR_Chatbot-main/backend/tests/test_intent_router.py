@@ -0,0 +1,74 @@
+# test_intent_router.py
+
+import pytest
+
+
+@pytest.mark.parametrize("message", [
+    "كم رصيد إجازتي؟",
+    "رَصِيدُ الإجازات",
+    "كم يوم باقي لي",
+    "my leave balance",
+])
+def test_balance_questions_are_answered_directly(router, message):
+    answer = router.route(message, "1001")
+    assert answer is not None
+    assert answer.intent == "vacation_balance"
+    assert "15.5" in answer.answer
+
+
+@pytest.mark.parametrize("message", ["اعرض طلباتي", "ما حالة طلبي", "my requests"])
+def test_request_listings_are_answered_directly(router, message):
+    answer = router.route(message, "1001")
+    assert answer is not None
+    assert answer.intent == "my_requests"
+
+
+@pytest.mark.parametrize("message", [
+    "اريد الغاء طلباتي",
+    "الغي طلباتي",
+    "ألغِ طلبي",
+    "عدل طلباتي",
+    "عدّل تذكرتي",
+    "أريد إنشاء تذكرة",
+    "ابغى اقدم طلب اجازة",
+    "cancel my requests",
+    "modify my requests",
+    "apply for leave balance",
+    "what is my leave balance policy?",
+    "ما هي سياسة رصيد الاجازات؟",
+])
+def test_actions_and_policy_questions_reach_the_agent(router, message):
+    assert router.route(message, "1001") is None
+    assert router.classify(message)[2] == "blocked"
+
+
+def test_unknown_employee_and_missing_id(router):
+    assert "9999" in router.route("كم رصيد اجازتي", "9999").answer
+    assert router.route("كم رصيد اجازتي", None) is None
+    assert router.stats()["fallthrough"]["missing_employee_id"] == 1
+
+
+@pytest.mark.parametrize("message", [
+    "ما هي مدة الإجازة السنوية؟",
+    "كم يوم إجازة الزواج؟",
+    "ما هي سياسة العمل عن بعد؟",
+    "هل يحق لي اجازة مرضية؟",
+    "ما الحد الأقصى للإجازة المرضية؟",
+    "ما هي شروط إجازة الأمومة؟",
+    "How many days of sick leave do I get?",
+])
+def test_policy_questions(router, message):
+    assert router.is_policy_question(message)
+
+
+@pytest.mark.parametrize("message", [
+    "كم رصيد اجازتي؟",
+    "كم يوم اجازة باقي لي",
+    "كم يوم عندي اجازة؟",
+    "ما مدة طلبي؟",
+    "اريد الغاء طلباتي",
+    "what is my leave balance policy?",
+    "مرحبا",
+])
+def test_personal_action_and_small_talk_are_not_policy_questions(router, message):
+    assert not router.is_policy_question(message)
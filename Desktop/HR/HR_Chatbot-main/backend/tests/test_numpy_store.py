@@ -0,0 +1,121 @@
+# test_numpy_store.py
+
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+
+from numpy_store import NumpyCollection, recall_latency_report
+
+
+def fill(collection, count, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    collection.add(
+        ids=[f"id{i}" for i in range(count)],
+        embeddings=vectors,
+        documents=[f"text {i}" for i in range(count)],
+        metadatas=[{"collection_id": f"c{i % 3}", "chunk_id": str(i)} for i in range(count)]
+    )
+    return vectors
+
+
+def test_query_returns_exact_neighbours_with_their_records(tmp_path):
+    collection = NumpyCollection(tmp_path)
+    vectors = fill(collection, 200)
+
+    hits = collection.search(vectors[17], k=3)
+    assert hits[0][:3] == ("id17", "text 17", {"collection_id": "c2", "chunk_id": "17"})
+    assert hits[0][3] == pytest.approx(0.0, abs=1e-3)
+
+    scoped = collection.search(vectors[17], k=5, where={"collection_id": "c0"})
+    assert len(scoped) == 5
+    assert all(metadata["collection_id"] == "c0" for _, _, metadata, _ in scoped)
+    restricted = [chunk_id for chunk_id, _ in collection.query(vectors[17], k=5, ids={"id4", "id5", "id17"})]
+    assert restricted[0] == "id17" and sorted(restricted) == ["id17", "id4", "id5"]
+
+
+def test_delete_compacts_and_other_instances_reload(tmp_path):
+    writer = NumpyCollection(tmp_path)
+    vectors = fill(writer, 90)
+    reader = NumpyCollection(tmp_path)
+    assert reader.count() == 90
+
+    writer.delete(where={"collection_id": "c1"})
+    writer.delete(ids=["id0"])
+    assert writer.count() == 59
+    assert reader.count() == 59
+    stored = reader.get(include=["documents", "metadatas", "embeddings"])
+    assert "id0" not in stored["ids"] and len(stored["documents"]) == 59
+    row = stored["ids"].index("id3")
+    assert stored["documents"][row] == "text 3"
+    assert np.allclose(stored["embeddings"][row], vectors[3])
+
+    assert reader.get(where={"chunk_id": "6"})["documents"] == ["text 6"]
+    assert reader.search(vectors[42], k=1)[0][:2] == ("id42", "text 42")
+
+
+def test_queries_stay_consistent_during_deletes(tmp_path):
+    collection = NumpyCollection(tmp_path)
+    vectors = fill(collection, 300)
+    errors = []
+    done = threading.Event()
+
+    def query_loop():
+        try:
+            while not done.is_set():
+                for chunk_id, document, _, _ in collection.search(vectors[150], k=10):
+                    assert document == f"text {chunk_id[2:]}"
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=query_loop) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for start in range(0, 280, 20):
+        collection.delete(ids=[f"id{i}" for i in range(start, start + 20) if i != 150])
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert collection.count() == 21
+
+
+@pytest.mark.parametrize("mode", ["int8", "float16"])
+def test_quantized_search_recall_against_exact(tmp_path, mode):
+    vectors = fill(NumpyCollection(tmp_path), 2000, dim=64)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), 50, replace=False)]
+    queries = queries + rng.normal(scale=0.1, size=queries.shape).astype(np.float32)
+
+    report = recall_latency_report(tmp_path, queries, k=10, quantizations=[mode])
+    assert report["float32"]["recall_at_k"] == 1.0
+    assert report[mode]["recall_at_k"] >= 0.95
+    assert report[mode]["scan_bytes"] < report["float32"]["scan_bytes"]
+
+
+def _open_quantized(path):
+    NumpyCollection(path, quantization="int8")
+
+
+def test_worker_processes_build_one_complete_compact_copy(tmp_path):
+    vectors = fill(NumpyCollection(tmp_path), 6000, dim=64)
+
+    # Every worker finds the compact copy missing and builds it on open
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_open_quantized, args=(tmp_path,)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    assert (tmp_path / "vectors.g0.int8").stat().st_size == 6000 * 64
+    assert (tmp_path / "scales.g0.f32").stat().st_size == 6000 * 4
+    collection = NumpyCollection(tmp_path, quantization="int8")
+    expected, scales = collection._quantize(vectors)
+    state = collection._refresh()
+    np.testing.assert_array_equal(np.asarray(state.quantized), expected)
+    np.testing.assert_array_equal(state.scales, scales)
@@ -0,0 +1,84 @@
+# test_policy_modes.py
+
+import json
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+import agent
+import config
+import rag_system
+
+RECOGNISED = "ما هي مدة الإجازة السنوية؟"
+# No policy term, so IntentRouter.is_policy_question lets it through to the agent
+UNRECOGNISED = "أخبرني عن العمل عن بعد"
+
+
+class CountingChatModel(GenericFakeChatModel):
+    """Fake chat model replaying `replies` in a loop and counting its calls."""
+
+    calls: int = 0
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        return super()._generate(*args, **kwargs)
+
+
+def agent_step(action, action_input):
+    return AIMessage(content="```\n" + json.dumps({"action": action, "action_input": action_input}) + "\n```")
+
+
+@pytest.fixture
+def make_agent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    monkeypatch.setattr(rag_system, "OpenAIEmbeddings", lambda api_key, model: DeterministicFakeEmbedding(size=32))
+    monkeypatch.setitem(config.VECTOR_INDEX_CONFIG, "mode", "collections")
+    monkeypatch.setitem(config.RETRIEVAL_CONFIG, "max_distance", None)
+
+    def make(mode, agent_replies):
+        monkeypatch.setitem(config.POLICY_ANSWER_CONFIG, "mode", mode)
+        agent_llm = CountingChatModel(messages=iter(agent_replies))
+        monkeypatch.setattr(agent, "ChatGoogleGenerativeAI", lambda **kwargs: agent_llm)
+        hr_agent = agent.HRAgent("test-key", "test-key", "data/vacations.csv", "data/tickets.csv")
+
+        document = tmp_path / "data" / "policy.txt"
+        document.write_text("مدة الإجازة السنوية ثلاثون يوما. " * 50, encoding="utf-8")
+        hr_agent.rag_tool.rag_system.process_document(str(document))
+        rag_llm = CountingChatModel(messages=iter([AIMessage(content="ثلاثون يوماً")]))
+        hr_agent.rag_tool.rag_system.llm = rag_llm
+        return hr_agent, agent_llm, rag_llm
+
+    return make
+
+
+@pytest.mark.parametrize("mode, question, replies, path, agent_calls, rag_calls", [
+    ("agent", RECOGNISED, [agent_step("PolicyQuery", RECOGNISED), agent_step("Final Answer", "ثلاثون يوماً")],
+     "agent/agent", 2, 1),
+    ("context", RECOGNISED, [agent_step("PolicyQuery", RECOGNISED), agent_step("Final Answer", "ثلاثون يوماً")],
+     "context/agent", 2, 0),
+    ("direct", RECOGNISED, [], "direct/rag", 0, 1),
+    ("direct", UNRECOGNISED, [agent_step("PolicyQuery", UNRECOGNISED)], "direct/agent_fallback", 1, 1),
+])
+def test_llm_calls_per_policy_mode(make_agent, mode, question, replies, path, agent_calls, rag_calls):
+    hr_agent, agent_llm, rag_llm = make_agent(mode, replies)
+
+    assert hr_agent.process_query(question, "1001") == "ثلاثون يوماً"
+    assert (agent_llm.calls, rag_llm.calls) == (agent_calls, rag_calls)
+
+    # The logged path counts every call, including the generation inside the tool
+    paths = hr_agent.policy_stats.stats()
+    assert list(paths) == [path]
+    assert paths[path]["avg_llm_calls"] == agent_calls + rag_calls
+
+
+def test_streamed_direct_answer_makes_one_call(make_agent):
+    hr_agent, agent_llm, rag_llm = make_agent("direct", [])
+
+    events = list(hr_agent.stream_query(RECOGNISED, "1001"))
+    assert events[-1][0] == "done" and events[-1][1]["response"] == "ثلاثون يوماً"
+    assert "".join(data["text"] for event, data in events if event == "token") == "ثلاثون يوماً"
+    assert (agent_llm.calls, rag_llm.calls) == (0, 1)
+    assert hr_agent.policy_stats.stats()["direct/rag"]["avg_llm_calls"] == 1
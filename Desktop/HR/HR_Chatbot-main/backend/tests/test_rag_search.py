@@ -0,0 +1,61 @@
+# test_rag_search.py
+
+import threading
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+
+class FakeStore:
+    """Vector store answering with one chunk, optionally after a delay."""
+
+    def __init__(self, name, release=None):
+        self.name = name
+        self.release = release
+        self.searches = 0
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, **kwargs):
+        self.searches += 1
+        if self.release is not None:
+            self.release.wait(5)
+        return [(Document(page_content=f"chunk of {self.name}", metadata={"chunk_id": "0"}), 0.1)]
+
+
+@pytest.fixture
+def stores(rag, monkeypatch):
+    monkeypatch.setitem(rag.retrieval_config, "collection_timeout", 0.2)
+    monkeypatch.setitem(rag.retrieval_config, "deadline", 0.5)
+    release = threading.Event()
+    stores = {"fast": FakeStore("fast"), "slow": FakeStore("slow", release)}
+    for cid, store in stores.items():
+        rag.active_collections[cid] = store
+    yield stores, release
+    release.set()
+
+
+def test_slow_collection_is_left_out_of_the_merge(rag, stores):
+    started_at = time.monotonic()
+    hits = rag._search_collections("question", ["fast", "slow"], embedding=[0.0] * 32)
+
+    assert time.monotonic() - started_at < 1.0
+    assert [doc.metadata["source_collection"] for doc, _ in hits] == ["fast"]
+
+
+def test_collection_with_an_abandoned_search_is_not_searched_again(rag, stores):
+    stores, release = stores
+    rag._search_collections("question", ["fast", "slow"], embedding=[0.0] * 32)
+    hits = rag._search_collections("question", ["fast", "slow"], embedding=[0.0] * 32)
+
+    assert [doc.metadata["source_collection"] for doc, _ in hits] == ["fast"]
+    assert stores["slow"].searches == 1
+    assert stores["fast"].searches == 2
+
+    # Once the abandoned search finishes the collection is searched again
+    release.set()
+    deadline = time.monotonic() + 2
+    while rag._abandoned_searches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    hits = rag._search_collections("question", ["fast", "slow"], embedding=[0.0] * 32)
+    assert sorted(doc.metadata["source_collection"] for doc, _ in hits) == ["fast", "slow"]
+    assert stores["slow"].searches == 2
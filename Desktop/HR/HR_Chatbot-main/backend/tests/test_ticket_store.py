@@ -0,0 +1,40 @@
+# test_ticket_store.py
+
+import csv
+from concurrent.futures import ThreadPoolExecutor
+
+from ticket_store import TICKET_COLUMNS, TicketStore
+
+
+def test_concurrent_creates_get_unique_ids_past_999(tmp_path):
+    store = TicketStore(tmp_path / "tickets.sqlite")
+    store.create({"ticket_id": "VT2025990", "employee_id": "1001", "status": "pending"})
+
+    def create(i):
+        return store.create({"employee_id": str(1000 + i % 5), "status": "pending"}, id_prefix="VT2025")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tickets = list(executor.map(create, range(1100)))
+
+    ids = [ticket["ticket_id"] for ticket in tickets]
+    assert len(set(ids)) == 1100
+    numbers = sorted(int(ticket_id[len("VT2025"):]) for ticket_id in ids)
+    # 990 was taken by hand and is skipped; numbers keep growing past 999
+    assert numbers[:3] == [1, 2, 3]
+    assert 990 not in numbers and numbers[-1] == 1101
+    assert "VT20251000" in ids
+    assert store.stats()["tickets"] == 1101
+
+
+def test_imported_ids_advance_the_counter(tmp_path):
+    csv_path = tmp_path / "tickets.csv"
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=TICKET_COLUMNS)
+        writer.writeheader()
+        writer.writerow({"ticket_id": "VT20251205", "employee_id": "1001.0", "days_count": "3", "status": "approved"})
+        writer.writerow({"ticket_id": "ST2025007", "employee_id": "1002", "status": "open"})
+
+    store = TicketStore.for_csv(str(csv_path))
+    assert store.get("VT20251205")["employee_id"] == "1001"
+    assert store.create({"employee_id": "1001"}, id_prefix="VT2025")["ticket_id"] == "VT20251206"
+    assert store.create({"employee_id": "1002"}, id_prefix="ST2025")["ticket_id"] == "ST2025008"
@@ -0,0 +1,53 @@
+# test_vacation_tool.py
+
+import os
+
+import pandas as pd
+
+from tools import vacation_tool as vacation_tool_module
+
+
+def edit_balance(path, remaining):
+    """Change the file like HR would, keeping its size, with a later mtime."""
+    stat = os.stat(path)
+    df = pd.read_csv(path)
+    df.loc[0, "remaining_balance"] = remaining
+    df.to_csv(path, index=False)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_index_reloads_only_when_the_file_changes(vacation_tool):
+    assert vacation_tool.check_balance("1001")["remaining_balance"] == 15.5
+    assert vacation_tool.check_balance(1001.0)["remaining_balance"] == 15.5
+    assert vacation_tool.stats()["reloads"] == 1
+
+    size = os.path.getsize(vacation_tool.vacations_file)
+    edit_balance(vacation_tool.vacations_file, 12.5)
+    assert os.path.getsize(vacation_tool.vacations_file) == size
+    assert vacation_tool.check_balance("1001")["remaining_balance"] == 12.5
+    assert vacation_tool.stats()["reloads"] == 2
+
+
+def test_own_write_does_not_trigger_a_reload(vacation_tool):
+    vacation_tool.check_balance("1001")
+    assert vacation_tool.update_balance("1001", 2)["status"] == "success"
+
+    assert vacation_tool.check_balance("1001")["remaining_balance"] == 13.5
+    assert vacation_tool.stats()["reloads"] == 1
+    # The file holds the update too
+    assert pd.read_csv(vacation_tool.vacations_file).loc[0, "remaining_balance"] == 13.5
+
+
+def test_failed_save_resets_the_index_to_the_file(vacation_tool, monkeypatch):
+    vacation_tool.check_balance("1001")
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(vacation_tool_module.os, "replace", fail)
+    assert vacation_tool.update_balance("1001", 2)["status"] == "error"
+    monkeypatch.undo()
+
+    # The in-memory update never reached the file, so it is dropped
+    assert vacation_tool.check_balance("1001")["remaining_balance"] == 15.5
+    assert vacation_tool.stats()["reloads"] == 2
@@ -0,0 +1,52 @@
+# test_vector_index.py
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import vector_index
+from vector_index import ShardedVectorIndex
+
+
+def build_index(path, backend):
+    index = ShardedVectorIndex(path, DeterministicFakeEmbedding(size=16), num_shards=2, backend=backend)
+    for collection, count in (("small", 6), ("large", 120), ("other", 60)):
+        texts = [f"{collection} chunk {i}" for i in range(count)]
+        index.add_texts(collection, collection, texts, [{"collection_id": collection} for _ in texts])
+    return index
+
+
+def exact_scoped(index, query, k, collection_ids):
+    """Brute force: rank every stored chunk, keep those of the collections."""
+    scope = set(index.chunk_store.hashes_for(collection_ids))
+    hits = index.search(query, k=10_000)
+    return [doc.metadata["chunk_hash"] for doc, _ in hits if doc.metadata["chunk_hash"] in scope][:k]
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+@pytest.mark.parametrize("filter_limit,max_overfetch", [
+    (1000, 4000),  # every scope fits one `$in` filter
+    (5, 4000),     # large scopes are over-fetched and intersected
+    (5, 10),       # sparse scopes fall back to bounded filter slices
+])
+def test_scoped_search_matches_exact_results(tmp_path, monkeypatch, backend, filter_limit, max_overfetch):
+    monkeypatch.setattr(vector_index, "SCOPE_FILTER_LIMIT", filter_limit)
+    monkeypatch.setattr(vector_index, "MAX_OVERFETCH", max_overfetch)
+    index = build_index(tmp_path / backend, backend)
+
+    for collection_ids in (["small"], ["large"], ["small", "other"]):
+        for query in ("large chunk 7", "other chunk 30", "unrelated question"):
+            hits = index.search(query, k=5, collection_ids=collection_ids)
+            assert [doc.metadata["chunk_hash"] for doc, _ in hits] == \
+                exact_scoped(index, query, 5, collection_ids)
+            assert all(doc.metadata["collection_id"] in collection_ids for doc, _ in hits)
+
+
+def test_scope_cache_follows_collection_changes(tmp_path):
+    index = build_index(tmp_path, "numpy")
+    assert index.search("small chunk 1", k=50, collection_ids=["merged"]) == []
+
+    index.copy_collections(["small"], "merged", "merged")
+    assert len(index.search("small chunk 1", k=50, collection_ids=["merged"])) == 6
+
+    index.delete_collection("merged")
+    assert index.search("small chunk 1", k=50, collection_ids=["merged"]) == []
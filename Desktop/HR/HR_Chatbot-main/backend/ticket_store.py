@@ -0,0 +1,299 @@
+# ticket_store.py
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Column order of the legacy tickets.csv, shared by vacation and support tickets
+TICKET_COLUMNS = [
+    'ticket_id', 'employee_id', 'request_type',
+    'start_date', 'end_date', 'days_count',
+    'status', 'manager_id', 'request_date',
+    'response_date', 'notes',
+    'summary', 'description', 'created_at', 'updated_at'
+]
+
+_SEQUENTIAL_ID = re.compile(r"^([A-Z]+\d{4})(\d{1,6})$")
+
+
+class TicketStore:
+    """Transactional ticket storage in SQLite.
+
+    Vacation and support tickets share one table with the columns of the
+    legacy tickets.csv, indexed on employee_id, status and created_at
+    (ticket_id is the primary key). Creating or updating a ticket is a
+    single transaction, and sequential ids (VT<year><n>) are allocated from
+    a counter row inside that transaction, so concurrent requests never
+    reuse an id and numbers keep growing past 999.
+
+    Stores are shared per database file; use TicketStore.for_csv() to open
+    the store that replaces a given tickets.csv.
+    """
+
+    _instances: Dict[str, "TicketStore"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_path: Path):
+        """Open (or create) the store at `db_path`."""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.write_seconds = 0.0
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS tickets (
+                ticket_id TEXT PRIMARY KEY,
+                employee_id TEXT,
+                request_type TEXT,
+                start_date TEXT,
+                end_date TEXT,
+                days_count REAL,
+                status TEXT,
+                manager_id TEXT,
+                request_date TEXT,
+                response_date TEXT,
+                notes TEXT,
+                summary TEXT,
+                description TEXT,
+                created_at TEXT,
+                updated_at TEXT
+            )"""
+        )
+        for column in ('employee_id', 'status', 'created_at'):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_tickets_{column} ON tickets({column})")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ticket_counters (prefix TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def for_csv(cls, tickets_file: str, import_csv: bool = True) -> "TicketStore":
+        """
+        Return the shared store replacing `tickets_file` (tickets.csv -> tickets.sqlite).
+
+        The first time the database is created, an existing CSV is imported.
+        """
+        db_path = Path(tickets_file).with_suffix('.sqlite')
+        key = str(db_path.resolve())
+        with cls._instances_lock:
+            store = cls._instances.get(key)
+            if store is None:
+                is_new = not db_path.exists()
+                store = cls(db_path)
+                if is_new and import_csv and os.path.exists(tickets_file):
+                    count = store.import_csv(tickets_file)
+                    logger.info(f"Imported {count} tickets from {tickets_file}")
+                cls._instances[key] = store
+            return store
+
+    @staticmethod
+    def _clean(value: Any) -> Any:
+        """Map pandas/CSV blanks (NaN, '', 'nan') to None"""
+        if value is None:
+            return None
+        if isinstance(value, float) and value != value:
+            return None
+        if isinstance(value, str) and value.strip() in ('', 'nan', 'NaN', 'None'):
+            return None
+        return value
+
+    def _allocate_id(self, prefix: str) -> str:
+        """Next free sequential id for `prefix`; the caller holds the lock and commits."""
+        self._conn.execute(
+            "INSERT OR IGNORE INTO ticket_counters (prefix, value) VALUES (?, 0)", (prefix,)
+        )
+        value = self._conn.execute(
+            "SELECT value FROM ticket_counters WHERE prefix = ?", (prefix,)
+        ).fetchone()[0]
+        while True:
+            value += 1
+            ticket_id = f"{prefix}{value:03d}"
+            exists = self._conn.execute(
+                "SELECT 1 FROM tickets WHERE ticket_id = ?", (ticket_id,)
+            ).fetchone()
+            if not exists:
+                break
+        self._conn.execute(
+            "UPDATE ticket_counters SET value = ? WHERE prefix = ?", (value, prefix)
+        )
+        return ticket_id
+
+    def create(self, fields: Dict[str, Any], id_prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Insert a ticket.
+
+        Args:
+            fields: Ticket columns; unknown keys are ignored
+            id_prefix: Allocate a sequential id with this prefix (e.g. "VT2025")
+                unless fields already carry a ticket_id
+
+        Returns:
+            The stored ticket
+        """
+        ticket = {column: self._clean(fields.get(column)) for column in TICKET_COLUMNS}
+        ticket['created_at'] = ticket['created_at'] or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        started_at = time.monotonic()
+        with self._lock:
+            try:
+                if not ticket['ticket_id']:
+                    if not id_prefix:
+                        raise ValueError("ticket_id or id_prefix is required")
+                    ticket['ticket_id'] = self._allocate_id(id_prefix)
+                self._conn.execute(
+                    f"INSERT INTO tickets ({', '.join(TICKET_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(TICKET_COLUMNS))})",
+                    [ticket[column] for column in TICKET_COLUMNS]
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            self.writes += 1
+            self.write_seconds += time.monotonic() - started_at
+        return ticket
+
+    def update(self, ticket_id: str, **fields) -> bool:
+        """Update columns of a ticket; False if it does not exist"""
+        fields = {column: self._clean(value) for column, value in fields.items() if column in TICKET_COLUMNS}
+        fields.pop('ticket_id', None)
+        if not fields:
+            return self.get(ticket_id) is not None
+        started_at = time.monotonic()
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE tickets SET {', '.join(f'{column} = ?' for column in fields)} WHERE ticket_id = ?",
+                list(fields.values()) + [ticket_id]
+            )
+            self._conn.commit()
+            self.writes += 1
+            self.write_seconds += time.monotonic() - started_at
+        return cursor.rowcount > 0
+
+    def _select(self, where: str = "", params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(TICKET_COLUMNS)} FROM tickets {where} ORDER BY rowid", params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._select("WHERE ticket_id = ?", (ticket_id,))
+        return rows[0] if rows else None
+
+    def for_employee(self, employee_id: str) -> List[Dict[str, Any]]:
+        return self._select("WHERE employee_id = ?", (str(employee_id),))
+
+    def with_status(self, status: str) -> List[Dict[str, Any]]:
+        return self._select("WHERE status = ?", (status,))
+
+    def all(self) -> List[Dict[str, Any]]:
+        """All tickets in creation order"""
+        return self._select()
+
+    def import_csv(self, csv_path: str) -> int:
+        """
+        Import tickets from a tickets.csv file; existing ticket ids are kept.
+
+        Sequential-id counters are advanced past the imported ids.
+
+        Returns:
+            Number of tickets imported
+        """
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        tickets = []
+        counters: Dict[str, int] = {}
+        for row in rows:
+            ticket = {column: self._clean(row.get(column)) for column in TICKET_COLUMNS}
+            if not ticket['ticket_id']:
+                continue
+            if ticket['employee_id'] is not None:
+                # pandas wrote integral ids as floats when the column had blanks
+                ticket['employee_id'] = re.sub(r"\.0$", "", str(ticket['employee_id']))
+            if ticket['days_count'] is not None:
+                try:
+                    ticket['days_count'] = float(ticket['days_count'])
+                except ValueError:
+                    ticket['days_count'] = None
+            tickets.append(ticket)
+            match = _SEQUENTIAL_ID.match(ticket['ticket_id'])
+            if match:
+                prefix, number = match.group(1), int(match.group(2))
+                counters[prefix] = max(counters.get(prefix, 0), number)
+
+        with self._lock:
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO tickets ({', '.join(TICKET_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(TICKET_COLUMNS))})",
+                    [[ticket[column] for column in TICKET_COLUMNS] for ticket in tickets]
+                )
+                imported = self._conn.total_changes - before
+                for prefix, number in counters.items():
+                    self._conn.execute(
+                        """INSERT INTO ticket_counters (prefix, value) VALUES (?, ?)
+                           ON CONFLICT(prefix) DO UPDATE SET value = MAX(value, excluded.value)""",
+                        (prefix, number)
+                    )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return imported
+
+    def export_csv(self, csv_path: str) -> int:
+        """Atomically write all tickets to a tickets.csv file; returns the ticket count"""
+        tickets = self.all()
+        tmp_path = f"{csv_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=TICKET_COLUMNS)
+            writer.writeheader()
+            writer.writerows(tickets)
+        os.replace(tmp_path, csv_path)
+        return len(tickets)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return ticket counts by status and write latency."""
+        with self._lock:
+            by_status = {
+                row[0] or 'unknown': row[1]
+                for row in self._conn.execute("SELECT status, COUNT(*) FROM tickets GROUP BY status")
+            }
+            return {
+                "tickets": sum(by_status.values()),
+                "by_status": by_status,
+                "writes": self.writes,
+                "avg_write_ms": self.write_seconds / self.writes * 1000 if self.writes else 0.0
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export the ticket store as tickets.csv")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("csv_path", help="tickets.csv to read or write")
+    parser.add_argument("--db", default="data/tickets.sqlite", help="ticket store database")
+    args = parser.parse_args()
+
+    store = TicketStore(args.db)
+    if args.command == "import":
+        count = store.import_csv(args.csv_path)
+    else:
+        count = store.export_csv(args.csv_path)
+    print(json.dumps({"command": args.command, "tickets": count, "stats": store.stats()}, ensure_ascii=False, indent=2))
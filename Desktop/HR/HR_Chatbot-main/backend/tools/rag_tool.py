@@ -22,6 +22,26 @@ class RAGTool:
             print(f"Error in RAG query: {str(e)}")
             return "عذراً، حدث خطأ في معالجة السؤال."
 
+    def answer(self, question: str, callbacks=None) -> str:
+        """Answer a question with a single generation call, without the agent."""
+        try:
+            response = self.rag_system.query(question, callbacks=callbacks)
+            return response.get('answer', 'عذراً، لم أستطع العثور على إجابة مناسبة.')
+        except Exception as e:
+            print(f"Error in RAG answer: {str(e)}")
+            return "عذراً، حدث خطأ في معالجة السؤال."
+
+    def retrieve_context(self, question: str) -> str:
+        """Return the retrieved policy excerpts for the agent to answer from."""
+        try:
+            result = self.rag_system.retrieve_context(question)
+            if not result.get('context'):
+                return "لا توجد معلومات متعلقة بهذا السؤال في مستندات الموارد البشرية."
+            return result['context']
+        except Exception as e:
+            print(f"Error retrieving context: {str(e)}")
+            return "عذراً، حدث خطأ في البحث في المستندات."
+
     def add_document(self, filepath: str) -> bool:
         """Add a new document to the RAG system."""
         try:
@@ -34,6 +54,13 @@ class RAGTool:
             print(f"Error adding document: {str(e)}")
             return False
 
+    def ingest_document(self, filepath: str, progress_callback=None) -> str:
+        """Add a document to the RAG system, raising on failure; used by background jobs."""
+        collection_id = self.rag_system.process_document(filepath, progress_callback=progress_callback)
+        if filepath not in self.active_docs:
+            self.active_docs.append(filepath)
+        return collection_id
+
     def update_active_documents(self, document_list: List[str]) -> bool:
         """Update which documents are active in the system."""
         try:
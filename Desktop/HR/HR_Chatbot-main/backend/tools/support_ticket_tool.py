@@ -1,27 +1,16 @@
 # tools/support_ticket_tool.py
-import pandas as pd
 import uuid
 from datetime import datetime
 from typing import Dict
+from ticket_store import TicketStore
 
 class SupportTicketTool:
     """Tool for creating general support tickets."""
 
     def __init__(self, tickets_file: str):
-        """Initialize Support Ticket Tool with the CSV file path."""
+        """Initialize Support Ticket Tool; tickets live in the store replacing the CSV file."""
         self.tickets_file = tickets_file
-        self._ensure_file_exists()
-
-    def _ensure_file_exists(self):
-        """Create support tickets file if it doesn't exist."""
-        try:
-            pd.read_csv(self.tickets_file)
-        except FileNotFoundError:
-            df = pd.DataFrame(columns=[
-                'ticket_id', 'employee_id', 'summary', 'description',
-                'status', 'created_at', 'updated_at'
-            ])
-            df.to_csv(self.tickets_file, index=False)
+        self.store = TicketStore.for_csv(tickets_file)
 
     def _generate_ticket_id(self) -> str:
         """Generate a unique ticket ID using UUID."""
@@ -49,10 +38,7 @@ class SupportTicketTool:
                 'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
 
-            df = pd.read_csv(self.tickets_file)
-            new_ticket_df = pd.DataFrame([new_ticket])
-            df = pd.concat([df, new_ticket_df], ignore_index=True)
-            df.to_csv(self.tickets_file, index=False)
+            self.store.create(new_ticket)
 
             return {
                 "status": "success",
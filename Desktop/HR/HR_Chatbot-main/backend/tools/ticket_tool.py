@@ -1,46 +1,16 @@
 # tools/ticket_tool.py
-import pandas as pd
 from datetime import datetime
 from typing import Dict
 import json
+from ticket_store import TicketStore
 
 class TicketTool:
     """Tool for managing vacation request tickets"""
     
     def __init__(self, tickets_file: str):
-        """Initialize Ticket Tool with the CSV file path."""
+        """Initialize Ticket Tool; tickets live in the store replacing the CSV file."""
         self.tickets_file = tickets_file
-        self._ensure_file_exists()
-
-    def _ensure_file_exists(self):
-        """Create tickets file if it doesn't exist."""
-        try:
-            df = pd.read_csv(self.tickets_file)
-        except FileNotFoundError:
-            # Create new file with structure
-            df = pd.DataFrame(columns=[
-                'ticket_id', 'employee_id', 'request_type',
-                'start_date', 'end_date', 'days_count',
-                'status', 'manager_id', 'request_date',
-                'response_date', 'notes'
-            ])
-            df.to_csv(self.tickets_file, index=False)
-
-    def _generate_ticket_id(self) -> str:
-        """Generate a unique ticket ID."""
-        try:
-            df = pd.read_csv(self.tickets_file)
-            if df.empty:
-                return f"VT{datetime.now().year}001"
-            
-            # Get last ticket number and increment
-            last_ticket = df['ticket_id'].iloc[-1]
-            ticket_num = int(last_ticket[-3:]) + 1
-            return f"VT{datetime.now().year}{ticket_num:03d}"
-            
-        except Exception:
-            # Fallback to timestamp-based ID
-            return f"VT{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        self.store = TicketStore.for_csv(tickets_file)
 
     def create_ticket(self, employee_id: str, start_date: str, end_date: str, request_type: str, notes: str = "") -> Dict:
         """Create a new vacation request ticket."""
@@ -49,7 +19,6 @@ class TicketTool:
             days_count = (datetime.strptime(start_date,'%Y-%m-%d') - datetime.strptime(end_date, '%Y-%m-%d')).days + 1
 
             new_ticket = {
-                'ticket_id': self._generate_ticket_id(),
                 'employee_id': employee_id,
                 'request_type': request_type,
                 'start_date': start_date,
@@ -62,10 +31,8 @@ class TicketTool:
                 'notes': notes
             }
             
-            # Add to CSV
-            df = pd.read_csv(self.tickets_file)
-            df = pd.concat([df, pd.DataFrame([new_ticket])], ignore_index=True)
-            df.to_csv(self.tickets_file, index=False)
+            # The ticket id is allocated in the same transaction as the insert
+            new_ticket = self.store.create(new_ticket, id_prefix=f"VT{datetime.now().year}")
             
             return {
                 "status": "success",
@@ -84,25 +51,21 @@ class TicketTool:
                            manager_id: str, notes: str = "") -> Dict:
         """Update the status of a ticket."""
         try:
-            df = pd.read_csv(self.tickets_file)
-            mask = df['ticket_id'] == ticket_id
-            
-            if not any(mask):
+            fields = {
+                'status': status,
+                'manager_id': manager_id,
+                'response_date': datetime.now().strftime('%Y-%m-%d'),
+                'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            if notes:
+                fields['notes'] = notes
+
+            if not self.store.update(ticket_id, **fields):
                 return {
                     "error": "لم يتم العثور على الطلب",
                     "status": "not_found"
                 }
             
-            # Update ticket
-            df.loc[mask, 'status'] = status
-            df.loc[mask, 'manager_id'] = manager_id
-            df.loc[mask, 'response_date'] = datetime.now().strftime('%Y-%m-%d')
-            if notes:
-                df.loc[mask, 'notes'] = notes
-            
-            # Save changes
-            df.to_csv(self.tickets_file, index=False)
-            
             return {
                 "status": "success",
                 "message": "تم تحديث حالة الطلب بنجاح"
@@ -118,8 +81,7 @@ class TicketTool:
     def get_employee_tickets(self, employee_id: str) -> Dict:
         """Get all tickets for an employee."""
         try:
-            df = pd.read_csv(self.tickets_file)
-            employee_tickets = df[df['employee_id'] == employee_id].to_dict('records')
+            employee_tickets = self.store.for_employee(employee_id)
             
             return {
                 "status": "success",
@@ -1,16 +1,35 @@
 # tools/vacation_tool.py
+import os
+import threading
+import time
 import pandas as pd
-from typing import Dict
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
 class VacationTool:
-    """Tool for checking and managing employee vacation balances"""
+    """Tool for checking and managing employee vacation balances
+
+    Balances are served from an in-memory index keyed by employee id. The
+    CSV is parsed once and again only when its mtime or size changes (e.g.
+    HR edits the file); update_balance changes the index and writes the
+    file through it.
+    """
     
     def __init__(self, vacations_file: str):
         """Initialize Vacation Tool with the CSV file path."""
         self.vacations_file = vacations_file
         self._ensure_file_exists()
 
+        self._lock = threading.RLock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._columns: List[str] = []
+        self._signature: Optional[Tuple[int, int]] = None
+
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+        self.reloads = 0
+        self.reload_seconds = 0.0
+
     def _ensure_file_exists(self):
         """Create vacations file if it doesn't exist."""
         try:
@@ -24,13 +43,55 @@ class VacationTool:
             ])
             df.to_csv(self.vacations_file, index=False)
 
+    @staticmethod
+    def _key(employee_id: Any) -> str:
+        """Index key: the id as written in the CSV, so 1001, "1001" and 1001.0 match"""
+        key = str(employee_id).strip()
+        if key.endswith('.0'):
+            key = key[:-2]
+        return str(int(key)) if key.isdigit() else key
+
+    def _file_signature(self) -> Tuple[int, int]:
+        stat = os.stat(self.vacations_file)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        """Rebuild the index if the file changed since it was loaded."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        started_at = time.monotonic()
+        df = pd.read_csv(self.vacations_file)
+        self._columns = list(df.columns)
+        self._index = {self._key(record['employee_id']): record for record in df.to_dict('records')}
+        self._signature = signature
+        self.reloads += 1
+        self.reload_seconds += time.monotonic() - started_at
+
+    def _lookup(self, employee_id: str) -> Optional[Dict[str, Any]]:
+        started_at = time.monotonic()
+        with self._lock:
+            self._refresh()
+            record = self._index.get(self._key(employee_id))
+            record = dict(record) if record is not None else None
+            self.lookups += 1
+            self.lookup_seconds += time.monotonic() - started_at
+        return record
+
+    def _save(self):
+        """Atomically write the index back to the CSV; the caller holds the lock."""
+        tmp_path = f"{self.vacations_file}.tmp"
+        pd.DataFrame(list(self._index.values()), columns=self._columns).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.vacations_file)
+        # Our own write must not trigger a reload
+        self._signature = self._file_signature()
+
     def check_balance(self, employee_id: str) -> Dict:
         """Check vacation balance for an employee."""
         try:
-            df = pd.read_csv(self.vacations_file)
-            employee = df[df['employee_id'] == int(employee_id)]
+            employee = self._lookup(employee_id)
             
-            if employee.empty:
+            if employee is None:
                 return {
                     "error": "لم يتم العثور على الموظف",
                     "status": "not_found"
@@ -39,11 +100,11 @@ class VacationTool:
             return {
                 "status": "success",
                 "employee_id": str(employee_id),
-                "name": employee.iloc[0]['name'],
-                "annual_balance": float(employee.iloc[0]['annual_balance']),
-                "used_days": float(employee.iloc[0]['used_days']),
-                "remaining_balance": float(employee.iloc[0]['remaining_balance']),
-                "last_updated": employee.iloc[0]['last_updated']
+                "name": employee['name'],
+                "annual_balance": float(employee['annual_balance']),
+                "used_days": float(employee['used_days']),
+                "remaining_balance": float(employee['remaining_balance']),
+                "last_updated": employee['last_updated']
             }
             
         except Exception as e:
@@ -56,22 +117,23 @@ class VacationTool:
     def update_balance(self, employee_id: str, days_used: float) -> Dict:
         """Update vacation balance after request approval."""
         try:
-            df = pd.read_csv(self.vacations_file)
-            mask = df['employee_id'] == int(employee_id)
-            
-            if not any(mask):
-                return {
-                    "error": "لم يتم العثور على الموظف",
-                    "status": "not_found"
-                }
-            
-            # Update balance
-            df.loc[mask, 'used_days'] += days_used
-            df.loc[mask, 'remaining_balance'] -= days_used
-            df.loc[mask, 'last_updated'] = datetime.now().strftime('%Y-%m-%d')
-            
-            # Save changes
-            df.to_csv(self.vacations_file, index=False)
+            with self._lock:
+                self._refresh()
+                employee = self._index.get(self._key(employee_id))
+
+                if employee is None:
+                    return {
+                        "error": "لم يتم العثور على الموظف",
+                        "status": "not_found"
+                    }
+
+                # Update balance
+                employee['used_days'] += days_used
+                employee['remaining_balance'] -= days_used
+                employee['last_updated'] = datetime.now().strftime('%Y-%m-%d')
+
+                # Save changes
+                self._save()
             
             return {
                 "status": "success",
@@ -80,7 +142,21 @@ class VacationTool:
             
         except Exception as e:
             print(f"Error updating balance: {str(e)}")
+            with self._lock:
+                # The index may be ahead of the file; reload it on next use
+                self._signature = None
             return {
                 "error": "حدث خطأ في تحديث الرصيد",
                 "status": "error"
-            }
\ No newline at end of file
+            }
+
+    def stats(self) -> Dict:
+        """Return lookup and reload counts and latencies of the balance index."""
+        with self._lock:
+            return {
+                "employees": len(self._index),
+                "lookups": self.lookups,
+                "avg_lookup_ms": self.lookup_seconds / self.lookups * 1000 if self.lookups else 0.0,
+                "reloads": self.reloads,
+                "avg_reload_ms": self.reload_seconds / self.reloads * 1000 if self.reloads else 0.0
+            }
@@ -0,0 +1,543 @@
+# vector_index.py
+
+import json
+import os
+import threading
+import zlib
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Iterable, FrozenSet
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+
+from chunk_store import ChunkStore, chunk_hash
+from numpy_store import NumpyVectorStore
+
+logger = logging.getLogger(__name__)
+
+# Chroma rejects very large add/get calls, so bulk operations are paged
+CHROMA_BATCH_SIZE = 1000
+
+# Scoped Chroma searches pass at most this many chunk hashes in one `$in` filter
+SCOPE_FILTER_LIMIT = CHROMA_BATCH_SIZE
+# Largest unfiltered top-k fetched from a shard to find the hits inside a scope
+MAX_OVERFETCH = 4 * CHROMA_BATCH_SIZE
+# Collection scopes (chunk hashes per shard) kept between searches
+SCOPE_CACHE_SIZE = 64
+
+
+def iter_collection_batches(vectorstore: Chroma, include: List[str],
+                            where: Optional[Dict[str, Any]] = None,
+                            batch_size: int = CHROMA_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Page through everything stored in a Chroma collection."""
+    offset = 0
+    while True:
+        batch = vectorstore._collection.get(
+            where=where,
+            include=include,
+            limit=batch_size,
+            offset=offset
+        )
+        if not batch['ids']:
+            break
+        yield batch
+        offset += len(batch['ids'])
+
+
+def as_embedding_lists(embeddings) -> List[List[float]]:
+    """Chroma may return embeddings as a numpy array; normalise to plain lists."""
+    if hasattr(embeddings, 'tolist'):
+        return embeddings.tolist()
+    return [list(e) for e in embeddings]
+
+
+def add_embeddings_in_batches(vectorstore: Chroma, ids: List[str], embeddings: List[List[float]],
+                              documents: List[str], metadatas: List[Dict[str, Any]],
+                              batch_size: int = CHROMA_BATCH_SIZE):
+    """Insert precomputed vectors into a Chroma collection without re-embedding."""
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        vectorstore._collection.add(
+            ids=ids[start:end],
+            embeddings=embeddings[start:end],
+            documents=documents[start:end],
+            metadatas=metadatas[start:end]
+        )
+
+
+def build_chunk_filter(chunk_hashes: Optional[List[str]] = None,
+                       extra_filter: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Build a Chroma `where` clause restricting results to some chunks."""
+    clauses = []
+    if chunk_hashes:
+        if len(chunk_hashes) == 1:
+            clauses.append({"chunk_hash": chunk_hashes[0]})
+        else:
+            clauses.append({"chunk_hash": {"$in": list(chunk_hashes)}})
+    if extra_filter:
+        clauses.append(extra_filter)
+
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+def merge_top_k(results: Iterable[Tuple[Document, float]], k: int,
+                max_distance: Optional[float] = None) -> List[Tuple[Document, float]]:
+    """Keep the k closest (document, distance) pairs, dropping weak matches."""
+    if max_distance is not None:
+        results = (hit for hit in results if hit[1] <= max_distance)
+    return heapq.nsmallest(k, results, key=lambda hit: hit[1])
+
+
+class ShardedVectorIndex:
+    """Single logical vector index holding the chunks of every HR document.
+
+    Every distinct chunk is stored once, under its content hash, in one of
+    `num_shards` collections, so a query is a single top-k search per shard
+    instead of one search per uploaded document. Which collections contain a
+    chunk is kept in a reference-counted ChunkStore: merging collections
+    only copies references, and removing one deletes just the chunks no
+    other collection still uses. Shards are Chroma collections, or
+    memory-mapped NumPy matrices when `backend` is "numpy".
+    """
+
+    COLLECTION_NAME = "hr_chunks"
+    REGISTRY_FILE = "index.json"
+    CHUNK_STORE_FILE = "chunks.sqlite"
+    LAYOUT = "content"
+    BACKENDS = ("chroma", "numpy")
+
+    def __init__(self, index_path: Path, embeddings, num_shards: int = 1, backend: str = "chroma",
+                 quantization: Optional[str] = None, rescore_factor: int = 4):
+        """Open (or create) the index stored under `index_path`."""
+        self.index_path = Path(index_path)
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        self.embeddings = embeddings
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown vector index backend: {backend}")
+        self.backend = backend
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self._lock = threading.Lock()
+        self._scopes: Dict[FrozenSet[str], Dict[int, FrozenSet[str]]] = {}
+        self._scope_generation = 0
+
+        self.registry = self._load_registry()
+        stored_shards = self.registry.get("num_shards")
+        if stored_shards and stored_shards != num_shards:
+            # Routing depends on the shard count, so an existing index keeps its layout
+            logger.warning(
+                f"Vector index was created with {stored_shards} shards, ignoring configured {num_shards}"
+            )
+            num_shards = stored_shards
+        self.num_shards = max(1, int(num_shards))
+        self.registry["num_shards"] = self.num_shards
+        self._save_registry()
+
+        self.shards = [self._open_shard(i) for i in range(self.num_shards)]
+        self.chunk_store = ChunkStore(self.index_path / self.CHUNK_STORE_FILE)
+        if self.registry.get("layout") != self.LAYOUT:
+            self._migrate_to_content_layout()
+        logger.info(
+            f"Opened {self.backend} vector index with {self.num_shards} shard(s) and "
+            f"{len(self.registry['collections'])} collection(s)"
+        )
+
+    def _open_shard(self, index: int):
+        """Open one shard with the configured backend."""
+        if self.backend == "numpy":
+            return NumpyVectorStore(
+                persist_directory=str(self.index_path / f"npy_shard_{index:02d}"),
+                embedding_function=self.embeddings,
+                quantization=self.quantization,
+                rescore_factor=self.rescore_factor
+            )
+        if self.quantization:
+            logger.warning("Quantization is only supported by the numpy backend; ignoring it")
+        return Chroma(
+            collection_name=self.COLLECTION_NAME,
+            persist_directory=str(self.index_path / f"shard_{index:02d}"),
+            embedding_function=self.embeddings
+        )
+
+    def _load_registry(self) -> Dict[str, Any]:
+        """Load the collection registry stored next to the shards."""
+        registry_path = self.index_path / self.REGISTRY_FILE
+        registry = {"num_shards": None, "layout": None, "collections": {}, "migrated": []}
+        if registry_path.exists():
+            try:
+                with open(registry_path, 'r', encoding='utf-8') as f:
+                    registry.update(json.load(f))
+            except Exception as e:
+                logger.error(f"Error reading vector index registry: {str(e)}")
+        return registry
+
+    def _save_registry(self):
+        """Atomically persist the collection registry."""
+        registry_path = self.index_path / self.REGISTRY_FILE
+        tmp_path = registry_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.registry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, registry_path)
+
+    def _shard_index(self, chunk: str) -> int:
+        """Route a chunk to its shard by content hash."""
+        return zlib.crc32(chunk.encode('utf-8')) % self.num_shards
+
+    def _by_shard(self, hashes: Iterable[str]) -> Dict[int, List[str]]:
+        grouped: Dict[int, List[str]] = {}
+        for h in hashes:
+            grouped.setdefault(self._shard_index(h), []).append(h)
+        return grouped
+
+    def _scope(self, collection_ids: Iterable[str]) -> Dict[int, FrozenSet[str]]:
+        """Chunk hashes of some collections, grouped by shard; cached until references change."""
+        key = frozenset(collection_ids)
+        with self._lock:
+            cached = self._scopes.get(key)
+            generation = self._scope_generation
+        if cached is not None:
+            return cached
+        scoped = {
+            index: frozenset(hashes)
+            for index, hashes in self._by_shard(self.chunk_store.hashes_for(key)).items()
+        }
+        with self._lock:
+            if generation == self._scope_generation:
+                if len(self._scopes) >= SCOPE_CACHE_SIZE:
+                    self._scopes.clear()
+                self._scopes[key] = scoped
+        return scoped
+
+    def _invalidate_scopes(self):
+        with self._lock:
+            self._scope_generation += 1
+            self._scopes.clear()
+
+    def _register(self, collection_id: str, title: str, chunk_count: int):
+        """Record a collection (or more chunks for it) in the registry."""
+        with self._lock:
+            entry = self.registry["collections"].setdefault(collection_id, {
+                "title": title,
+                "chunk_count": 0,
+                "created": datetime.now().isoformat()
+            })
+            entry["chunk_count"] += chunk_count
+            self._save_registry()
+
+    def has_collection(self, collection_id: str) -> bool:
+        return collection_id in self.registry["collections"]
+
+    def list_collections(self) -> Dict[str, Dict[str, Any]]:
+        """Return registry information for every indexed collection."""
+        return dict(self.registry["collections"])
+
+    def add_texts(self, collection_id: str, title: str, texts: List[str],
+                  metadatas: List[Dict[str, Any]]) -> int:
+        """Embed and add the chunks of one collection."""
+        if not texts:
+            return 0
+        return self.add_embeddings(
+            collection_id, title, texts, self.embeddings.embed_documents(texts), metadatas
+        )
+
+    def add_embeddings(self, collection_id: str, title: str, texts: List[str],
+                       embeddings: List[List[float]], metadatas: List[Dict[str, Any]]) -> int:
+        """
+        Add chunks of one collection whose vectors are already known.
+
+        Chunks already stored for another collection only gain a reference;
+        just the new ones are written to the shards.
+
+        Returns:
+            Number of chunks added to the collection
+        """
+        if not texts:
+            return 0
+        hashes = [chunk_hash(text) for text in texts]
+        new_hashes = set(self.chunk_store.add_references(collection_id, hashes))
+        self._invalidate_scopes()
+
+        rows: Dict[int, Dict[str, list]] = {}
+        for h, text, vector, metadata in zip(hashes, texts, embeddings, metadatas):
+            if h not in new_hashes:
+                continue
+            new_hashes.discard(h)
+            shard_rows = rows.setdefault(
+                self._shard_index(h), {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+            )
+            shard_rows["ids"].append(h)
+            shard_rows["embeddings"].append(vector)
+            shard_rows["documents"].append(text)
+            shard_rows["metadatas"].append(dict(metadata, chunk_hash=h))
+        for index, shard_rows in rows.items():
+            add_embeddings_in_batches(
+                self.shards[index], shard_rows["ids"], shard_rows["embeddings"],
+                shard_rows["documents"], shard_rows["metadatas"]
+            )
+
+        self._register(collection_id, title, len(texts))
+        stored = sum(len(r["ids"]) for r in rows.values())
+        if stored < len(texts):
+            logger.info(f"{collection_id}: {len(texts) - stored}/{len(texts)} chunks already stored, shared")
+        return len(texts)
+
+    def _delete_chunks(self, hashes: List[str]):
+        """Delete the stored vectors of orphaned chunks."""
+        for index, shard_hashes in self._by_shard(hashes).items():
+            for start in range(0, len(shard_hashes), CHROMA_BATCH_SIZE):
+                self.shards[index]._collection.delete(ids=shard_hashes[start:start + CHROMA_BATCH_SIZE])
+
+    def delete_collection(self, collection_id: str) -> bool:
+        """Delete a collection, keeping the chunks other collections still reference."""
+        if not self.has_collection(collection_id):
+            return False
+        orphaned = self.chunk_store.remove_collection(collection_id)
+        self._invalidate_scopes()
+        self._delete_chunks(orphaned)
+        with self._lock:
+            self.registry["collections"].pop(collection_id, None)
+            self._save_registry()
+        return True
+
+    def copy_collections(self, source_ids: List[str], target_id: str, title: str) -> int:
+        """Create a collection referencing every chunk of the sources; no vectors are copied."""
+        count = self.chunk_store.copy_references(source_ids, target_id)
+        self._invalidate_scopes()
+        self._register(target_id, title, count)
+        return count
+
+    def _search_scoped(self, shard, embedding: List[float], k: int, scope: FrozenSet[str],
+                       filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """
+        Top-k of one shard restricted to the chunks in `scope`.
+
+        The numpy backend masks rows by id during its exact scan. Chroma gets
+        a chunk_hash `$in` filter only for small scopes; a large scope is
+        searched unfiltered with a wider k, widening until k hits fall inside
+        it, and only a scope too sparse for that is queried in bounded slices.
+        """
+        if self.backend == "numpy":
+            return shard.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k, filter=filter, ids=scope
+            )
+        if len(scope) <= SCOPE_FILTER_LIMIT:
+            return shard.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k, filter=build_chunk_filter(list(scope), filter)
+            )
+
+        count = shard._collection.count()
+        # Expect about k hits in scope per count / len(scope) fetched rows
+        fetch = 2 * k * -(-count // len(scope))
+        while fetch <= MAX_OVERFETCH:
+            hits = shard.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=min(fetch, count), filter=filter
+            )
+            in_scope = [hit for hit in hits if hit[0].metadata.get("chunk_hash") in scope]
+            if len(in_scope) >= k or fetch >= count:
+                return in_scope[:k]
+            fetch *= 4
+
+        hashes = list(scope)
+        return merge_top_k((
+            hit
+            for start in range(0, len(hashes), SCOPE_FILTER_LIMIT)
+            for hit in shard.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k, filter=build_chunk_filter(hashes[start:start + SCOPE_FILTER_LIMIT], filter)
+            )
+        ), k)
+
+    def search(self, query: str, k: int = 15, collection_ids: Optional[List[str]] = None,
+               filter: Optional[Dict[str, Any]] = None,
+               max_distance: Optional[float] = None,
+               embedding: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+        """
+        Run one top-k similarity search over the whole index.
+
+        Args:
+            query: The question to search for
+            k: Number of chunks to return
+            collection_ids: Optional list of collections to restrict the search to
+            filter: Optional extra Chroma metadata filter
+            max_distance: Optional cutoff dropping weak matches
+            embedding: Precomputed query embedding; computed once if omitted
+
+        Returns:
+            List of (document, distance) pairs, closest first. Each chunk
+            appears once; `collections` lists every collection containing it.
+        """
+        if collection_ids:
+            # Only the shards holding chunks of the requested collections can match
+            scoped = self._scope(collection_ids)
+            if not scoped:
+                return []
+            targets = [(self.shards[i], scope) for i, scope in scoped.items()]
+        else:
+            targets = [(shard, None) for shard in self.shards]
+
+        if embedding is None:
+            # Embed once rather than once per shard
+            embedding = self.embeddings.embed_query(query)
+
+        def search_shard(target) -> List[Tuple[Document, float]]:
+            shard, scope = target
+            if shard._collection.count() == 0:
+                return []
+            if scope is None:
+                return shard.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)
+            return self._search_scoped(shard, embedding, k, scope, filter)
+
+        if len(targets) == 1:
+            results = search_shard(targets[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+                results = [hit for hits in executor.map(search_shard, targets) for hit in hits]
+
+        hits = merge_top_k(results, k, max_distance)
+
+        # The stored metadata names the collection that first added a chunk,
+        # which may since have been removed; report the current owners instead
+        owners = self.chunk_store.collections_for(
+            doc.metadata["chunk_hash"] for doc, _ in hits if "chunk_hash" in doc.metadata
+        )
+        for doc, _ in hits:
+            # Chunks stored before document ids existed: their first collection identifies the document
+            doc.metadata.setdefault("document_id", doc.metadata.get("collection_id"))
+            collections = owners.get(doc.metadata.get("chunk_hash"))
+            if not collections:
+                continue
+            if collection_ids:
+                collections = [cid for cid in collections if cid in collection_ids] or collections
+            doc.metadata["collection_id"] = collections[0]
+            doc.metadata["collections"] = collections
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        """Return collection and chunk-sharing statistics."""
+        return {
+            "backend": self.backend,
+            "num_shards": self.num_shards,
+            "collections": len(self.registry["collections"]),
+            "stored_chunks": sum(shard._collection.count() for shard in self.shards),
+            "chunks": self.chunk_store.stats()
+        }
+
+    def migrate_legacy_collections(self, chroma_path: Path) -> List[str]:
+        """
+        Import per-document Chroma directories (data/chroma_db/*) into the index.
+
+        Stored vectors are copied as-is, so no embedding calls are made.
+        Directories already imported are skipped.
+
+        Returns:
+            List of imported collection IDs
+        """
+        chroma_path = Path(chroma_path)
+        imported = []
+        if not chroma_path.exists():
+            return imported
+
+        for collection_dir in sorted(chroma_path.iterdir()):
+            collection_id = collection_dir.name
+            if not collection_dir.is_dir() or collection_id in self.registry["migrated"]:
+                continue
+            try:
+                legacy_store = Chroma(
+                    persist_directory=str(collection_dir),
+                    embedding_function=self.embeddings
+                )
+                count = 0
+                title = collection_id
+                for batch in iter_collection_batches(
+                        legacy_store, include=["embeddings", "documents", "metadatas"]):
+                    metadatas = []
+                    for i, metadata in enumerate(batch['metadatas']):
+                        metadata = dict(metadata or {})
+                        metadata["collection_id"] = collection_id
+                        metadata.setdefault("chunk_id", str(count + i))
+                        metadata.setdefault("document_title", collection_id)
+                        metadatas.append(metadata)
+                    title = metadatas[0]["document_title"]
+                    # Legacy merged collections only add references to their sources' chunks
+                    count += self.add_embeddings(
+                        collection_id, title, batch['documents'],
+                        as_embedding_lists(batch['embeddings']), metadatas
+                    )
+
+                with self._lock:
+                    self.registry["migrated"].append(collection_id)
+                    self._save_registry()
+                imported.append(collection_id)
+                logger.info(f"Migrated legacy collection {collection_id} ({count} chunks)")
+
+            except Exception as e:
+                logger.error(f"Error migrating collection {collection_id}: {str(e)}")
+
+        return imported
+
+    def _migrate_to_content_layout(self):
+        """
+        Rewrite an index created before chunks were content-addressed.
+
+        Rows were stored once per collection under `<collection_id>:<n>` ids;
+        they are re-added under their content hash (duplicates become shared
+        references) and the old rows deleted. Stored vectors are reused, so
+        no embedding calls are made. Rows left by an interrupted run are
+        rebuilt from scratch.
+        """
+        legacy_ids = []
+        for shard in self.shards:
+            ids = [i for batch in iter_collection_batches(shard, include=[]) for i in batch['ids']]
+            legacy_ids.append([i for i in ids if ":" in i])
+            partial = [i for i in ids if ":" not in i]
+            for start in range(0, len(partial), CHROMA_BATCH_SIZE):
+                shard._collection.delete(ids=partial[start:start + CHROMA_BATCH_SIZE])
+
+        total = sum(len(ids) for ids in legacy_ids)
+        if total:
+            logger.info(f"Migrating {total} vector index rows to content-addressed storage")
+        self.chunk_store.clear()
+        self._invalidate_scopes()
+        with self._lock:
+            for entry in self.registry["collections"].values():
+                entry["chunk_count"] = 0
+
+        for shard, ids in zip(self.shards, legacy_ids):
+            for start in range(0, len(ids), CHROMA_BATCH_SIZE):
+                batch = shard._collection.get(
+                    ids=ids[start:start + CHROMA_BATCH_SIZE],
+                    include=["embeddings", "documents", "metadatas"]
+                )
+                groups: Dict[str, Dict[str, list]] = {}
+                for row_id, vector, text, metadata in zip(
+                        batch['ids'], as_embedding_lists(batch['embeddings']),
+                        batch['documents'], batch['metadatas']):
+                    metadata = dict(metadata or {})
+                    cid = metadata.get("collection_id") or row_id.rsplit(":", 1)[0]
+                    group = groups.setdefault(cid, {"texts": [], "vectors": [], "metadatas": []})
+                    group["texts"].append(text)
+                    group["vectors"].append(vector)
+                    group["metadatas"].append(metadata)
+                for cid, group in groups.items():
+                    entry = self.registry["collections"].get(cid, {})
+                    title = entry.get("title") or group["metadatas"][0].get("document_title", cid)
+                    self.add_embeddings(cid, title, group["texts"], group["vectors"], group["metadatas"])
+            for start in range(0, len(ids), CHROMA_BATCH_SIZE):
+                shard._collection.delete(ids=ids[start:start + CHROMA_BATCH_SIZE])
+
+        with self._lock:
+            self.registry["layout"] = self.LAYOUT
+            self._save_registry()
+        if total:
+            stats = self.chunk_store.stats()
+            logger.info(
+                f"Vector index migrated: {stats['references']} chunk references, "
+                f"{stats['unique_chunks']} unique chunks stored"
+            )